@@ -0,0 +1,62 @@
+"""Benchmark per-file FSA parse latency.
+
+Compares the native memory-mapped reader, read_abif_stream(), with
+read_abif_stream_biopython() on synthetic 5-dye FSA files that, like the
+files written by ABI instruments, also carry the processed DATA9-12 and
+run-diagnostic DATA5-8 arrays. Each run opens the file, reads the channels
+and the run start time.
+
+    python benchmarks/bench_abif.py
+"""
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from timeit import repeat
+
+from numpy.random import default_rng
+
+from fatoolsng.lib.fautil.traceio import (read_abif_stream,
+                                          read_abif_stream_biopython)
+from fatoolsng.tests.abif import build_fsa, cstring_tag, data_tag
+
+
+LENGTHS = [8000, 16000, 32000]
+WAVELENGTHS = {'6-FAM': 522, 'VIC': 554, 'NED': 575, 'PET': 595, 'LIZ': 655}
+
+
+def make_fsa(length, seed=0):
+    rng = default_rng(seed)
+    traces = {dye: rng.integers(-50, 8000, length) for dye in WAVELENGTHS}
+    extra_tags = [data_tag(n, rng.integers(0, 8000, length))
+                  for n in range(5, 13)]
+    extra_tags.append(cstring_tag('CMNT', 1, 'run comment ' * 20))
+    return build_fsa(traces, WAVELENGTHS, extra_tags=extra_tags)
+
+
+def parse(reader, path):
+    with open(path, 'rb') as stream:
+        trace = reader(stream)
+        trace.get_channels()
+        trace.get_run_start_time()
+
+
+def best_of(func, number=20):
+    return min(repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    print(f"{'samples':>8s} {'size':>8s} {'biopython':>10s} {'native':>9s} "
+          f"{'speed-up':>9s}")
+    with TemporaryDirectory() as tmpdir:
+        for length in LENGTHS:
+            path = Path(tmpdir) / f'{length}.fsa'
+            path.write_bytes(make_fsa(length))
+            t_bio = best_of(lambda: parse(read_abif_stream_biopython, path))
+            t_native = best_of(lambda: parse(read_abif_stream, path))
+            print(f'{length:8d} {path.stat().st_size // 1024:6d}kB '
+                  f'{t_bio*1e3:8.2f}ms {t_native*1e3:7.3f}ms '
+                  f'{t_bio/t_native:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
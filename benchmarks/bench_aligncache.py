@@ -0,0 +1,63 @@
+"""Benchmark ladder alignment with and without the alignment cache.
+
+Aligns the LIZ500 ladder channels of 12 synthetic FSA, each with its own
+peak shift and a few spurious peaks, without cache, with an empty cache
+(align and store) and once more with the filled cache, as a re-run of the
+same files does.
+
+    python benchmarks/bench_aligncache.py
+"""
+
+from contextlib import redirect_stdout
+from io import StringIO
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from numpy.random import default_rng
+
+from fatoolsng.lib import const, params
+from fatoolsng.lib.fautil import mixin
+from fatoolsng.lib.fautil.aligncache import AlignCache
+from fatoolsng.tests.ladder import make_ladder_fsa, upload_panels
+
+
+N_FSA = 12
+
+
+def make_fsa(i, align_cache):
+    rng = default_rng(i)
+    sizes = const.ladders['LIZ500']['sizes']
+    rtimes = [int(size * 10.5 + 150 + 3 * i % 40 + rng.normal(0, 2))
+              for size in sizes]
+    rtimes += list(rng.integers(600, 5400, 4))
+    return make_ladder_fsa(f'{i}.fsa', rtimes,
+                           rng.uniform(800, 2000, len(rtimes)), align_cache)
+
+
+def align_all(align_cache):
+    fsas = [make_fsa(i, align_cache) for i in range(N_FSA)]
+    start = perf_counter()
+    with redirect_stdout(StringIO()):
+        for fsa in fsas:
+            fsa.align(params.Params())
+    return perf_counter() - start
+
+
+def main():
+    upload_panels()
+    # silence the O: line of every alignment
+    mixin.cout = lambda *args: None
+
+    with TemporaryDirectory() as tmp:
+        cache = AlignCache(f'{tmp}/alignments.sqlite')
+        rows = [('no cache', align_all(None)),
+                ('cold cache', align_all(cache)),
+                ('warm cache', align_all(cache))]
+    print(f'{N_FSA} LIZ500 ladder channels')
+    print(f"{'mode':12s} {'total':>9s} {'per FSA':>9s}")
+    for (label, t) in rows:
+        print(f'{label:12s} {t*1e3:7.0f}ms {t/N_FSA*1e3:7.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark the numeric backends stage by stage.
+
+Runs the fautil stages that use the numeric backend (backend.py) with each
+backend on the CPU, after one warm-up call so that JAX compilation is not
+counted: the wavelet transform of the 5 channels of a trace, CWT peak
+detection of one channel, the polynomial fits of a ladder alignment and the
+legacy smoothing. Sizing, which no longer uses the backend, is benchmarked
+by bench_sizing.py.
+
+    python benchmarks/bench_backend.py
+"""
+
+from timeit import repeat
+
+from numpy import arange, exp
+from numpy.random import default_rng
+
+from fatoolsng.lib.fautil.algo import Peak
+from fatoolsng.lib.fautil.alignutils import estimate_z
+from fatoolsng.lib.fautil.backend import BACKENDS, use_backend
+from fatoolsng.lib.fautil.cwt import cwt, cwt_find_peaks
+from fatoolsng.lib.fautil.traceutils import savitzky_golay
+
+
+LENGTH = 16000
+LADDER = [35, 50, 75, 100, 139, 150, 160, 200, 250, 300, 340, 350, 400, 450,
+          490, 500]
+
+
+def make_traces(length, n_channels=5, seed=0):
+    rng = default_rng(seed)
+    x = arange(length)
+    traces = abs(rng.normal(0, 3, (n_channels, length)))
+    for trace in traces:
+        for c in rng.integers(0, length, 40):
+            trace += rng.uniform(100, 3000) * exp(-0.5 * ((x - c) / 4)**2)
+    return traces
+
+
+def ladder_peaks():
+    peaks = []
+    for size in LADDER:
+        p = Peak(rtime=int(1000 + 11.3 * size + 0.004 * size**2), rfu=1000)
+        p.size = size
+        p.qscore = 1.0
+        peaks.append(p)
+    return peaks
+
+
+def stages():
+    traces = make_traces(LENGTH)
+    rtimes = [p.rtime for p in ladder_peaks()]
+    return [
+        ('cwt 5 channels', lambda: cwt(traces, arange(2, 8))),
+        ('cwt peaks', lambda: cwt_find_peaks(traces[0], arange(5, 15), 1.25)),
+        # align_pm/align_gm refit z for every candidate ladder size
+        ('estimate_z x100', lambda: [estimate_z(rtimes, LADDER, 3)
+                                     for _ in range(100)]),
+        ('savitzky_golay', lambda: savitzky_golay(traces[0], 11, 7)),
+    ]
+
+
+def best_of(func, number=3):
+    return min(repeat(func, number=number, repeat=3)) / number
+
+
+def main():
+    times = {}
+    for name in BACKENDS:
+        with use_backend(name):
+            for (stage, func) in stages():
+                func()
+                times[stage, name] = best_of(func)
+    print(f"{'stage':18s}" + ''.join(f'{name:>10s}' for name in BACKENDS))
+    for (stage, _) in stages():
+        print(f'{stage:18s}' + ''.join(f'{times[stage, name]*1e3:8.2f}ms'
+                                       for name in BACKENDS))
+
+
+if __name__ == '__main__':
+    main()
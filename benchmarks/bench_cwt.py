@@ -0,0 +1,64 @@
+"""Benchmark the Ricker continuous wavelet transform.
+
+Compares the direct implementation traceutils used (a Ricker wavelet built
+and numpy.convolve()d for every width, channel after channel) with cwt(),
+which transforms the 5 channels of a trace with one FFT against a cached
+wavelet bank, for the default ScanningParameter widths and for a wide
+range of widths.
+
+    python benchmarks/bench_cwt.py
+"""
+
+from timeit import repeat
+
+from numpy import arange, convolve, exp, zeros
+from numpy.random import default_rng
+
+from fatoolsng.lib.fautil.cwt import cwt, ricker
+
+
+LENGTH = 16000
+CASES = [
+    ('5..14', arange(5, 15)),
+    ('1..64', arange(1, 65)),
+]
+
+
+def direct_cwt(data, widths):
+    out = zeros((len(widths), len(data)))
+    for i, w in enumerate(widths):
+        n = 10 * int(w)
+        if n > len(data):
+            n = len(data)
+        wav = ricker(n, w)[::-1]
+        out[i] = convolve(data, wav, mode='same')
+    return out
+
+
+def make_traces(length, n_channels=5, seed=0):
+    rng = default_rng(seed)
+    x = arange(length)
+    traces = abs(rng.normal(0, 3, (n_channels, length)))
+    for trace in traces:
+        for c in rng.integers(0, length, 40):
+            trace += rng.uniform(100, 3000) * exp(-0.5 * ((x - c) / 4)**2)
+    return traces
+
+
+def best_of(func, number=3):
+    return min(repeat(func, number=number, repeat=3)) / number
+
+
+def main():
+    traces = make_traces(LENGTH)
+    print(f'5 channels of {LENGTH} samples')
+    print(f"{'widths':8s} {'direct':>9s} {'fft':>9s} {'speed-up':>9s}")
+    for (name, widths) in CASES:
+        t_direct = best_of(lambda: [direct_cwt(t, widths) for t in traces])
+        t_fft = best_of(lambda: cwt(traces, widths))
+        print(f'{name:8s} {t_direct*1e3:7.1f}ms {t_fft*1e3:7.1f}ms '
+              f'{t_direct/t_fft:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark the differential evolution objective of align_de().
+
+Runs differential_evolution() with the settings of align_de() on the LIZ500
+ladder peaks of synthetic channels with spurious peaks, once with the scalar
+ZFunc called member by member and once with ZFunc.scores() evaluating the
+whole population per generation, and reports the objective calls and
+the score of the best curve.
+
+    python benchmarks/bench_de.py
+"""
+
+from time import perf_counter
+
+from numpy.random import default_rng
+from scipy.optimize import differential_evolution
+
+from fatoolsng.lib.const import ladders
+from fatoolsng.lib.fautil.algo import Peak
+from fatoolsng.lib.fautil.gmalign import ZFunc
+
+
+N_CHANNELS = 3
+BOUNDS = [(-1e-10, 1e-10), (-1e-5, 1e-5), (0.01, 0.1), (-75, 75)]
+
+
+def make_zfunc(seed):
+    rng = default_rng(seed)
+    sizes = ladders['LIZ500']['sizes']
+    rtimes = [int(size * 10.5 + 150 + 0.002 * size**2 + rng.normal(0, 2))
+              for size in sizes]
+    rtimes += list(rng.integers(600, 5400, 8))
+    peaks = []
+    for rtime in sorted(set(int(r) for r in rtimes)):
+        rfu = int(rng.uniform(800, 2000))
+        peaks.append(Peak(rtime=rtime, rfu=rfu, area=rfu * 5,
+                          brtime=rtime - 5, ertime=rtime + 5, srtime=0.0,
+                          beta=8.0, theta=100.0, omega=rtime))
+    return ZFunc(peaks, sizes, [])
+
+
+def run(f, vectorized, seed):
+    kwargs = dict(vectorized=True, updating='deferred') if vectorized else {}
+    start = perf_counter()
+    res = differential_evolution(f.scores if vectorized else f, BOUNDS,
+                                 tol=1e-5, mutation=(0.4, 1.5), popsize=30,
+                                 recombination=0.8, rng=seed, **kwargs)
+    return perf_counter() - start, res.nfev, f(res.x)
+
+
+def main():
+    print(f'{N_CHANNELS} LIZ500 ladder channels, align_de() settings')
+    print(f"{'channel':8s} {'objective':10s} {'time':>9s} {'calls':>7s} "
+          f"{'score':>10s}")
+    for seed in range(N_CHANNELS):
+        f = make_zfunc(seed)
+        for (label, vectorized) in [('scalar', False), ('batched', True)]:
+            t, nfev, score = run(f, vectorized, seed)
+            print(f'{seed:<8d} {label:10s} {t*1e3:7.0f}ms {nfev:7d} '
+                  f'{score:10.2f}')
+
+
+if __name__ == '__main__':
+    main()
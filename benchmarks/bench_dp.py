@@ -0,0 +1,44 @@
+"""Benchmark the ladder alignment dynamic programming routine.
+
+Compares the row-vectorized dp() against the cell-by-cell reference on score
+matrices shaped like LIZ500 (16 sizes) and LIZ600 (36 sizes) ladders.
+
+    python benchmarks/bench_dp.py
+"""
+
+from timeit import repeat
+
+from numpy.random import default_rng
+
+from fatoolsng.lib.fautil.dpalign import dp, _dp_scalar
+
+
+CASES = [
+    ('GS500LIZ', 16, 30),
+    ('GS600LIZ', 36, 70),
+]
+
+
+def score_matrix(rows, cols, seed=0):
+    S = default_rng(seed).random((rows, cols))
+    S[S < 0.7] = 0.0
+    return S
+
+
+def best_of(func, number):
+    return min(repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    print(f"{'ladder':10s} {'matrix':>8s} {'scalar':>10s} {'vector':>10s} "
+          f"{'speed-up':>9s}")
+    for (name, rows, cols) in CASES:
+        S = score_matrix(rows, cols)
+        t_scalar = best_of(lambda: _dp_scalar(S, -5), 20)
+        t_vector = best_of(lambda: dp(S, -5), 200)
+        print(f'{name:10s} {rows:3d}x{cols:<4d} {t_scalar*1e3:8.3f}ms '
+              f'{t_vector*1e3:8.3f}ms {t_scalar/t_vector:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
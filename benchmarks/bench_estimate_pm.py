@@ -0,0 +1,58 @@
+"""Benchmark the anchor search of align_pm().
+
+Runs the geometric-hashing estimate_pm() and the sweep over all pairs of
+early and late peaks it replaces on the anchor peaks of 40 synthetic ladder
+channels per ladder, with random sizing curves, missing ladder peaks and
+spurious peaks, and counts the anchor pairs that match the true curve.
+
+    python benchmarks/bench_estimate_pm.py
+"""
+
+from time import perf_counter
+
+from numpy.random import default_rng
+
+from fatoolsng.lib.const import ladders
+from fatoolsng.lib.fautil.pmalign import (ANCHOR_RTIME_LOWER_BOUND,
+                                          ANCHOR_RTIME_UPPER_BOUND,
+                                          estimate_pm, _estimate_pm_sweep)
+from fatoolsng.tests.ladder import make_ladder_peaks
+
+
+N_CHANNELS = 40
+
+
+def make_channel(seed, sizes):
+    """ return (anchor peaks, sizing curve) of a synthetic ladder channel """
+    rng = default_rng(seed)
+    peaks, curve = make_ladder_peaks(rng, sizes, rng.integers(0, 10),
+                                     max_missing=2)
+    return [p for p in peaks if ANCHOR_RTIME_LOWER_BOUND < p.rtime <
+            ANCHOR_RTIME_UPPER_BOUND], curve
+
+
+def run(func, channels, signature):
+    correct = total = 0
+    start = perf_counter()
+    for (peaks, curve) in channels:
+        pairs, z = func(peaks, signature)
+        correct += sum(abs(rtime - curve(size)) < 8 for (rtime, size) in pairs)
+        total += len(pairs)
+    return perf_counter() - start, correct, total
+
+
+def main():
+    print(f'{N_CHANNELS} synthetic ladder channels per ladder')
+    print(f"{'ladder':8s} {'method':8s} {'time':>9s} {'correct anchors':>16s}")
+    for name in ('LIZ500', 'LIZ600'):
+        ladder = ladders[name]
+        channels = [make_channel(seed, ladder['sizes'])
+                    for seed in range(N_CHANNELS)]
+        for (label, func) in [('sweep', _estimate_pm_sweep),
+                              ('hashing', estimate_pm)]:
+            t, correct, total = run(func, channels, ladder['signature'])
+            print(f'{name:8s} {label:8s} {t*1e3:7.0f}ms {correct:9d}/{total}')
+
+
+if __name__ == '__main__':
+    main()
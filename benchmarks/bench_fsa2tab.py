@@ -0,0 +1,80 @@
+"""Benchmark convert --fsa2tab.
+
+Exports synthetic 5-dye FSA files with the per-sample writer that
+do_fsa2tab() used (zip() over the channels and str() of every value, with
+ABIF_Channel.smooth() called for each channel) and with fsa2tab() in each
+output format, then with --jobs worker processes.
+
+    python benchmarks/bench_fsa2tab.py
+"""
+
+from os import cpu_count
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from types import SimpleNamespace
+
+from numpy.random import default_rng
+
+from fatoolsng.lib.fautil.traceio import read_abif_stream
+from fatoolsng.scripts import convert
+from fatoolsng.tests.abif import build_fsa
+
+
+N_FILES = 24
+LENGTH = 16000
+DYES = ['6-FAM', 'VIC', 'NED', 'PET', 'LIZ']
+
+
+def per_sample(infile):
+    with open(infile, 'rb') as instream:
+        t = read_abif_stream(instream)
+    channels = t.get_channels()
+    names = ['"' + c + '"' for c in channels]
+    with open(infile + '.raw.tab', 'wt') as out:
+        out.write('\t'.join(names))
+        out.write('\n')
+        for p in zip(*[channels[c].raw for c in channels]):
+            out.write('\t'.join(str(x) for x in p))
+            out.write('\n')
+    with open(infile + '.base.tab', 'wt') as out:
+        out.write('\t'.join(names))
+        out.write('\n')
+        for p in zip(*[channels[c].smooth() for c in channels]):
+            out.write('\t'.join(str(x) for x in p))
+            out.write('\n')
+
+
+def timed(func):
+    start = perf_counter()
+    func()
+    return perf_counter() - start
+
+
+def main():
+    convert.cout = lambda s: None
+    rng = default_rng(0)
+    with TemporaryDirectory() as tmpdir:
+        infiles = []
+        for i in range(N_FILES):
+            path = Path(tmpdir) / f'{i}.fsa'
+            path.write_bytes(build_fsa({d: rng.integers(-50, 8000, LENGTH)
+                                        for d in DYES}))
+            infiles.append(str(path))
+
+        t_legacy = timed(lambda: [per_sample(f) for f in infiles])
+        print(f'{N_FILES} files of {LENGTH} scans, per file:')
+        print(f"{'writer':14s} {'time':>9s} {'speed-up':>9s}")
+        print(f"{'per-sample':14s} {t_legacy / N_FILES * 1e3:7.1f}ms")
+        jobs = min(cpu_count() or 1, 4)
+        for (fmt, n_jobs) in [('tab', 1), ('npy', 1), ('npz', 1),
+                              ('tab', jobs), ('npy', jobs)]:
+            args = SimpleNamespace(infiles=infiles, format=fmt, jobs=n_jobs)
+            t = timed(lambda: convert.do_fsa2tab(args))
+            label = f'{fmt} --jobs {n_jobs}'
+            print(f'{label:14s} {t / N_FILES * 1e3:7.1f}ms '
+                  f'{t_legacy / t:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
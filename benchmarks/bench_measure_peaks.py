@@ -0,0 +1,61 @@
+"""Benchmark peak area/width measurement.
+
+Compares calculate_area() called for every peak with calculate_areas() on
+a noisy trace as long as a 3730 run, measuring all candidate peaks the way
+find_raw_peaks() reports them.
+
+    python benchmarks/bench_measure_peaks.py
+"""
+
+from timeit import repeat
+
+from numpy import arange, exp, percentile
+from numpy.random import default_rng
+from peakutils import indexes
+
+from fatoolsng.lib.fautil.algo import calculate_area, calculate_areas
+
+
+CASES = [
+    ('clean', 16000, 40, 0),
+    ('noisy', 16000, 40, 800),
+    ('dense', 16000, 40, 3000),
+]
+
+
+def make_trace(length, n_peaks, n_noise, seed=0):
+    rng = default_rng(seed)
+    x = arange(length)
+    y = abs(rng.normal(0, 3, length))
+    for c in rng.integers(500, length - 500, n_peaks):
+        y += rng.uniform(500, 3000) * exp(-0.5 * ((x - c) / 4)**2)
+    for c in rng.integers(500, length - 500, n_noise):
+        y += rng.uniform(20, 150) * exp(-0.5 * ((x - c) / 1.5)**2)
+    return y
+
+
+def best_of(func, number=1):
+    return min(repeat(func, number=number, repeat=3)) / number
+
+
+def main():
+    print(f"{'trace':8s} {'peaks':>6s} {'per-peak':>10s} {'vector':>10s} "
+          f"{'speed-up':>9s}")
+    for (name, length, n_peaks, n_noise) in CASES:
+        y = make_trace(length, n_peaks, n_noise)
+        rtimes = indexes(y, 1e-7, 10)
+        baseline = percentile(y, 50)
+
+        def scalar():
+            return [calculate_area(y, t, 5e-2, baseline)
+                    for t in rtimes.tolist()]
+
+        t_scalar = best_of(scalar)
+        t_vector = best_of(lambda: calculate_areas(y, rtimes, 5e-2, baseline),
+                           10)
+        print(f'{name:8s} {len(rtimes):6d} {t_scalar*1e3:8.1f}ms '
+              f'{t_vector*1e3:8.2f}ms {t_scalar/t_vector:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
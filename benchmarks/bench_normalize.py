@@ -0,0 +1,68 @@
+"""Benchmark baseline normalization of a 5-dye trace.
+
+Compares the per-channel scipy path (medfilt, two savgol_filter calls and a
+white_tophat for each dye) with normalize_channels() normalizing all dyes
+as one array, with and without the Michaelis-Menten fit on a 1991-wide
+median used by traceutils.
+
+    python benchmarks/bench_normalize.py
+"""
+
+from timeit import repeat
+
+from numpy import arange, exp, maximum, repeat as np_repeat, stack, int16
+from numpy.random import default_rng
+from scipy.ndimage import white_tophat
+from scipy.signal import medfilt, savgol_filter
+
+from fatoolsng.lib.fautil.normalize import normalize_channels, fit_mm
+
+
+LENGTHS = [10000, 15000, 20000]
+
+
+def make_traces(length, n_channels=5, seed=0):
+    rng = default_rng(seed)
+    x = arange(length)
+    traces = []
+    for _ in range(n_channels):
+        y = 200 + 400 * exp(-x / 3000) + rng.normal(0, 5, length)
+        for c in rng.integers(0, length, 40):
+            y += rng.uniform(100, 3000) * exp(-0.5 * ((x - c) / 4)**2)
+        traces.append(y)
+    return stack(traces).astype(int16)
+
+
+def per_channel(raw, mm_winsize=0):
+    results = []
+    for channel in raw:
+        baseline = savgol_filter(medfilt(channel, [399]), 399, 5)
+        corrected = maximum(channel - baseline, 0)
+        smooth = white_tophat(savgol_filter(corrected, 11, 5), None,
+                              np_repeat([1], int(round(channel.size * 0.01))))
+        if mm_winsize:
+            fit_mm(medfilt(channel, [mm_winsize]))
+        results.append(smooth)
+    return results
+
+
+def best_of(func, number=3):
+    return min(repeat(func, number=number, repeat=3)) / number
+
+
+def main():
+    print(f"{'samples':>8s} {'mm':>3s} {'per-channel':>12s} {'engine':>9s} "
+          f"{'speed-up':>9s}")
+    for length in LENGTHS:
+        raw = make_traces(length)
+        for mm_winsize in (0, 1991):
+            t_channel = best_of(lambda: per_channel(raw, mm_winsize))
+            t_engine = best_of(lambda: normalize_channels(
+                raw, mm_winsize=mm_winsize))
+            print(f'{length:8d} {"yes" if mm_winsize else "no":>3s} '
+                  f'{t_channel*1e3:10.1f}ms {t_engine*1e3:7.1f}ms '
+                  f'{t_channel/t_engine:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark PeakCache write throughput.
+
+Compares the previous behaviour (rollback journal, one commit per put) with
+WAL mode using per-put commits, a flush interval, put_many() and a
+transaction. Payloads are pickled peak lists of the size find_raw_peaks()
+returns for a typical channel.
+
+    python benchmarks/bench_peakcache.py [n_channels]
+"""
+
+import sqlite3
+from pickle import dumps as pickle_dumps
+from sys import argv
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from pathlib import Path
+
+from fatoolsng.lib.fautil.peakcache import PeakCache, _SCHEMA, _INSERT
+
+
+def make_items(n):
+    peaks = [(i * 37, 1000 + i, 5000 + i, i * 37 - 5, i * 37 + 5)
+             for i in range(60)]
+    payload = pickle_dumps(peaks)
+    return [(f'batch|S{i:05d}|S{i:05d}.fsa|20240101|DYE{i % 5}'.encode(),
+             payload) for i in range(n)]
+
+
+def legacy(path, items):
+    conn = sqlite3.connect(str(path))
+    conn.execute(_SCHEMA)
+    conn.commit()
+    for (key, value) in items:
+        conn.execute(_INSERT, (key.decode(), value))
+        conn.commit()
+    conn.close()
+
+
+def wal_put(path, items, flush_interval=1):
+    with PeakCache(path, flush_interval=flush_interval) as db:
+        for (key, value) in items:
+            db.put(key, value)
+
+
+def wal_put_many(path, items):
+    with PeakCache(path) as db:
+        db.put_many(items)
+
+
+def wal_transaction(path, items):
+    with PeakCache(path) as db:
+        with db.transaction():
+            for (key, value) in items:
+                db.put(key, value)
+
+
+CASES = [
+    ('commit per put (before)', legacy),
+    ('WAL, commit per put', wal_put),
+    ('WAL, flush_interval=64', lambda p, i: wal_put(p, i, 64)),
+    ('WAL, put_many', wal_put_many),
+    ('WAL, transaction', wal_transaction),
+]
+
+
+def main():
+    n = int(argv[1]) if len(argv) > 1 else 2000
+    items = make_items(n)
+    print(f'{n} channels')
+    print(f"{'mode':26s} {'time':>9s} {'puts/s':>10s} {'speed-up':>9s}")
+    baseline = None
+    with TemporaryDirectory() as tmpdir:
+        for (idx, (name, func)) in enumerate(CASES):
+            path = Path(tmpdir) / f'{idx}.db'
+            start = perf_counter()
+            func(path, items)
+            elapsed = perf_counter() - start
+            baseline = baseline or elapsed
+            print(f'{name:26s} {elapsed:8.3f}s {n/elapsed:10.0f} '
+                  f'{baseline/elapsed:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
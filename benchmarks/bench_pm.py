@@ -0,0 +1,63 @@
+"""Benchmark the pair minimization of align_pm().
+
+Aligns synthetic LIZ500 and LIZ600 ladder channels, with random sizing
+curves and spurious peaks, with align_pm() using minimize_score(), which
+runs one dp per iteration and updates its least squares fit with the pairs
+that changed, and using the reference that runs two dp per iteration and
+refits all pairs with estimate_z(), and counts identical alignments.
+
+    python benchmarks/bench_pm.py
+"""
+
+import copy
+from time import perf_counter
+
+from numpy.random import default_rng
+
+from fatoolsng.lib.const import ladders
+from fatoolsng.lib.fautil import alignutils, pmalign
+from fatoolsng.lib.fautil.algo import generate_scoring_function
+from fatoolsng.tests.ladder import make_ladder_peaks
+
+
+N_CHANNELS = 15
+
+
+def make_channel(seed, name):
+    ladder = dict(ladders[name])
+    ladder['qcfunc'] = generate_scoring_function(ladder['strict'],
+                                                 ladder['relax'])
+    peaks, _ = make_ladder_peaks(default_rng(seed), ladder['sizes'], 6)
+    return peaks, ladder
+
+
+def run(channels):
+    start = perf_counter()
+    results = [pmalign.align_pm(copy.deepcopy(peaks), ladder)
+               for (peaks, ladder) in channels]
+    return perf_counter() - start, [
+        [(size, p.rtime) for (size, p) in r.dpresult.sized_peaks]
+        for r in results]
+
+
+def main():
+    # silence the non-converging dp warnings of align_dp()
+    alignutils.cerr = lambda *args, **kwargs: None
+    minimize_score = pmalign.minimize_score
+    run([make_channel(0, 'LIZ500')])
+    print(f'{N_CHANNELS} synthetic ladder channels per ladder')
+    print(f"{'ladder':8s} {'minimization':13s} {'time':>9s} {'identical':>10s}")
+    for name in ('LIZ500', 'LIZ600'):
+        channels = [make_channel(seed, name) for seed in range(N_CHANNELS)]
+        pmalign.minimize_score = pmalign._minimize_score_refit
+        t, reference = run(channels)
+        print(f'{name:8s} {"refit":13s} {t*1e3:7.0f}ms')
+        pmalign.minimize_score = minimize_score
+        t, alignments = run(channels)
+        identical = sum(a == b for (a, b) in zip(alignments, reference))
+        print(f'{name:8s} {"incremental":13s} {t*1e3:7.0f}ms '
+              f'{identical:7d}/{N_CHANNELS}')
+
+
+if __name__ == '__main__':
+    main()
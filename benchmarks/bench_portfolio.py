@@ -0,0 +1,83 @@
+"""Benchmark racing the ladder aligners against trying them in sequence.
+
+Aligns the LIZ500 ladder channels of synthetic capillaries with spurious
+peaks, which keep align_hc() from aligning all but the first one, once with
+align_ladder(), which tries the aligners in sequence, and once racing them
+with fa --align --portfolio in a pool of worker processes that is started
+before timing. Each alignment follows a pause of IDLE seconds, as taken by
+reading and scanning the next file, in which replacements of cancelled
+workers start up. Reports the wall time, the score and the process time spent
+in each aligner, as recorded on the FSA.
+
+    python benchmarks/bench_portfolio.py [workers]
+"""
+
+import os
+import sys
+from contextlib import redirect_stdout
+from io import StringIO
+from time import perf_counter, sleep
+
+from numpy.random import default_rng
+
+from fatoolsng.lib import const, params
+from fatoolsng.lib.fautil import mixin
+from fatoolsng.lib.fautil.portfolio import (DEFAULT_PORTFOLIO,
+                                            get_aligner_pool,
+                                            parse_portfolio)
+from fatoolsng.tests.ladder import make_ladder_fsa, upload_panels
+
+
+N_CAPILLARIES = 4
+IDLE = 5
+
+
+def make_fsa(i):
+    rng = default_rng(i)
+    rtimes = [int(size * 10.5 + 150 + 8 * i + 0.002 * size**2)
+              for size in const.ladders['LIZ500']['sizes']]
+    if i > 0:
+        rtimes += list(rng.integers(600, 5400, 8))
+    return make_ladder_fsa(f'{i}.fsa', rtimes,
+                           rng.uniform(800, 2000, len(rtimes)))
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    upload_panels()
+    # silence the O: line of every alignment
+    mixin.cout = lambda *args: None
+
+    racing = params.Params()
+    racing.alignment = params.AlignmentParameter()
+    racing.alignment.portfolio = parse_portfolio(DEFAULT_PORTFOLIO)
+    racing.alignment.workers = workers
+    # start the workers
+    with redirect_stdout(StringIO()):
+        make_fsa(0).align(racing)
+
+    print(f'{N_CAPILLARIES} LIZ500 capillaries, portfolio {DEFAULT_PORTFOLIO} '
+          f'in {workers} workers, {os.cpu_count()} CPU')
+    print(f"{'mode':10s} {'fsa':4s} {'wall':>8s} {'score':>6s} "
+          f"aligner process time")
+    for (label, parameters) in [('sequence', params.Params()),
+                                ('portfolio', racing)]:
+        total = 0.0
+        for i in range(N_CAPILLARIES):
+            fsa = make_fsa(i)
+            sleep(IDLE)
+            start = perf_counter()
+            with redirect_stdout(StringIO()):
+                fsa.align(parameters)
+            t = perf_counter() - start
+            total += t
+            timings = ' '.join(f'{m}={s:.2f}s'
+                               for (m, s) in fsa.timings.items())
+            print(f'{label:10s} {i:<4d} {t:7.2f}s {fsa.score:6.2f} '
+                  f'{timings}')
+        print(f'{label:10s} {"all":4s} {total:7.2f}s')
+    get_aligner_pool(workers).close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark the sizing of the peaks of a run.
+
+Sizes the peaks of the non-ladder channels of 96 synthetic capillaries from
+their LIZ500 ladder peaks, as FSAMixIn.call() does, with the local Southern
+sizing fitting two quadratics per peak it replaces and with the sizers of
+sizing.py, built once per capillary and sizing all its peaks in one call.
+
+    python benchmarks/bench_sizing.py
+"""
+
+from time import perf_counter
+
+from numpy import abs as np_abs, array
+from numpy.random import default_rng
+
+from fatoolsng.lib.const import ladders
+from fatoolsng.lib.fautil.algo import Peak, _local_southern
+from fatoolsng.lib.fautil.sizing import CubicSpline, LeastSquare, LocalSouthern
+
+
+N_CAPILLARIES = 96
+# peaks in the 4 non-ladder channels of a capillary
+N_PEAKS = 4 * 60
+
+
+def make_capillary(seed):
+    """ return (ladder peaks, rtimes of the peaks) of a capillary """
+    rng = default_rng(seed)
+    a, b, c = rng.uniform(9, 12), rng.uniform(100, 900), rng.uniform(-4e-3,
+                                                                       4e-3)
+    peaks = []
+    for size in ladders['LIZ500']['sizes']:
+        p = Peak(rtime=int(a * size + b + c * size**2 + rng.normal(0, 2)))
+        p.size = size
+        p.qscore = rng.uniform(0.8, 1.0)
+        peaks.append(p)
+    rtimes = rng.integers(peaks[1].rtime + 1, peaks[-2].rtime, N_PEAKS)
+    return peaks, rtimes
+
+
+def per_peak(capillaries):
+    results = []
+    for (peaks, rtimes) in capillaries:
+        func = _local_southern(peaks)
+        results.append(array([func(rtime)[0] for rtime in rtimes]))
+    return results
+
+
+def batched(sizer):
+    def _size(capillaries):
+        return [sizer(peaks).size(rtimes)[0] for (peaks, rtimes)
+                in capillaries]
+    return _size
+
+
+def main():
+    capillaries = [make_capillary(seed) for seed in range(N_CAPILLARIES)]
+    print(f'{N_CAPILLARIES} capillaries of {N_PEAKS} peaks')
+    print(f"{'sizing':16s} {'time':>9s} {'max |size - reference|':>24s}")
+    reference = None
+    for (label, func) in [('per peak', per_peak),
+                          ('LocalSouthern', batched(LocalSouthern)),
+                          ('CubicSpline', batched(CubicSpline)),
+                          ('LeastSquare', batched(LeastSquare))]:
+        start = perf_counter()
+        results = func(capillaries)
+        t = perf_counter() - start
+        if reference is None:
+            reference = results
+        diff = max(np_abs(r - s).max() for (r, s) in zip(results, reference))
+        print(f'{label:16s} {t*1e3:7.1f}ms {diff:24.2e}')
+
+
+if __name__ == '__main__':
+    main()
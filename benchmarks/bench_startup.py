@@ -0,0 +1,77 @@
+"""Benchmark the start-up time of the fatoolsng commands.
+
+Every `fatoolsng <command>` run imports fatoolsng.scripts.<command> and
+builds its argument parser before doing anything. This times that in a
+fresh interpreter for each command, best of a few runs, less the time of
+a bare interpreter, and lists the heavy modules the import pulled in.
+
+Heavy modules are only to be imported by the stages that use them, so the
+benchmark fails (exit status 1) when a command loads one of them at
+start-up or takes longer than its budget:
+
+    python benchmarks/bench_startup.py
+"""
+
+from subprocess import run
+from sys import executable, exit as sys_exit
+from time import perf_counter
+
+
+HEAVY = ['jax', 'scipy', 'pandas', 'matplotlib', 'sqlalchemy']
+
+# start-up budget over a bare interpreter, in ms
+BUDGETS = {
+    'binsutil': 150,
+    'cache': 150,
+    'pack': 150,
+    'fautil': 150,
+    'convert': 150,
+    'dbmgr': 250,
+    'analyze': 400,
+    'fa': 400,
+    'facmd': 400,
+}
+
+REPEAT = 5
+
+SCRIPT = """\
+import sys
+from importlib import import_module
+import_module('fatoolsng.scripts.{command}').init_argparser()
+print(' '.join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def startup_time(code):
+    """ return (best wall time of running code, its output) """
+    best = None
+    for _ in range(REPEAT):
+        start = perf_counter()
+        proc = run([executable, '-c', code], capture_output=True, text=True,
+                   check=True)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, proc.stdout.strip()
+
+
+def main():
+    baseline, _ = startup_time('pass')
+    print(f'bare interpreter: {baseline*1e3:.0f}ms')
+    print(f"{'command':10s} {'start-up':>9s} {'budget':>7s}  heavy modules")
+    failed = []
+    for (command, budget) in BUDGETS.items():
+        t, loaded = startup_time(SCRIPT.format(command=command, heavy=HEAVY))
+        t = (t - baseline) * 1e3
+        status = ''
+        if loaded or t > budget:
+            failed.append(command)
+            status = '  FAIL'
+        print(f'{command:10s} {t:7.0f}ms {budget:5d}ms  {loaded or "-"}'
+              f'{status}')
+    if failed:
+        print(f"start-up regression: {', '.join(failed)}")
+        sys_exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark batched trace processing of a capillary run.
+
+Normalizes the 5 channels of 48 synthetic FSA of equal length and finds
+their local maxima FSA after FSA and channel after channel, as
+separate_channels() and find_raw_peaks() do, then for the whole run as one
+stacked array with tracebatch on each backend (JAX timed after its
+compilation).
+
+    python benchmarks/bench_tracebatch.py
+"""
+
+from time import perf_counter
+
+from numpy import append, arange, exp, stack
+from numpy.random import default_rng
+from peakutils import indexes
+
+from fatoolsng.lib.fautil.algo import NORMALIZATION_PARAMS
+from fatoolsng.lib.fautil.backend import BACKENDS, use_backend
+from fatoolsng.lib.fautil.normalize import normalize_channels
+from fatoolsng.lib.fautil.tracebatch import find_local_maxima, normalize_batch
+
+
+N_FSA = 48
+LENGTH = 16000
+MIN_DIST = 12
+
+
+def make_run(n_fsa, length, n_channels=5, seed=0):
+    rng = default_rng(seed)
+    x = arange(length)
+    run = []
+    for _ in range(n_fsa):
+        traces = rng.normal(200, 5, (n_channels, length))
+        for trace in traces:
+            for c in rng.integers(0, length, 40):
+                trace += rng.uniform(100, 3000) * exp(-0.5 * ((x - c) / 4)**2)
+        run.append(traces.astype(int))
+    return run
+
+
+def timed(func):
+    start = perf_counter()
+    result = func()
+    return perf_counter() - start, result
+
+
+def per_channel(run):
+    t_norm, signals = timed(lambda: [normalize_channels(
+        raw, **NORMALIZATION_PARAMS).signal for raw in run])
+    t_peaks, _ = timed(lambda: [indexes(append(row, [0, 0, 0]), 1e-7,
+                                        MIN_DIST)
+                                for signal in signals for row in signal])
+    return t_norm, t_peaks
+
+
+def batched(run):
+    raw = stack([row for traces in run for row in traces])
+    t_norm, nc = timed(lambda: normalize_batch(raw, **NORMALIZATION_PARAMS))
+    offsets = [0] * len(raw)
+    t_peaks, _ = timed(lambda: find_local_maxima(nc.signal, offsets,
+                                                 MIN_DIST))
+    return t_norm, t_peaks
+
+
+def main():
+    run = make_run(N_FSA, LENGTH)
+    print(f'{N_FSA} FSA of 5 channels of {LENGTH} scans')
+    print(f"{'mode':14s} {'normalize':>10s} {'maxima':>9s} {'total':>9s}")
+    rows = [('per channel', per_channel(run))]
+    for name in BACKENDS:
+        with use_backend(name):
+            batched(run)
+            rows.append((f'batched {name}', batched(run)))
+    for (label, (t_norm, t_peaks)) in rows:
+        print(f'{label:14s} {t_norm*1e3:8.0f}ms {t_peaks*1e3:7.0f}ms '
+              f'{(t_norm + t_peaks)*1e3:7.0f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark warm-start alignment of the capillaries of a run.
+
+Aligns the LIZ500 ladder channels of a synthetic run of 4 capillaries whose
+sizing curves drift by a few scans from one capillary to the next, with
+spurious peaks that keep align_hc() from aligning all but the first one.
+Each capillary is aligned from scratch, as fa --align does, then from the
+z of its aligned sibling, as fa --align --warm-start does.
+
+    python benchmarks/bench_warmstart.py
+"""
+
+from contextlib import redirect_stdout
+from io import StringIO
+from time import perf_counter
+
+from numpy.random import default_rng
+
+from fatoolsng.lib import const, params
+from fatoolsng.lib.fautil import mixin
+from fatoolsng.lib.fautil.cmds import do_warm_align
+from fatoolsng.tests.ladder import make_ladder_fsa, upload_panels
+
+
+N_CAPILLARIES = 4
+
+
+def make_fsa(i):
+    rng = default_rng(i)
+    rtimes = [int(size * 10.5 + 150 + 8 * i + 0.002 * size**2)
+              for size in const.ladders['LIZ500']['sizes']]
+    if i > 0:
+        rtimes += list(rng.integers(600, 5400, 8))
+    return make_ladder_fsa(f'{i}.fsa', rtimes,
+                           rng.uniform(800, 2000, len(rtimes)))
+
+
+def timed(func, fsa_list):
+    start = perf_counter()
+    with redirect_stdout(StringIO()):
+        func(fsa_list)
+    return perf_counter() - start
+
+
+def cold(fsa_list):
+    for (fsa, sample_code) in fsa_list:
+        fsa.align(params.Params())
+
+
+def warm(fsa_list):
+    do_warm_align(fsa_list, params.Params())
+
+
+def main():
+    upload_panels()
+    # silence the O: line of every alignment
+    mixin.cout = lambda *args: None
+
+    print(f'{N_CAPILLARIES} LIZ500 capillaries')
+    print(f"{'mode':6s} {'total':>9s} {'aligned':>8s} {'min score':>10s}")
+    for (label, func) in [('cold', cold), ('warm', warm)]:
+        fsa_list = [(make_fsa(i), str(i)) for i in range(N_CAPILLARIES)]
+        t = timed(func, fsa_list)
+        nladder = sum(fsa.nladder == 16 for (fsa, _) in fsa_list)
+        score = min(fsa.score for (fsa, _) in fsa_list)
+        print(f'{label:6s} {t*1e3:7.0f}ms {nladder:5d}/{N_CAPILLARIES} '
+              f'{score:10.2f}')
+
+
+if __name__ == '__main__':
+    main()
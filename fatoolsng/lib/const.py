@@ -64,6 +64,8 @@ class alignmethod(str, Enum):
     sh_strict       = 'sh|strict'
     sh_relax        = 'sh|relax'
     de_relax        = 'de|relax'
+    ws_strict       = 'ws|strict'
+    ws_relax        = 'ws|relax'
 
 
 class scanningmethod(str, Enum):
@@ -21,20 +21,24 @@ High-level pipeline (via FSAMixIn methods)::
 
 from __future__ import annotations
 
-from jax.numpy import polyfit, linspace, repeat
-from numpy import poly1d  # , exp
-from jax.numpy import sum, append, insert, maximum, array, percentile
+from numpy import (poly1d, argsort, asarray as np_asarray, append as np_append,
+                   sort as np_sort, percentile as np_percentile,
+                   insert as np_insert, concatenate as np_concatenate,
+                   where as np_where, ones as np_ones, zeros as np_zeros,
+                   arange as np_arange, sum as np_sum, log2 as np_log2,
+                   stack as np_stack, pad as np_pad, unique as np_unique,
+                   inf, errstate)
+from numpy.lib.stride_tricks import sliding_window_view
 from math import log2
+from time import process_time
 
-from fatoolsng.lib.utils import cerr, cverr, is_verbosity
+from fatoolsng.lib.utils import cerr, cverr
 from fatoolsng.lib import const
 from fatoolsng.lib.fautil.hcalign import align_hc
 from fatoolsng.lib.fautil.gmalign import align_gm, align_sh, align_de
 from fatoolsng.lib.fautil.pmalign import align_pm
-from fatoolsng.lib.fautil.traceio import WAVELENGTH
+from fatoolsng.lib.fautil.wsalign import align_ws
 
-from scipy.ndimage import white_tophat
-from scipy.signal import medfilt, savgol_filter
 from scipy.optimize import curve_fit
 from peakutils import indexes
 from sortedcontainers import SortedListWithKey
@@ -45,6 +49,11 @@ from typing import Any, Callable
 from numpy.typing import NDArray
 
 from fatoolsng.lib.fautil.alignutils import AlignResult, estimate_z
+from fatoolsng.lib.fautil.backend import get_backend
+from fatoolsng.lib.fautil.peaktable import PeakTable
+from fatoolsng.lib.fautil.normalize import normalize_channels
+from fatoolsng.lib.fautil.cwt import cwt_find_peaks
+from fatoolsng.lib.fautil.sizing import Sizer, LocalSouthern
 
 
 @dataclass(repr=False)
@@ -95,10 +104,8 @@ class Channel:
         result = align_peaks(self, params.ladder, ladders, qcfunc)
 
 
-def scan_peaks(channel: Any, params: Any, offset: int = 0) -> list:
-    """
-    """
-    cerr(f'I: scanning peaks for: {channel}')
+def scan_setup(channel: Any, params: Any, offset: int = 0) -> tuple[int, int]:
+    """ return (offset, expected_peak_number) for scanning channel """
 
     # check if channel is ladder channel, and
     # adjust expected_peak_number accordingly
@@ -114,27 +121,53 @@ def scan_peaks(channel: Any, params: Any, offset: int = 0) -> list:
         offset = int(round(f(min_size)))
         channel.offset = offset
 
-    initial_peaks = find_peaks(channel.data, params, offset,
-                               expected_peak_number)
+    return offset, expected_peak_number
+
+
+def scan_peaks(channel: Any, params: Any, offset: int = 0,
+               indices: NDArray | None = None) -> PeakTable:
+    """ find the peaks of channel and set them as its alleles
+
+        indices, the local maxima of the channel data past the offset, are
+        detected here unless they have been (see tracebatch.scan_channels())
+    """
+    cerr(f'I: scanning peaks for: {channel}')
+
+    offset, expected_peak_number = scan_setup(channel, params, offset)
+    peaks = find_peaks(channel.data, params, offset, expected_peak_number,
+                       indices)
+
+    # alleles are created from the peak table by the channel, possibly lazily
+    channel.set_peaks(peaks)
+
+    channel.status = const.channelstatus.scanned
+    return peaks
+
+
+def create_alleles(channel: Any, peaks: PeakTable) -> list:
+    """ create scanned alleles of channel from peaks """
 
-    # create alleles based on these peaks
     alleles = []
-    for p in initial_peaks:
-        allele = channel.Allele(rtime=p.rtime, rfu=p.rfu, area=p.area,
-                                brtime=p.brtime, ertime=p.ertime,
-                                wrtime=p.wrtime, srtime=p.srtime, beta=p.beta,
-                                theta=p.theta, omega=p.omega,)
+    columns = [peaks.rtime, peaks.rfu, peaks.area, peaks.brtime, peaks.ertime,
+               peaks.wrtime, peaks.srtime, peaks.beta, peaks.theta,
+               peaks.omega]
+    for (rtime, rfu, area, brtime, ertime, wrtime, srtime, beta, theta,
+         omega) in zip(*[c.tolist() for c in columns]):
+        allele = channel.Allele(rtime=rtime, rfu=rfu, area=area,
+                                brtime=brtime, ertime=ertime, wrtime=wrtime,
+                                srtime=srtime, beta=beta, theta=theta,
+                                omega=omega)
         allele.type = const.peaktype.scanned
         allele.method = const.binningmethod.notavailable
         allele.marker = channel.marker
         channel.add_allele(allele)
         alleles.append(allele)
 
-    channel.status = const.channelstatus.scanned
     return alleles
 
 
-def align_peaks(channel: Any, params: Any, ladder: dict, anchor_pairs: list | None = None) -> AlignResult:
+def align_peaks(channel: Any, params: Any, ladder: dict, anchor_pairs: list | None = None,
+                initial_z: Any = None) -> AlignResult:
     """
     returns (score, rss, dp, aligned_peak_number)
     """
@@ -148,7 +181,33 @@ def align_peaks(channel: Any, params: Any, ladder: dict, anchor_pairs: list | No
 
 #    anchor_pairs = pairs
 
-    alignresult = align_ladder(alleles, ladder, anchor_pairs)
+    portfolio = alignment_portfolio(params, anchor_pairs)
+    if portfolio:
+        from fatoolsng.lib.fautil.portfolio import align_ladder_portfolio
+        alignresult = align_ladder_portfolio(ladder_peaks(channel), ladder,
+                                             portfolio,
+                                             params.alignment.workers,
+                                             initial_z)
+        return adopt_align_result(channel, alignresult)
+
+    alignresult = align_ladder(alleles, ladder, anchor_pairs, initial_z)
+    size_ladder_peaks(alignresult)
+
+    return alignresult
+
+
+def alignment_portfolio(params: Any, anchor_pairs: list | None = None
+                        ) -> list[tuple[str, float | None]] | None:
+    """ return the portfolio of aligners align_peaks() races with params,
+        or None if it runs align_ladder()
+    """
+    if params is None or anchor_pairs:
+        return None
+    return params.alignment.portfolio or None
+
+
+def size_ladder_peaks(alignresult: AlignResult) -> None:
+    """ set size, deviation and ladder type of the aligned ladder peaks """
 
     f = poly1d(alignresult.dpresult.z)
     for (size, allele) in alignresult.dpresult.sized_peaks:
@@ -156,101 +215,190 @@ def align_peaks(channel: Any, params: Any, ladder: dict, anchor_pairs: list | No
         allele.size = size
         allele.type = const.peaktype.ladder
 
+
+def ladder_peaks(channel: Any) -> list[Peak]:
+    """ return Peak copies of the channel alleles, which can be pickled and
+        aligned in another process
+    """
+
+    peaks = []
+    for a in channel.get_alleles():
+        p = Peak(a.rtime, a.rfu, a.area, a.brtime, a.ertime, a.srtime, a.beta,
+                 a.theta, a.omega)
+        p.wrtime = a.wrtime
+        peaks.append(p)
+    return peaks
+
+
+def adopt_align_result(channel: Any, alignresult: AlignResult) -> AlignResult:
+    """ transfer an alignment performed on ladder_peaks() copies back to the
+        alleles of channel, matching peaks by rtime
+    """
+
+    d_alleles = {}
+    for allele in channel.get_alleles():
+        allele.size = -1
+        allele.type = const.peaktype.scanned
+        d_alleles[allele.rtime] = allele
+
+    sized_peaks = []
+    for (size, peak) in alignresult.dpresult.sized_peaks:
+        allele = d_alleles[peak.rtime]
+        if hasattr(peak, 'qscore'):
+            allele.qscore = peak.qscore
+        sized_peaks.append((size, allele))
+
+    alignresult.dpresult.sized_peaks = sized_peaks
+    size_ladder_peaks(alignresult)
+
     return alignresult
 
 
-def align_ladder(alleles, ladder, anchor_pairs):
+# version of align_ladder(), part of the alignment cache key; increase when
+# the same peaks may be aligned differently
+ALIGNER_VERSION = 5
+
+
+def align_ladder(alleles, ladder, anchor_pairs, initial_z=None):
+    """ align alleles with ladder, starting from initial_z, the z of an
+        aligned sibling capillary, when given (see align_ws())
+
+        the process time spent in each aligner is set as the timings of
+        the returned AlignResult
+    """
+
+    timings = {}
+    result = _align_ladder(alleles, ladder, anchor_pairs, initial_z, timings)
+    result.timings = timings
+    return result
+
+
+def _align_ladder(alleles, ladder, anchor_pairs, initial_z, timings):
+
+    def timed(method, func, *args):
+        start_time = process_time()
+        try:
+            return func(*args)
+        finally:
+            timings[method] = (timings.get(method, 0.0) + process_time()
+                               - start_time)
 
     if anchor_pairs:
-        return align_pm(alleles, ladder, anchor_pairs)
+        return timed('pm', align_pm, alleles, ladder, anchor_pairs)
 
+    result = None
     if len(alleles) <= len(ladder['sizes']) + 5:
-        result = align_hc(alleles, ladder)
+        result = timed('hc', align_hc, alleles, ladder)
         if result.score > 0.9:
             return result
-        if result.initial_pairs:
-            result = align_gm(alleles, ladder, result.initial_pairs)
-            if result.score > 0.75:
-                return result
 
-    result = align_pm(alleles, ladder)
+    # a warm start passing only the relax criteria is kept as a fallback, so
+    # that it does not pre-empt the refinement of the align_hc() result
+    warm_result = None
+    if initial_z is not None:
+        warm_result = timed('ws', align_ws, alleles, ladder, initial_z)
+        if warm_result.score > 0.9:
+            return warm_result
+
+    if result is not None and result.initial_pairs:
+        result = timed('gm', align_gm, alleles, ladder, result.initial_pairs)
+        if result.score > 0.75:
+            return result
+
+    if warm_result is not None and warm_result.score > 0.75:
+        return warm_result
+
+    result = timed('pm', align_pm, alleles, ladder)
     if result.score > 0.75:
         return result
 
-    result = align_sh(alleles, ladder)
+    result = timed('sh', align_sh, alleles, ladder)
     if result.score > 0.75:
         return result
 
     # perform differential evolution
-    return align_de(alleles, ladder)
+    return timed('de', align_de, alleles, ladder)
 
 
 def call_peaks(channel: Any, params: Any, func: Callable, min_rtime: int, max_rtime: int) -> None:
 
-    for allele in channel.alleles:
-        if not min_rtime < allele.rtime < max_rtime:
-            continue
-        allele.size, allele.dev, allele.qcall, method = func(allele.rtime)
+    alleles = [allele for allele in channel.alleles
+               if min_rtime < allele.rtime < max_rtime]
+    if not alleles:
+        return
+
+    if isinstance(func, Sizer):
+        # size all alleles of the channel at once
+        sizes, devs, qcalls, _ = func.size([a.rtime for a in alleles])
+        results = zip(sizes.tolist(), devs.tolist(), qcalls.tolist())
+    else:
+        results = (func(allele.rtime)[:3] for allele in alleles)
+
+    for (allele, (size, dev, qcall)) in zip(alleles, results):
+        allele.size, allele.dev, allele.qcall = size, dev, qcall
         if allele.type == const.peaktype.scanned:
             allele.type = const.peaktype.called
 
 # helper functions
 
 
-def find_raw_peaks(data, params, offset, expected_peak_number=0):
+def find_raw_peaks(data, params, offset=0, expected_peak_number=0,
+                   indices=None):
     """
     params.min_dist
     params.norm_thres
     params.min_rfu
     params.max_peak_number
     """
-#   cut and pad data to overcome peaks at the end of array
-    obs_data = append(data[offset:], [0, 0, 0])
-    if False:  # expected_peak_number:
-        min_dist = params.min_dist
-        indices = []
-        norm_threshold = params.norm_thres
-        expected_peak_number = expected_peak_number * 1.8
-        while len(indices) <= expected_peak_number and norm_threshold > 1e-7:
-            indices = indexes(obs_data, norm_threshold, min_dist)
-            print(len(indices), norm_threshold)
-            norm_threshold *= 0.5
-    elif False:
-        indices = indexes(obs_data, params.norm_thres, params.min_dist)
-
-    indices = indexes(obs_data, 1e-7, params.min_dist)
+    data = np_asarray(data)
+    if indices is None:
+        # cut and pad data to overcome peaks at the end of array
+        obs_data = np_append(data[offset:], [0, 0, 0])
+
+        if params.method == 'cwt':
+            indices = find_cwt_peaks(obs_data, params)
+        else:
+            indices = indexes(obs_data, 1e-7, params.min_dist)
     cverr(5, f'## indices: {str(indices)}')
     cverr(3, f'## raw indices: {len(indices)}')
 
-    if len(indices) == 0:
-        return []
-
     # normalize indices
     if offset > 0:
         indices = indices + offset
 
 #   filter peaks by minimum rfu, and by maximum peak number after sorted by rfu
-    peaks = [Peak(int(i), int(data[i])) for i in indices
-             if data[i] >= params.min_rfu and params.min_rtime < i]
-#    peaks = sorted(peaks, key = lambda x: x.rfu )[:params.max_peak_number * 2]
-
+    rfus = data[indices]
+    keep = (rfus >= params.min_rfu) & (indices > params.min_rtime)
+    peaks = PeakTable.from_rtimes(indices[keep], rfus[keep])
 
     if expected_peak_number:
-        peaks.sort(key=lambda x: x.rfu, reverse=True)
-        peaks = peaks[: round(expected_peak_number * 2)]
-        peaks.sort(key=lambda x: x.rtime)
+        highest = argsort(-peaks.rfu, kind='stable')
+        peaks = peaks[np_sort(highest[:round(expected_peak_number * 2)])]
 
     cverr(3, f'## peak above min rfu: {len(peaks)}')
 
     return peaks
 
 
-def find_peaks(data, params, offset=0, expected_peak_number=0):
+def find_cwt_peaks(data, params, snap=3):
+    """ return indices of the maxima of the CWT response of data over
+        params.widths above params.min_snr, each moved to the highest sample
+        of data within snap samples
+    """
+    indices = cwt_find_peaks(data, params.widths, params.min_snr)
+    if not len(indices):
+        return indices
+    windows = sliding_window_view(np_pad(data, snap, constant_values=-inf),
+                                  2 * snap + 1)[indices]
+    return np_unique(indices + windows.argmax(axis=1) - snap)
+
+
+def find_peaks(data, params, offset=0, expected_peak_number=0, indices=None):
 
-    peaks = find_raw_peaks(data, params, offset, expected_peak_number)
+    peaks = find_raw_peaks(data, params, offset, expected_peak_number, indices)
 
     # check for any peaks
-    if not peaks:
+    if not len(peaks):
         return peaks
 
     # measure peaks parameters
@@ -273,22 +421,17 @@ def find_peaks(data, params, offset=0, expected_peak_number=0):
     return peaks
 
 
-def measure_peaks(peaks, data, offset=0):
+def measure_peaks(peaks: PeakTable, data, offset=0):
 
-    (q50, q70) = percentile(data[offset:], [50, 75])
-    for p in peaks:
-        p.area, p.brtime, p.ertime, p.srtime, ls, rs = calculate_area(data,
-                                                                      p.rtime,
-                                                                      5e-2,
-                                                                      q50)
-        p.wrtime = p.ertime - p.brtime
-        p.beta = p.area / p.rfu
-        if p.wrtime == 0:
-            p.theta = 0
-            p.omega = 0
-        else:
-            p.theta = p.rfu / p.wrtime
-            p.omega = p.area / p.wrtime
+    data = np_asarray(data)
+    (q50, q70) = np_percentile(data[offset:], [50, 75])
+    (peaks.area, peaks.brtime, peaks.ertime, peaks.srtime,
+     l_shared, r_shared) = calculate_areas(data, peaks.rtime, 5e-2, q50)
+    wrtime = peaks.wrtime
+    peaks.beta = peaks.area / peaks.rfu
+    with errstate(divide='ignore', invalid='ignore'):
+        peaks.theta = np_where(wrtime == 0, 0, peaks.rfu / wrtime)
+        peaks.omega = np_where(wrtime == 0, 0, peaks.area / wrtime)
 
 
 def calculate_area(y, t, threshold, baseline):
@@ -318,7 +461,7 @@ def half_area(y, threshold, baseline):
     threshold = threshold/2
     shared = False
     area = y[0]
-    edge = float(sum(y[0:winsize]))/winsize
+    edge = float(np_sum(y[0:winsize]))/winsize
     old_edge = 2 * edge
 
     index = 1
@@ -328,7 +471,7 @@ def half_area(y, threshold, baseline):
            index < limit and y[index] >= baseline):
         old_edge = edge
         area += y[index]
-        edge = float(sum(y[index:index+winsize]))/winsize
+        edge = float(np_sum(y[index:index+winsize]))/winsize
         index += 1
     if edge >= old_edge:
         shared = True
@@ -337,6 +480,65 @@ def half_area(y, threshold, baseline):
     return area, index, shared
 
 
+def calculate_areas(y, rtimes, threshold, baseline):
+    """ return calculate_area() results of all peaks at rtimes as arrays
+        (area, brtime, ertime, srtime, l_shared, r_shared)
+    """
+
+    y = np_asarray(y, dtype=float)
+    rtimes = np_asarray(rtimes, dtype=int)
+
+    r_area, r_index, r_shared = half_areas(y, rtimes, threshold, baseline, 1)
+    l_area, l_index, l_shared = half_areas(y, rtimes, threshold, baseline, -1)
+
+    with errstate(divide='ignore', invalid='ignore'):
+        srtime = np_log2(r_area / l_area)
+
+    return (l_area + r_area - y[rtimes], rtimes - l_index, rtimes + r_index,
+            srtime, l_shared, r_shared)
+
+
+def half_areas(y, rtimes, threshold, baseline, direction):
+    """ return half_area() results of all peaks at rtimes as arrays
+        (area, index, shared), walking to the right (direction = 1) or to
+        the left (direction = -1) of each peak
+    """
+
+    # windowed sums in the walking direction, ie. y[i] + y[i+1] + y[i+2] to
+    # the right, summed in the same order as half_area()
+    winsize = 3
+    padded = np_append(y if direction > 0 else y[::-1], [0.0] * (winsize - 1))
+    window = padded[:len(y)] + padded[1:len(y) + 1]
+    window += padded[2:len(y) + 2]
+    if direction < 0:
+        window = window[::-1]
+    edges = window / winsize
+
+    threshold = threshold/2
+    area = y[rtimes].copy()
+    edge = edges[rtimes]
+    old_edge = 2 * edge
+    index = np_ones(len(rtimes), dtype=int)
+    limit = len(y) - rtimes if direction > 0 else rtimes + 1
+
+    # walk all peaks one sample at a time, until their own stop condition
+    active = np_arange(len(rtimes))
+    while len(active):
+        pos = rtimes[active] + direction * index[active]
+        inside = index[active] < limit[active]
+        pos = np_where(inside, pos, rtimes[active])
+        ok = ((edge[active] > area[active] * threshold) &
+              (edge[active] < old_edge[active]) & inside &
+              (y[pos] >= baseline))
+        active, pos = active[ok], pos[ok]
+        old_edge[active] = edge[active]
+        area[active] += y[pos]
+        edge[active] = edges[pos]
+        index[active] += 1
+
+    return area, index - 1, edge >= old_edge
+
+
 def math_func(x, a, b):
     # return a*exp(x*b)
     return a*x + b
@@ -346,7 +548,7 @@ def quadratic_math_func(x, a, b, c):
     return a*x**2 + b*x + c
 
 
-def filter_for_artifact(peaks, params, expected_peak_number=0):
+def filter_for_artifact(peaks: PeakTable, params, expected_peak_number=0):
     """
     params.max_peak_number
     params.artifact_ratio
@@ -360,43 +562,21 @@ def filter_for_artifact(peaks, params, expected_peak_number=0):
     if len(peaks) == expected_peak_number:
         return peaks
 
+    rtime, rfu, area = peaks.rtime, peaks.rfu, peaks.area
+    beta, theta, omega = peaks.beta, peaks.theta, peaks.omega
+
     # we need to adapt to the noise level of current channel
     if expected_peak_number > 0:
         epn = expected_peak_number
-        theta_peaks = sorted(peaks, key=lambda x: x.theta,
-                             reverse=True)[round(epn/2)+3:epn-1]
-        # theta_peaks = theta_peaks[2:4] + theta_peaks[round(epn/2):epn-1]
-        omega_peaks = sorted(peaks, key=lambda x: x.omega, reverse=True)
-        omega_peaks = omega_peaks[2:4] + omega_peaks[round(epn/2):epn-1]
-        rfu_peaks = sorted(peaks, key=lambda x: x.rfu, reverse=True)[:epn-1]
-
-        if theta_peaks[-1].theta < 8:
-            theta_peaks.sort()
-            thetas = array([p.theta for p in theta_peaks])
-            rtimes = [p.rtime for p in theta_peaks]
-
-            # plt.scatter(rtimes, thetas)
-            # plt.show()
-            popt, pcov = curve_fit(math_func, rtimes, 0.5 * thetas, p0=[-1, 1])
-
-            if is_verbosity(4):
-                xx = linspace(rtimes[0], rtimes[-1]+2000, 100)
-                yy = math_func(xx, *popt)
-                plt.plot(xx, yy)
-                plt.scatter([p.rtime for p in peaks], [p.theta for p in peaks])
-                plt.show()
-
-            q_theta = lambda x: x.theta >= math_func(x.rtime,
-                                                     *popt) or x.theta > 100
+        omega_order = argsort(-omega, kind='stable')
+        omega_idx = np_concatenate([omega_order[2:4],
+                                    omega_order[round(epn/2):epn-1]])
+        rfu_idx = argsort(-rfu, kind='stable')[:epn-1]
 
-        else:
-            q_theta = lambda x: x.theta >= min(theta_peaks[-1].theta,
-                                               params.min_theta)
-
-        if omega_peaks[-1].omega < 200:
-            omega_peaks.sort()
-            omegas = array([p.omega for p in omega_peaks])
-            rtimes = array([p.rtime for p in omega_peaks])
+        if omega[omega_idx[-1]] < 200:
+            omega_idx = omega_idx[argsort(rtime[omega_idx], kind='stable')]
+            omegas = omega[omega_idx]
+            rtimes = rtime[omega_idx]
 
             # generate a quadratic threshold for omega
 
@@ -405,9 +585,6 @@ def filter_for_artifact(peaks, params, expected_peak_number=0):
                                    (rtimes[0] + rtimes[-1])/2, rtimes[-1]],
                                    [0.05, 0.25, 0.05])
             ratios = quadratic_math_func(rtimes, *popt)
-            if is_verbosity(4):
-                plt.plot(rtimes, ratios)
-                plt.show()
 
             # use the ratios to enforce quadratic threshold
             popt, pcov = curve_fit(quadratic_math_func, rtimes,
@@ -416,107 +593,51 @@ def filter_for_artifact(peaks, params, expected_peak_number=0):
                 # enforce small flat ratio
                 popt, pcov = curve_fit(math_func, rtimes, 0.25 * omegas,
                                        p0=[1, 0])
-                popt = insert(popt, 0, 0.0)  # convert to 3 params
-            if is_verbosity(4):
-                plt.scatter(rtimes, omegas)
-                xx = linspace(rtimes[0], rtimes[-1]+2000, 100)
-                yy = quadratic_math_func(xx, *popt)
-                plt.plot(xx, yy)
-                plt.scatter([p.rtime for p in peaks], [p.omega for p in peaks])
-                plt.show()
-
-            q_omega = lambda x: (x.omega >= 100 or
-                                 x.omega >= quadratic_math_func(x.rtime,
-                                                                *popt))
+                popt = np_insert(popt, 0, 0.0)  # convert to 3 params
+
+            q_omega = ((omega >= 100) |
+                       (omega >= quadratic_math_func(rtime, *popt)))
 
         else:
 
-            q_omega = lambda x: x.omega >= min(omega_peaks[-1].omega, 50)
+            q_omega = omega >= min(omega[omega_idx[-1]], 50)
 
-        min_rfu = rfu_peaks[-1].rfu * 0.125
+        min_rfu = rfu[rfu_idx[-1]] * 0.125
 
     else:
-        min_theta = 0
-        min_omega = 0
-        min_theta_omega = 0
+        q_omega = np_ones(len(peaks), dtype=bool)
         min_rfu = 2
 
     # filter for too sharp/thin peaks
-    filtered_peaks = []
-    for p in peaks:
-        # filtered_peaks.append(p); continue
-        cverr(5, str(p))
-
-        if len(filtered_peaks) < 2 and p.area > 50:
-            # first two real peaks might be a bit lower
-            filtered_peaks.append(p)
-            continue
-
-        if not q_omega(p):
-            cverr(5, '! q_omega')
-            continue
-        # if not q_theta(p):
-        #    print('! q_theta')
-        #    continue
-
-        # if min_theta and min_omega and p.omega < min_omega and p.theta < min_theta:
-        #    print('! omega & theta')
-        #    continue
-        # if min_theta_omega and p.theta * p.omega < min_theta_omega:
-        #    print('! theta_omega')
-        #    continue
-        if p.theta < 1.0 and p.area < 25 and p.omega < 5:
-            cverr(5, '! extreme theta & area & omega')
-            continue
-        if p.rfu < min_rfu:
-            cverr(5, '! extreme min_rfu')
-            continue
-        if p.beta > 25 and p.theta < 0.5:
-            cverr(5, '! extreme beta')
-            continue
-        if p.wrtime < 3:
-            continue
-        if p.rfu >= 25 and p.beta * p.theta < 6:
-            continue
-        if p.rfu < 25 and p.beta * p.theta < 3:
-            continue
-        # if p.omega < 50:
-        #    continue
-        # if p.omega < 100 and p.theta < 5:
-        #    continue
-        # if (params.max_beta and min_theta and
-        #     (p.beta > params.max_beta and p.theta < min_theta)):
-        #    print('! max_beta')
-        #    continue
-        filtered_peaks.append(p)
-
-
-    # filter for distance between peaks and their rfu ratio
-    peaks = sorted(filtered_peaks, key=lambda x: x.rtime)
-    non_artifact_peaks = []
+    accepted = (q_omega &
+                ~((theta < 1.0) & (area < 25) & (omega < 5)) &
+                (rfu >= min_rfu) &
+                ~((beta > 25) & (theta < 0.5)) &
+                (peaks.wrtime >= 3) &
+                ~((rfu >= 25) & (beta * theta < 6)) &
+                ~((rfu < 25) & (beta * theta < 3)))
+
+    # first two real peaks might be a bit lower
+    n_accepted = 0
     for idx in range(len(peaks)):
-        p = peaks[idx]
-
-        if idx > 0:
-            prev_p = peaks[idx-1]
-            if (p.brtime - prev_p.ertime < params.artifact_dist
-                and p.rfu < params.artifact_ratio * prev_p.rfu):
-                # we are artifact, just skip
-                print('artifact1:', p)
-                continue
-
-        if idx < len(peaks)-1:
-            next_p = peaks[idx+1]
-            if (next_p.brtime - p.ertime < params.artifact_dist
-                and p.rfu < params.artifact_ratio * next_p.rfu):
-                # we are artifact, just skip
-                print('artefact2:', p)
-                continue
-
-        non_artifact_peaks.append(p)
+        if n_accepted >= 2:
+            break
+        if area[idx] > 50:
+            accepted[idx] = True
+        n_accepted += accepted[idx]
 
-
-    peaks = non_artifact_peaks
+    # filter for distance between peaks and their rfu ratio
+    peaks = peaks[accepted].sorted('rtime')
+    close = peaks.brtime[1:] - peaks.ertime[:-1] < params.artifact_dist
+    artifact = np_zeros(len(peaks), dtype=bool)
+    artifact[1:] |= close & (peaks.rfu[1:] <
+                             params.artifact_ratio * peaks.rfu[:-1])
+    artifact[:-1] |= close & (peaks.rfu[:-1] <
+                              params.artifact_ratio * peaks.rfu[1:])
+    if artifact.any():
+        cverr(5, f'## artifact peaks: {peaks.rtime[artifact].tolist()}')
+
+    peaks = peaks[~artifact]
 
     cverr(3, f'## non artifact peaks: {len(peaks)}')
 
@@ -548,6 +669,12 @@ class NormalizedTrace:
         return tuple()
 
 
+# normalize_baseline() parameters used for FSA channels, these are part of
+# the channel cache key
+NORMALIZATION_PARAMS = dict(medwinsize=399, savgol_size=11, savgol_order=5,
+                            tophat_factor=0.01)
+
+
 def normalize_baseline(raw, medwinsize=399, savgol_size=11, savgol_order=5,
                        tophat_factor=0.01):
     """
@@ -556,15 +683,10 @@ def normalize_baseline(raw, medwinsize=399, savgol_size=11, savgol_order=5,
     params.savgol_size
     """
 
-    median_line = medfilt(raw, [medwinsize])
-    baseline = savgol_filter(median_line, medwinsize, savgol_order)
-    corrected_baseline = raw - baseline
-    maximum(corrected_baseline, 0, out=corrected_baseline)
-    savgol = savgol_filter(corrected_baseline, savgol_size, savgol_order)
-    smooth = white_tophat(savgol, None,
-                          repeat([1], int(round(raw.size * tophat_factor))))
+    nc = normalize_channels(raw, medwinsize, savgol_size, savgol_order,
+                            tophat_factor)
 
-    return NormalizedTrace(signal=smooth, baseline=baseline)
+    return NormalizedTrace(signal=nc.signal[0], baseline=nc.baseline[0])
 
 
 @dataclass
@@ -584,34 +706,19 @@ def separate_channels(trace: Any) -> list:
     # return a list of ['dye name', dye_wavelength, numpy_array,
     #                   numpy_smooth_baseline ]
 
-    results = []
-    for (idx, data_idx) in [(1, 1), (2, 2), (3, 3), (4, 4), (5, 105)]:
-        try:
-            dye_name = trace.get_data(b(f'DyeN{idx}')).decode('UTF-8')
-
-            # below is to workaround on some strange dye names
-            if dye_name == '6FAM':
-                dye_name = '6-FAM'
-            elif dye_name == 'PAT':
-                dye_name = 'PET'
-            elif dye_name == 'Bn Joda':
-                dye_name = 'LIZ'
+    channels = list(trace.get_channels().values())
 
-            try:
-                dye_wavelength = trace.get_data(b(f'DyeW{idx}'))
-            except KeyError:
-                dye_wavelength = WAVELENGTH[dye_name]
+    # normalize channels of equal length, usually all of them, in one pass
+    smooth_channels = [None] * len(channels)
+    for length in {len(c.raw) for c in channels}:
+        indices = [i for (i, c) in enumerate(channels) if len(c.raw) == length]
+        nc = normalize_channels(np_stack([channels[i].raw for i in indices]),
+                                **NORMALIZATION_PARAMS)
+        for (i, signal) in zip(indices, nc.signal):
+            smooth_channels[i] = signal
 
-            raw_channel = array(trace.get_data(b(f'DATA{data_idx}')))
-            nt = normalize_baseline(raw_channel)
-
-            results.append(
-                TraceChannel(dye_name, dye_wavelength, raw_channel, nt.signal)
-            )
-        except KeyError:
-            pass
-
-    return results
+    return [TraceChannel(c.dye_name, c.wavelength, np_asarray(c.raw), smooth)
+            for (c, smooth) in zip(channels, smooth_channels)]
 
 
 def generate_scoring_function(strict_params, relax_params):
@@ -666,13 +773,21 @@ def generate_scoring_function(strict_params, relax_params):
     return _scoring_func
 
 
-def local_southern(ladder_alleles: list) -> Callable:
-    """ southern local interpolation """
+def local_southern(ladder_alleles: list) -> LocalSouthern:
+    """ southern local interpolation, see sizing.LocalSouthern """
+    return LocalSouthern(ladder_alleles)
+
+
+def _local_southern(ladder_alleles: list) -> Callable:
+    """ southern local interpolation, fitting the quadratics of every rtime
+        (reference implementation of sizing.LocalSouthern)
+    """
 
     ladder_allele_sorted = SortedListWithKey(ladder_alleles,
                                              key=lambda k: k.rtime)
     x = [p.rtime for p in ladder_allele_sorted]
     y = [p.size for p in ladder_allele_sorted]
+    B = get_backend()
 
     def _f(rtime):
         """ return (size, deviation)
@@ -682,12 +797,12 @@ def local_southern(ladder_alleles: list) -> Callable:
         idx = ladder_allele_sorted.bisect_key_right(rtime)
 
         # left curve
-        z1 = polyfit(x[idx-2:idx+1], y[idx-2:idx+1], 2)
+        z1 = B.polyfit(x[idx-2:idx+1], y[idx-2:idx+1], 2)
         size1 = poly1d(z1)(rtime)
         min_score1 = min(x.qscore for x in ladder_allele_sorted[idx-2:idx+1])
 
         # right curve
-        z2 = polyfit(x[idx-1:idx+2], y[idx-1:idx+2], 2)
+        z2 = B.polyfit(x[idx-1:idx+2], y[idx-1:idx+2], 2)
         size2 = poly1d(z2)(rtime)
         min_score2 = min(x.qscore for x in ladder_allele_sorted[idx-1:idx+2])
 
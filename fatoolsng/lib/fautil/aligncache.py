@@ -0,0 +1,158 @@
+"""SQLite-backed cache of ladder alignment results.
+
+Each entry is keyed by a hash of the scanned peaks of a ladder channel, the
+ladder definition (const.ladders), the anchor pairs, the warm-start z, the
+racing portfolio of aligners and the aligner version,
+and holds the result of align_ladder() as JSON: score, method, message, z,
+rss, DP score and the (size, rtime, qscore) of the sized peaks. A cached
+result is turned back into an AlignResult whose sized peaks are Peak copies,
+to be transferred to the channel alleles by algo.adopt_align_result().
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from functools import lru_cache
+from hashlib import sha256
+from json import dumps as json_dumps, loads as json_loads
+from pathlib import Path
+from typing import Any, Iterable
+
+from numpy import asarray
+
+from fatoolsng.lib import const
+from fatoolsng.lib.fautil.algo import ALIGNER_VERSION, Peak
+from fatoolsng.lib.fautil.alignutils import AlignResult, DPResult
+from fatoolsng.lib.fautil.channelcache import _code_version
+from fatoolsng.lib.fautil.peaktable import PeakTable
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS align_cache (
+    key        TEXT PRIMARY KEY,
+    data       TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+"""
+
+# peak columns set by alignment rather than by scanning
+_ALIGNED_COLUMNS = ('size', 'bin')
+
+# ladder entries derived from the ladder definition and stored into it by
+# the aligners (scoring function, size tree and clusters of align_hc())
+_DERIVED_LADDER_KEYS = ('qcfunc', 'T', 'C')
+
+
+def default_align_cache_path(base: str | Path | None = None) -> Path:
+    """ return the alignment cache file under base (defaults to home) """
+    base = Path.home() if base is None else Path(base)
+    return base / '.fatools_caches' / 'alignments.sqlite'
+
+
+class AlignCache:
+    """Alignment results keyed by ladder peaks, ladder and aligner version.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # Keys
+
+    @staticmethod
+    def key(peaks: Iterable[Any], ladder: dict,
+            anchor_pairs: list | None = None,
+            initial_z: Iterable[float] | None = None,
+            portfolio: list | None = None) -> str:
+        """ return cache key of the alignment of peaks, the scanned peaks of
+            a ladder channel, with ladder and anchor_pairs, starting from
+            initial_z if given, by racing the [(method, timeout), ...] of
+            portfolio if given
+        """
+        data = PeakTable.from_peaks(peaks).data
+        for name in _ALIGNED_COLUMNS:
+            data[name] = -1
+        h = sha256(data.tobytes())
+        h.update(json_dumps({k: v for (k, v) in ladder.items()
+                             if k not in _DERIVED_LADDER_KEYS},
+                            sort_keys=True).encode())
+        h.update(json_dumps(anchor_pairs, default=int).encode())
+        if initial_z is not None:
+            h.update(json_dumps([float(v) for v in initial_z]).encode())
+        if portfolio:
+            h.update(f'portfolio|{json_dumps(portfolio)}'.encode())
+        h.update(f'{ALIGNER_VERSION}|{_code_version()}'.encode())
+        return h.hexdigest()
+
+    # ------------------------------------------------------------------
+    # Read
+
+    def get(self, key: str) -> AlignResult | None:
+        """ return the AlignResult stored under key or None """
+        row = self._conn.execute(
+            'SELECT data FROM align_cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            d = json_loads(row[0])
+            sized_peaks = []
+            for (size, rtime, qscore) in d['sized_peaks']:
+                p = Peak(rtime=rtime)
+                if qscore is not None:
+                    p.qscore = qscore
+                sized_peaks.append((size, p))
+            dpresult = DPResult(d['dpscore'], d['rss'], asarray(d['z']),
+                                sized_peaks)
+            return AlignResult(d['score'], d['msg'], dpresult,
+                               const.alignmethod(d['method']))
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    # ------------------------------------------------------------------
+    # Write
+
+    def put(self, key: str, result: AlignResult) -> None:
+        """ store result, an AlignResult with a DPResult, under key """
+        dpresult = result.dpresult
+        d = {'score': float(result.score), 'msg': result.msg,
+             'method': const.alignmethod(result.method).value,
+             'dpscore': float(dpresult.dpscore), 'rss': float(dpresult.rss),
+             'z': [float(v) for v in dpresult.z],
+             'sized_peaks': [(float(size), int(p.rtime), _qscore(p))
+                             for (size, p) in dpresult.sized_peaks]}
+        self._conn.execute('INSERT OR REPLACE INTO align_cache (key, data) '
+                           'VALUES (?, ?)', (key, json_dumps(d)))
+        self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # Maintenance
+
+    def __len__(self) -> int:
+        return self._conn.execute(
+            'SELECT COUNT(*) FROM align_cache').fetchone()[0]
+
+    def clear(self) -> int:
+        """ remove all entries, return the number of removed entries """
+        removed = self._conn.execute('DELETE FROM align_cache').rowcount
+        self._conn.commit()
+        return removed
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _qscore(peak: Any) -> float | None:
+    qscore = getattr(peak, 'qscore', None)
+    return None if qscore is None else float(qscore)
+
+
+@lru_cache(maxsize=None)
+def get_align_cache(path: str | Path) -> AlignCache:
+    """ return an AlignCache shared by all callers using the same path """
+    return AlignCache(path)
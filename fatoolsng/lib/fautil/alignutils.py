@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 from fatoolsng.lib.utils import cerr  # , cout
-from fatoolsng.lib.fautil.dpalign import dp
-from numpy import poly1d, asarray as _np_asarray, zeros as np_zeros
-from jax.numpy import polyfit, linspace, log10
+from fatoolsng.lib.fautil.dpalign import dp, gaussian_scores, GAP_PENALTY
+from fatoolsng.lib.fautil.backend import get_backend
+from numpy import (poly1d, asarray as _np_asarray, linspace,
+                   zeros as _np_zeros, arange as _np_arange,
+                   outer as _np_outer, convolve as _np_convolve)
+from numpy.linalg import solve as _np_solve
+from math import log10
 from dataclasses import dataclass
 from typing import Any, Callable
-from math import sqrt, log, exp
 from numpy.typing import NDArray
 
 
@@ -17,6 +20,8 @@ class AlignResult:
     dpresult: DPResult | None
     method: Any
     initial_pairs: list | None = None
+    # seconds of process time spent in each aligner, by method
+    timings: dict[str, float] | None = None
 
 
 @dataclass
@@ -67,7 +72,7 @@ def estimate_z(x: list | NDArray, y: list | NDArray, degree: int = 3) -> ZResult
         rss ~ SUM( (f(x) - y)**2 ) for all (x,y)
     """
     x, y = _np_asarray(x, dtype=float), _np_asarray(y, dtype=float)
-    z = polyfit(x, y, degree)
+    z = get_backend().polyfit(x, y, degree)
     p = poly1d(z)
     y_p = p(x)
     rss = ((y_p - y) ** 2).sum()
@@ -75,6 +80,75 @@ def estimate_z(x: list | NDArray, y: list | NDArray, degree: int = 3) -> ZResult
     return ZResult(z, rss, p)
 
 
+class PolyFit:
+    """ least squares polynomial fit of y ~ f(x), updated pair by pair
+
+        the normal equations are kept in t = (x - center)/scale, with the
+        x range given at creation mapped to [-1, 1], so that adding or
+        dropping a pair is a rank-1 update or downdate of a small well
+        conditioned system instead of a refit of all pairs
+    """
+
+    def __init__(self, degree: int, lower: float, upper: float) -> None:
+        self.degree = degree
+        self.center = (lower + upper) / 2
+        self.scale = max((upper - lower) / 2, 1.0)
+        self.AtA = _np_zeros((degree + 1, degree + 1))
+        self.Aty = _np_zeros(degree + 1)
+        self.yty = 0.0
+        self.pairs: set[tuple[float, float]] = set()
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+    def _row(self, x: float) -> NDArray:
+        t = (x - self.center) / self.scale
+        return t ** _np_arange(self.degree, -1, -1)
+
+    def add(self, x: float, y: float, weight: float = 1.0) -> None:
+        row = self._row(x)
+        self.AtA += weight * _np_outer(row, row)
+        self.Aty += weight * y * row
+        self.yty += weight * y * y
+        if weight > 0:
+            self.pairs.add((x, y))
+        else:
+            self.pairs.discard((x, y))
+
+    def remove(self, x: float, y: float) -> None:
+        self.add(x, y, -1.0)
+
+    def update(self, pairs: list[tuple[float, float]]) -> None:
+        """ set the fitted pairs, updating only those that changed """
+        pairs = set(pairs)
+        for (x, y) in self.pairs - pairs:
+            self.remove(x, y)
+        for (x, y) in pairs - self.pairs:
+            self.add(x, y)
+
+    def _coefficients(self) -> NDArray:
+        return _np_solve(self.AtA, self.Aty)
+
+    @property
+    def z(self) -> NDArray:
+        """ coefficients of f in x, highest order first as estimate_z() """
+        if len(self.pairs) <= self.degree:
+            return estimate_z(*zip(*sorted(self.pairs)), self.degree).z
+        # substitute t = (x - center)/scale by Horner's scheme
+        t = [1 / self.scale, -self.center / self.scale]
+        coefficients = self._coefficients()
+        z = coefficients[:1]
+        for c in coefficients[1:]:
+            z = _np_convolve(z, t)
+            z[-1] += c
+        return z
+
+    @property
+    def rss(self) -> float:
+        c = self._coefficients()
+        return float(max(self.yty - 2 * c @ self.Aty + c @ self.AtA @ c, 0.0))
+
+
 def generate_similarity(peaks: list) -> list[float]:
 
     rfus = [p.rfu for p in peaks]
@@ -121,9 +195,11 @@ def pair_f(f, rtimes, std_sizes, similarity, deviation=False):
     std_sizes = list(reversed(std_sizes))
     similarity = list(reversed(similarity))
 
-    S = generate_scores(std_sizes, rtimes, similarity, f)
+    # f is evaluated once, for both the scores and the deviations
+    rtime_sizes = f(_np_asarray(rtimes, dtype=float))
+    S = gaussian_scores(std_sizes, rtime_sizes, similarity)
 
-    result = dp(S, -5e-3)
+    result = dp(S, GAP_PENALTY)
 
     matches = result['matches']
     aligned_peaks = [(rtimes[j], std_sizes[i]) for i, j in matches]
@@ -132,14 +208,16 @@ def pair_f(f, rtimes, std_sizes, similarity, deviation=False):
         return aligned_peaks
 
     peak_pairs = []
-    for (rtime, size) in aligned_peaks:
-        rtime_size = f(rtime)
-        peak_pairs.append((rtime, size, rtime_size, (size-rtime_size)**2))
+    for i, j in matches:
+        rtime_size = rtime_sizes[j]
+        size = std_sizes[i]
+        peak_pairs.append((rtimes[j], size, rtime_size, (size-rtime_size)**2))
 
     return peak_pairs
 
 
-def generate_scores(sizes, rtimes, similarity, func, tolerance=4):
+def generate_scores(sizes, rtimes, similarity, func, tolerance=4,
+                    banded=False):
     """ return a numpy matrix for scoring peak similarity
             func -> polynomial fit funcs
             size[bp] = func(rtime[sec])
@@ -153,19 +231,13 @@ def generate_scores(sizes, rtimes, similarity, func, tolerance=4):
 
         S[ladder][peak] = 1 if ladder & peak are similar
 
+        func is evaluated once for the whole rtimes vector; with banded=True
+        only the cells within the size cutoff are evaluated, the rest are
+        zero (see dpalign.gaussian_scores()).
     """
-    M = np_zeros((len(sizes), len(rtimes)), dtype='d')
-
-    _TOL = 0.001
-    cutoff = tolerance * sqrt(-1.0 * log(_TOL))
-    ladder_N = len(sizes)
-
-    for c in range(0, len(rtimes)):
-        size = func(rtimes[c])
-        for r in range(0, len(sizes)):
-            M[r][c] = similarity[c]*exp(-((size-sizes[r])/(tolerance))**2 / 2)
-
-    return M
+    rtime_sizes = func(_np_asarray(rtimes, dtype=float))
+    return gaussian_scores(sizes, rtime_sizes, similarity, tolerance,
+                           banded)
 
 
 def plot(rtimes, sizes, z, peak_pairs):
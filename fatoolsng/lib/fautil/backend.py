@@ -0,0 +1,125 @@
+"""Numeric backend of the fautil trace and alignment math.
+
+The array kernels of the pipeline (the FFTs of the wavelet transform,
+polynomial fits of ladder alignment and sizing, the legacy smoothing
+helpers) call the functions of the current Backend instead of importing
+numpy or jax.numpy themselves. NumPy is the default; JAX is selected with
+set_backend('jax'), use_backend('jax') or the FATOOLSNG_BACKEND
+environment variable. set_backend() also sets the variable, so that
+worker processes run with the backend of their parent.
+
+Kernels take NumPy arrays and return NumPy arrays (Backend.to_numpy()),
+so callers can keep modifying results in place whatever the backend. The
+SciPy filters of normalize.py have no JAX counterpart and always run on
+NumPy. The dynamic programming of dpalign (gaussian_scores(), dp(),
+dp_batch()) also stays on NumPy: it fills small score matrices row after
+row in place, with a running maximum per row, which immutable JAX arrays
+would turn into a copy and a dispatch per row.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from functools import cached_property, lru_cache
+from importlib import import_module
+from os import environ
+from typing import Any, Iterator
+
+
+BACKENDS = ('numpy', 'jax')
+
+ENV_BACKEND = 'FATOOLSNG_BACKEND'
+
+_MODULES = {
+    # name: (array module, fft module)
+    'numpy': ('numpy', 'scipy.fft'),
+    'jax': ('jax.numpy', 'jax.numpy.fft'),
+}
+
+
+class Backend:
+    """ the array functions of one numeric library
+
+        attributes not defined here are looked up in the array module, eg.
+        backend.percentile is numpy.percentile or jax.numpy.percentile
+    """
+
+    def __init__(self, name: str) -> None:
+        if name == 'jax':
+            # sizing needs double precision, JAX computes in float32 by
+            # default
+            from jax import config
+            config.update('jax_enable_x64', True)
+        self.name = name
+        self.xp = import_module(_MODULES[name][0])
+
+    def __repr__(self) -> str:
+        return f'<Backend: {self.name}>'
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.xp, attr)
+
+    @cached_property
+    def fft(self) -> Any:
+        """ rfft/irfft functions, scipy.fft for NumPy """
+        return import_module(_MODULES[self.name][1])
+
+    def asarray(self, a: Any, dtype: Any = None) -> Any:
+        """ return a as an array of the backend """
+        if self.name == 'numpy':
+            return self.xp.asarray(a, dtype=dtype)
+        from numpy import asarray
+        a = asarray(a, dtype=dtype)
+        # JAX rejects non-native byte orders, eg. ABIF '>i2' traces
+        if not a.dtype.isnative:
+            a = a.astype(a.dtype.newbyteorder('='))
+        return self.xp.asarray(a)
+
+    def to_numpy(self, a: Any) -> Any:
+        """ return a as a writable NumPy array """
+        from numpy import array, asarray
+        if self.name == 'numpy':
+            return asarray(a)
+        return array(a)
+
+    def polyfit(self, x: Any, y: Any, deg: int) -> Any:
+        """ return the coefficients of the least squares polynomial fit """
+        return self.to_numpy(self.xp.polyfit(self.asarray(x, dtype=float),
+                                             self.asarray(y, dtype=float),
+                                             deg))
+
+
+@lru_cache(maxsize=None)
+def _load(name: str) -> Backend:
+    return Backend(name)
+
+
+_current: Backend | None = None
+
+
+def get_backend() -> Backend:
+    """ return the current backend, from FATOOLSNG_BACKEND on first use """
+    if _current is None:
+        set_backend(environ.get(ENV_BACKEND) or 'numpy')
+    return _current
+
+
+def set_backend(name: str) -> Backend:
+    """ select the backend used from now on and by new worker processes """
+    global _current
+    if name not in BACKENDS:
+        raise ValueError(f'unknown numeric backend: {name!r}, '
+                         f"choose from {', '.join(BACKENDS)}")
+    _current = _load(name)
+    environ[ENV_BACKEND] = name
+    return _current
+
+
+@contextmanager
+def use_backend(name: str) -> Iterator[Backend]:
+    """ select a backend within a with block """
+    previous = get_backend().name
+    try:
+        yield set_backend(name)
+    finally:
+        set_backend(previous)
@@ -1,7 +1,7 @@
 from pandas import read_table
 from dataclasses import dataclass, field
 from ruamel.yaml import YAML as yaml
-from jax.numpy import round, mean, percentile, median
+from fatoolsng.lib.fautil.backend import get_backend
 from fatoolsng.lib.fautil.mixin import BinMixIn
 from fatoolsng.lib.utils import cout, cerr
 from collections import defaultdict
@@ -35,7 +35,8 @@ def do_optimize(args):
 
     p = d[d['MARKER'] == args.marker].copy()
 
-    counts = round(p['SIZE'])
+    B = get_backend()
+    counts = B.to_numpy(B.round(B.asarray(p['SIZE'])))
 
     c = defaultdict(int)
     for i in counts:
@@ -93,12 +94,15 @@ class BinContainer:
     values: list = field(default_factory=list)
 
     def repr(self):
-        return (f"<Bin: {self.size} / {mean(self.values):5.4f} / {median(self.values):5.4f}"
+        B = get_backend()
+        values = B.asarray(self.values)
+        return (f"<Bin: {self.size} / {float(B.mean(values)):5.4f} / {float(B.median(values)):5.4f}"
                 f" / {min(self.values):5.4f} - {max(self.values):5.4f}"
                 f" d: {max(self.values) - min(self.values):5.4f} f: {len(self.values)}>")
 
     def percentile(self, q):
-        return percentile(self.values, q)
+        B = get_backend()
+        return B.to_numpy(B.percentile(B.asarray(self.values), B.asarray(q)))
 
     def d(self):
         return max(self.values) - min(self.values)
@@ -163,7 +167,7 @@ def adjust_bins(bins, stat, reset=False, repeats=-1):
                 q1 = values[:idx]
                 q2 = values[idx+1:]
             b[1] = float(med)
-            percentiles = percentile(s.values, [10, 50, 90])
+            percentiles = s.percentile([10, 50, 90])
             if not reset and s.d() > 0.5:
                 # b[2] = float(mean(q1))
                 # b[3] = float(mean(q2))
@@ -0,0 +1,190 @@
+"""Content-addressed cache of normalized FSA channels.
+
+Each entry is a directory named after a hash of the FSA file content, the
+normalization parameters and the cache version. It holds a small JSON
+description of the channels and one raw .npy file per channel, so channel
+data can be memory-mapped on load. The least recently used entries are
+evicted once the cache grows beyond its maximum size.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from hashlib import sha256
+from importlib.metadata import version, PackageNotFoundError
+from json import dumps as json_dumps, load as json_load
+from os import utime, getpid
+from pathlib import Path
+from shutil import rmtree
+from typing import Any
+
+from numpy import asarray, save as np_save, load as np_load
+
+
+# increase when the layout of cache entries or their keys change, or when
+# normalize_channels() produces different channels for the same parameters
+CACHE_FORMAT = 3
+
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3
+
+_META = 'channels.json'
+
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def _code_version() -> str:
+    try:
+        return version('fatoolsng')
+    except PackageNotFoundError:
+        return 'unknown'
+
+
+def parse_size(size: str | int) -> int:
+    """ return number of bytes for sizes such as 512M or 2G """
+    if isinstance(size, int):
+        return size
+    size = size.strip().upper().removesuffix('B')
+    if size[-1:] in _UNITS:
+        return int(float(size[:-1]) * _UNITS[size[-1]])
+    return int(size)
+
+
+def default_cache_path(base: str | Path | None = None) -> Path:
+    """ return the channel cache directory under base (defaults to home) """
+    base = Path.home() if base is None else Path(base)
+    return base / '.fatools_caches' / 'channels'
+
+
+class ChannelCache:
+    """Directory of normalized channels keyed by FSA content and parameters.
+    """
+
+    def __init__(self, path: str | Path,
+                 max_size: int = DEFAULT_MAX_SIZE) -> None:
+        self.path = Path(path)
+        self.max_size = max_size
+        self._size: int | None = None
+
+    # ------------------------------------------------------------------
+    # Keys
+
+    @staticmethod
+    def key(raw_data: bytes | None, params: dict[str, Any],
+            digest: str | None = None) -> str:
+        """ return cache key of FSA content normalized with params
+
+            digest, the sha256 hex digest of the FSA content, can be given
+            instead of the content
+        """
+        if digest is None:
+            digest = sha256(raw_data).hexdigest()
+        h = sha256(bytes.fromhex(digest))
+        h.update(json_dumps(params, sort_keys=True).encode())
+        h.update(f'{CACHE_FORMAT}|{_code_version()}'.encode())
+        return h.hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.path / key[:2] / key
+
+    # ------------------------------------------------------------------
+    # Read
+
+    def get(self, key: str) -> list[tuple[str, int, Any]] | None:
+        """ return [(dye, wavelen, data), ...] or None if key is not cached
+
+            data are read-only arrays memory-mapped from the cache
+        """
+        entry = self._entry(key)
+        meta_file = entry / _META
+        try:
+            with open(meta_file) as f:
+                meta = json_load(f)
+            channels = [(c['dye'], c['wavelen'],
+                         np_load(entry / f'{i}.npy', mmap_mode='r'))
+                        for i, c in enumerate(meta['channels'])]
+        except (OSError, ValueError, KeyError):
+            return None
+        # mark as recently used
+        utime(meta_file)
+        return channels
+
+    # ------------------------------------------------------------------
+    # Write
+
+    def put(self, key: str, channels: list[tuple[str, int, Any]]) -> None:
+        """ store [(dye, wavelen, data), ...] under key """
+        entry = self._entry(key)
+        if (entry / _META).exists():
+            return
+
+        tmp_entry = entry.with_name(f'{key}.tmp{getpid()}')
+        tmp_entry.mkdir(parents=True, exist_ok=True)
+        meta = {'format': CACHE_FORMAT, 'channels': []}
+        for i, (dye, wavelen, data) in enumerate(channels):
+            np_save(tmp_entry / f'{i}.npy', asarray(data))
+            meta['channels'].append({'dye': dye, 'wavelen': int(wavelen)})
+        # write the description last, an entry is only valid with it
+        with open(tmp_entry / _META, 'w') as f:
+            f.write(json_dumps(meta))
+
+        try:
+            tmp_entry.rename(entry)
+        except OSError:
+            # another process has stored the same entry
+            rmtree(tmp_entry, ignore_errors=True)
+            return
+
+        if self._size is not None:
+            self._size += _entry_size(entry)
+        if self.size() > self.max_size:
+            self.prune(self.max_size)
+
+    # ------------------------------------------------------------------
+    # Maintenance
+
+    def entries(self) -> list[tuple[float, int, Path]]:
+        """ return [(last_access, size, entry_path), ...], oldest first """
+        entries = []
+        for meta_file in self.path.glob(f'??/*/{_META}'):
+            try:
+                atime = meta_file.stat().st_mtime
+            except OSError:
+                continue
+            entries.append((atime, _entry_size(meta_file.parent),
+                            meta_file.parent))
+        entries.sort()
+        return entries
+
+    def size(self) -> int:
+        """ return total size of cache entries in bytes """
+        if self._size is None:
+            self._size = sum(e[1] for e in self.entries())
+        return self._size
+
+    def prune(self, max_size: int) -> tuple[int, int]:
+        """ evict least recently used entries until the cache is not larger
+            than max_size, return (removed entries, removed bytes)
+        """
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        removed = removed_size = 0
+        for (atime, size, entry) in entries:
+            if total <= max_size:
+                break
+            rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+            removed_size += size
+        self._size = total
+        return removed, removed_size
+
+
+def _entry_size(entry: Path) -> int:
+    return sum(f.stat().st_size for f in entry.iterdir())
+
+
+@lru_cache(maxsize=None)
+def get_channel_cache(path: str | Path,
+                      max_size: int = DEFAULT_MAX_SIZE) -> ChannelCache:
+    """ return a ChannelCache shared by all callers using the same path """
+    return ChannelCache(path, max_size)
@@ -1,12 +1,14 @@
 # provide commands for Fragment Analysis (FA)
 from fatoolsng.lib import params
 from fatoolsng.lib.utils import cerr, cverr, cexit, tokenize, detect_buffer, set_verbosity, get_dbhandler  # , cout
+from fatoolsng.lib.fautil.backend import BACKENDS, set_backend
+from fatoolsng.lib.fautil.portfolio import DEFAULT_PORTFOLIO
 from sys import exit
 from argparse import ArgumentParser
 from ruamel.yaml import YAML as yaml
 from csv import DictReader
-from pathlib import Path
 from io import StringIO
+from itertools import islice
 from transaction import manager as transaction_manager
 
 
@@ -84,6 +86,12 @@ def init_argparser(parser=None):
     p.add_argument('--no-cache', default=False, action='store_true',
                    help='do not use caches')
 
+    p.add_argument('--cache-size', default='2G',
+                   help='maximum size of channel cache, eg. 500M or 2G (default: 2G)')
+
+    p.add_argument('--archive',
+                   help='trace archive created by the pack command to read FSA traces from')
+
     p.add_argument('--plot-file',
                    help='save --plot or --split-plot result into a file')
 
@@ -92,6 +100,32 @@ def init_argparser(parser=None):
     p.add_argument('--commit', default=False, action='store_true',
                    help='commit to database')
 
+    p.add_argument('--jobs', default=1, type=int,
+                   help='number of worker processes for --align (default: 1)')
+
+    p.add_argument('--warm-start', default=False, action='store_true',
+                   help='start the --align of each FSA from the sizing curve of an aligned FSA of the same run')
+
+    p.add_argument('--portfolio', nargs='?', const=DEFAULT_PORTFOLIO,
+                   metavar='METHODS',
+                   help=f'race the ladder aligners METHODS, method[:timeout seconds] separated by commas (default: {DEFAULT_PORTFOLIO}), in --jobs processes for each FSA of --align and accept the first passing the strict criteria')
+
+    p.add_argument('--stream', default=False, action='store_true',
+                   help='stream FSA files through the commands instead of opening all of them first')
+
+    p.add_argument('--window', default=0, type=int,
+                   help='maximum number of FSA in memory with --stream (defaults to --jobs)')
+
+    p.add_argument('--batched', default=False, action='store_true',
+                   help='normalize and scan channels of equal length of all FSA (or of each --stream window) together')
+
+    p.add_argument('--sizing', default='localsouthern',
+                   choices=['localsouthern', 'cubicspline', 'leastsquare'],
+                   help='sizing method of --call (default: localsouthern)')
+
+    p.add_argument('--backend', choices=BACKENDS,
+                   help='numeric backend of trace and alignment math (default: numpy, or FATOOLSNG_BACKEND)')
+
     return p
 
 
@@ -100,14 +134,26 @@ def main(args):
     if args.verbose != 0:
         set_verbosity(args.verbose)
 
+    if args.backend:
+        set_backend(args.backend)
+
     dbh = None
 
+    if args.stream:
+        if not (args.file or args.infile):
+            cexit('ERR: --stream requires --file or --infile argument!')
+        do_stream(args)
+        return
+
     if args.file or args.infile:
         cverr(4, 'D: opening FSA file(s)')
         fsa_list = open_fsa(args)
     elif dbh is None:
         cverr(4, 'D: connecting to database')
         dbh = get_dbhandler(args)
+        if args.archive:
+            from fatoolsng.lib.fautil.tracearchive import TraceArchive
+            dbh.FSA.trace_archive = TraceArchive(args.archive)
         fsa_list = get_fsa_list(args, dbh)
 
     cerr(f'I: obtained {len(fsa_list)} FSA')
@@ -146,6 +192,9 @@ def do_facmds(args, fsa_list, dbh=None):
     if args.gram:
         do_dendogram(args, fsa_list, dbh)
         executed += 1
+    if args.outfile:
+        do_export(args, fsa_list, dbh)
+        executed += 1
 
     if executed == 0:
         cerr('W: please provide a relevant command')
@@ -161,18 +210,129 @@ def do_align(args, fsa_list, dbh):
 
     cerr('I: Aligning size standards...')
 
+    if args.batched:
+        from fatoolsng.lib.const import assaystatus
+        from fatoolsng.lib.fautil.tracebatch import scan_channels
+        # as in FSA.align(), skip FSA that has been aligned previously
+        scan_channels([fsa.get_ladder_channel() for (fsa, sample_code)
+                       in fsa_list if fsa.status == assaystatus.normalized],
+                      params.Params())
+
+    parameters = params.Params()
+    jobs = args.jobs
+    if args.portfolio:
+        from fatoolsng.lib.fautil.portfolio import parse_portfolio
+        try:
+            portfolio = parse_portfolio(args.portfolio)
+        except ValueError as exc:
+            cexit(f'ERR: --portfolio: {exc}')
+        # the --jobs processes race the aligners of each FSA in turn
+        parameters.alignment = params.AlignmentParameter()
+        parameters.alignment.portfolio = portfolio
+        parameters.alignment.workers = max(jobs, 1)
+        jobs = 1
+
+    if args.warm_start:
+        do_warm_align(fsa_list, parameters, jobs)
+        return
+
+    if jobs > 1:
+        do_parallel_align(fsa_list, parameters, jobs)
+        return
+
     for (fsa, sample_code) in fsa_list:
         cverr(3, f'D: aligning FSA {fsa.filename}')
-        fsa.align(params.Params())
+        fsa.align(parameters)
 
 
 def do_call(args, fsa_list, dbh):
 
     cerr('I: Calling non-ladder peaks...')
 
+    parameters = params.Params()
+    parameters.sizing = params.SizingParameter()
+    parameters.sizing.method = args.sizing
+
+    if args.batched:
+        from fatoolsng.lib.fautil.tracebatch import scan_channels
+        channels = []
+        for (fsa, sample_code) in fsa_list:
+            # FSA.call() aligns first, non-ladder channels are scanned from
+            # their alignment
+            fsa.align(parameters)
+            ladder = fsa.get_ladder_channel()
+            channels += [c for c in fsa.channels if c != ladder]
+        scan_channels(channels, parameters)
+
     for (fsa, sample_code) in fsa_list:
         cverr(3, f'D: calling FSA {fsa.filename}')
-        fsa.call(params.Params(), args.marker)
+        fsa.call(parameters, args.marker)
+
+
+def do_export(args, fsa_list, dbh):
+
+    cerr(f'I: Writing peaks to {args.outfile}')
+
+    with open(args.outfile, 'w') as outstream:
+        write_peaks(outstream, fsa_list, header=True)
+
+
+def write_peaks(outstream, fsa_list, header=False):
+    """ write alleles of all channels as tab-delimited rows """
+
+    if header:
+        outstream.write('SAMPLE\tFILENAME\tMARKER\tDYE\tRTIME\tHEIGHT\tSIZE\n')
+    for (fsa, sample_code) in fsa_list:
+        for c in fsa.channels:
+            for p in c.alleles:
+                outstream.write(f'{sample_code}\t{fsa.filename}\t{c.marker.code}\t{c.dye}\t{p.rtime:d}\t{p.rfu:d}\t{p.size:5.3f}\n')
+
+
+def do_stream(args):
+    """ run clear, align, call and export over FSA files as a pipeline
+
+        at most args.window FSA are opened at any time, and their channel
+        data are released as soon as their peaks have been written
+    """
+
+    if args.plot or args.split_plot or args.ladder_plot or args.gram:
+        cexit('ERR: plotting commands need all FSA at once and cannot be used with --stream!')
+
+    window = args.window or max(args.jobs, 1)
+    cerr(f'I: streaming FSA with a window of {window} FSA')
+
+    outstream = open(args.outfile, 'w') if args.outfile else None
+    if outstream:
+        write_peaks(outstream, [], header=True)
+
+    counter = 0
+    try:
+        for fsa_list in iter_window(iter_fsa(args), window):
+            if args.batched:
+                create_channels(fsa_list)
+            if args.clear:
+                do_clear(args, fsa_list, None)
+            if args.align:
+                do_align(args, fsa_list, None)
+            if args.call:
+                do_call(args, fsa_list, None)
+            if outstream:
+                write_peaks(outstream, fsa_list)
+                outstream.flush()
+            for (fsa, sample_code) in fsa_list:
+                fsa.release()
+            counter += len(fsa_list)
+            cerr(f'I: processed {counter} FSA')
+    finally:
+        if outstream:
+            outstream.close()
+
+
+def iter_window(iterable, size):
+    """ yield lists of up to size consecutive items from iterable """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
 
 
 def do_plot(args, fsa_list, dbh):
@@ -224,7 +384,34 @@ def open_fsa(args):
         requires: args.file, args.panel, args.panelfile
     """
 
+    fsa_list = list(iter_fsa(args))
+    if args.batched:
+        create_channels(fsa_list)
+    return fsa_list
+
+
+def create_channels(fsa_list):
+    """ normalize the channels of FSA opened without channels together """
+
+    from fatoolsng.lib.fautil.tracebatch import create_channels
+
+    cerr(f'I: normalizing channels of {len(fsa_list)} FSA together')
+    create_channels([fsa for (fsa, sample_code) in fsa_list])
+
+
+def iter_fsa(args):
+    """ open FSA file(s) one at a time and yield (fsa, sample_code)
+        requires: args.file, args.panel, args.panelfile
+
+        with args.batched, channels not found in the cache are left to
+        create_channels()
+    """
+
     from fatoolsng.lib.fileio.models import Marker, Panel, FSA
+    from fatoolsng.lib.fautil.channelcache import (default_cache_path,
+                                                   parse_size)
+    from fatoolsng.lib.fautil.aligncache import (default_align_cache_path,
+                                                 get_align_cache)
 
     if not args.panel:
         cexit('ERR: using FSA file(s) requires --panel argument!')
@@ -243,24 +430,31 @@ def open_fsa(args):
         raise NotImplementedError()
 
     panel = Panel.get_panel(args.panel)
-    fsa_list = []
     index = 1
 
     # prepare caching
     cache_path = None
+    cache_size = parse_size(args.cache_size)
+    align_cache = None
     if not args.no_cache:
-        cache_path = Path.home() / '.fatools_caches' / 'channels'
-        if args.cache_path is not None:
-            cache_path = Path(args.cache_path) / '.fatools_caches' / 'channels'
+        cache_path = default_cache_path(args.cache_path)
         cache_path.mkdir(parents=True, exist_ok=True)
+        align_cache = get_align_cache(
+            default_align_cache_path(args.cache_path))
+
+    archive = None
+    if args.archive:
+        from fatoolsng.lib.fautil.tracearchive import TraceArchive
+        archive = TraceArchive(args.archive)
 
     if args.file:
         for fsa_filename in args.file.split(','):
             fsa_filename = fsa_filename.strip()
             fsa = FSA.from_file(fsa_filename, panel, cache=not args.no_cache,
-                                cache_path=cache_path)
-            # yield (fsa, str(i))
-            fsa_list.append((fsa, str(index)))
+                                cache_path=cache_path, cache_size=cache_size,
+                                archive=archive, normalize=not args.batched,
+                                align_cache=align_cache)
+            yield (fsa, str(index))
             index += 1
 
     elif args.infile:
@@ -289,19 +483,15 @@ def open_fsa(args):
 
             fsa = FSA.from_file(fsa_filename, panel, options,
                                 cache=not args.no_cache,
-                                cache_path=cache_path)
+                                cache_path=cache_path, cache_size=cache_size,
+                                archive=archive, normalize=not args.batched,
+                                align_cache=align_cache)
             if 'SAMPLE' in inrows.fieldnames:
-
-                # yield (fsa, r['SAMPLE'])
-                fsa_list.append((fsa, r['SAMPLE']))
+                yield (fsa, r['SAMPLE'])
             else:
-
-                # yield (fsa, str(index))
-                fsa_list.append((fsa, str(index)))
+                yield (fsa, str(index))
                 index += 1
 
-    return fsa_list
-
 
 def get_fsa_list(args, dbh):
     """
@@ -343,3 +533,121 @@ def get_fsa_list(args, dbh):
 
     cerr(f'I: number of assays to be processed: {len(fsa_list)}')
     return fsa_list
+
+
+# parallel work
+
+def do_warm_align(fsa_list, parameters, jobs=1):
+    """ align ladder channels of FSA of the same run, starting each
+        alignment from the z of the last FSA with the same ladder that
+        passed the strict criteria
+
+        with jobs > 1, FSA of each ladder are aligned one by one until one
+        passes the strict criteria, the remaining ones in a process pool
+        starting from its z
+    """
+
+    from fatoolsng.lib.const import assaystatus
+
+    seeds = {}
+    queued = {}
+    for (fsa, sample_code) in fsa_list:
+        ladder_code = fsa.panel.data['ladder']
+        if jobs > 1 and ladder_code in seeds:
+            queued.setdefault(ladder_code, []).append((fsa, sample_code))
+            continue
+        if fsa.status == assaystatus.normalized:
+            cverr(3, f'D: aligning FSA {fsa.filename}')
+            try:
+                fsa.align(parameters, initial_z=seeds.get(ladder_code))
+            except Exception as exc:
+                cerr(f'E: failed to align {fsa.filename}: {exc}')
+                continue
+        if fsa.status == assaystatus.aligned and fsa.score > 0.9:
+            seeds[ladder_code] = fsa.z
+
+    for (ladder_code, queue) in queued.items():
+        do_parallel_align(queue, parameters, jobs, seeds[ladder_code])
+
+
+def do_parallel_align(fsa_list, parameters, jobs, initial_z=None):
+    """ align ladder channels in a process pool
+
+        ladder channels are scanned here, and only the peaks of those not
+        found in the alignment cache are sent to the workers; results are
+        merged back in the order of fsa_list and a failure only leaves its
+        own FSA unaligned
+
+        initial_z is the warm start of all alignments (see do_warm_align())
+    """
+
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+    from time import process_time
+    from fatoolsng.lib.const import assaystatus
+    from fatoolsng.lib.fautil import algo
+
+    fsas = []
+    keys = []
+    payloads = []
+    for (fsa, sample_code) in fsa_list:
+        # as in FSA.align(), skip FSA that has been aligned previously
+        if fsa.status != assaystatus.normalized:
+            continue
+        try:
+            start_time = process_time()
+            c = fsa.get_ladder_channel()
+            c.scan(parameters)
+            ladder = {k: v for (k, v) in fsa.panel.get_ladder().items()
+                      if k != 'qcfunc'}
+            key = None
+            if fsa.align_cache is not None:
+                key = fsa.align_cache.key(c.get_alleles(), ladder, None,
+                                          initial_z)
+                result = fsa.align_cache.get(key)
+                if result is not None:
+                    algo.adopt_align_result(c, result)
+                    c.set_alignment(result, process_time() - start_time)
+                    continue
+            payloads.append((algo.ladder_peaks(c), ladder, initial_z))
+        except Exception as exc:
+            cerr(f'E: failed to scan ladder of {fsa.filename}: {exc}')
+            continue
+        fsas.append(fsa)
+        keys.append(key)
+
+    cerr(f'I: aligning {len(fsas)} FSA with {jobs} worker(s)')
+
+    # JAX is multithreaded, hence workers must not be forked
+    with ProcessPoolExecutor(max_workers=jobs,
+                             mp_context=get_context('spawn')) as executor:
+        for (fsa, key, (result, duration, error)) in zip(
+                fsas, keys, executor.map(align_ladder_p, payloads)):
+            if error:
+                cerr(f'E: failed to align {fsa.filename}: {error}')
+                continue
+            if key is not None:
+                fsa.align_cache.put(key, result)
+            c = fsa.get_ladder_channel()
+            algo.adopt_align_result(c, result)
+            c.set_alignment(result, duration)
+
+
+def align_ladder_p(args):
+    """ worker for do_parallel_align(), return (result, duration, error) """
+
+    from time import process_time
+    from fatoolsng.lib.fautil import algo
+
+    peaks, ladder, initial_z = args
+    ladder['qcfunc'] = algo.generate_scoring_function(ladder['strict'],
+                                                      ladder['relax'])
+    start_time = process_time()
+    try:
+        result = algo.align_ladder(peaks, ladder, None, initial_z)
+        if result.dpresult is None:
+            raise RuntimeError(result.msg)
+    except Exception as exc:
+        return (None, process_time() - start_time,
+                f'{exc.__class__.__name__}: {exc}')
+    return (result, process_time() - start_time, None)
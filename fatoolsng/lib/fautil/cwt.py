@@ -0,0 +1,85 @@
+"""Continuous wavelet transform peak detection with Ricker wavelets.
+
+cwt() computes the transform of a trace, or of every row of an array of
+traces, for all widths with one real FFT: the FFTs of the Ricker wavelets
+of all widths form a bank that is cached per (trace length, widths), so
+scanning the channels of a run reuses the same bank. The result is the
+same as convolving the trace with each wavelet (numpy.convolve, 'same'
+mode), at O(N log N) per width instead of O(N*w). The FFTs run on the
+current numeric backend (backend.py).
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any
+
+from numpy import (absolute, arange, asarray, atleast_2d, exp, percentile,
+                   pi, roll, sqrt, zeros)
+from numpy.typing import NDArray
+from scipy.fft import next_fast_len, rfft
+from scipy.signal import find_peaks
+
+from fatoolsng.lib.fautil.backend import get_backend
+
+
+# relative size of the round-off of FFT convolutions
+ROUNDOFF = 1e-9
+
+
+def ricker(points: int, a: float) -> NDArray:
+    """ return Ricker (Mexican hat) wavelet of width a over points samples """
+    A = 2 / (sqrt(3 * a) * (pi ** 0.25))
+    vec = arange(points) - (points - 1.0) / 2
+    tsq = vec ** 2
+    wsq = a ** 2
+    return A * (1 - tsq / wsq) * exp(-tsq / (2 * wsq))
+
+
+@lru_cache(maxsize=32)
+def ricker_bank(length: int, widths: tuple[float, ...]) -> tuple[int, NDArray]:
+    """ return (nfft, wavelet FFTs) for traces of length
+
+        each wavelet spans 10 * int(width) samples, at most length, and is
+        padded to nfft so that the FFT product is a linear convolution; it
+        is also rotated so that, as with numpy.convolve(mode='same'), the
+        output is centered on the wavelet
+    """
+    sizes = [min(10 * int(w), length) for w in widths]
+    nfft = next_fast_len(length + max(sizes) - 1, real=True)
+    bank = zeros((len(widths), nfft // 2 + 1), dtype=complex)
+    for (i, (w, n)) in enumerate(zip(widths, sizes)):
+        kernel = zeros(nfft)
+        kernel[:n] = ricker(n, w)[::-1]
+        bank[i] = rfft(roll(kernel, -((n - 1) // 2)))
+    bank.flags.writeable = False
+    return nfft, bank
+
+
+def cwt(data: Any, widths: Any) -> NDArray:
+    """ return the (n_widths, N) transform of a trace, or the
+        (n_traces, n_widths, N) transforms of an array of traces
+    """
+    B = get_backend()
+    data = asarray(data, dtype=float)
+    traces = atleast_2d(data)
+    length = traces.shape[-1]
+    nfft, bank = ricker_bank(length, tuple(float(w) for w in asarray(widths)))
+    spectra = (B.fft.rfft(B.asarray(traces), nfft)[:, None, :]
+               * B.asarray(bank)[None, :, :])
+    out = B.to_numpy(B.fft.irfft(spectra, nfft)[..., :length])
+    return out[0] if data.ndim == 1 else out
+
+
+def cwt_find_peaks(vector: Any, widths: Any, min_snr: float = 1) -> NDArray:
+    """ return positions of the maxima of the strongest CWT response over all
+        widths that rise min_snr times above the noise level, the 10th
+        percentile of the absolute response
+    """
+    response = cwt(vector, widths).max(axis=0)
+    noise = float(percentile(absolute(response), 10)) or 1.0
+    # maxima rising less than FFT round-off are flat parts of the response
+    tolerance = ROUNDOFF * float(absolute(response).max(initial=0))
+    peaks, _ = find_peaks(response, height=min_snr * noise,
+                          prominence=tolerance or None)
+    return peaks
@@ -1,15 +1,26 @@
-from numpy import poly1d, zeros as np_zeros
-from jax.numpy import polyfit, insert, array, log10, linspace
-from math import sqrt, exp, log
+from numpy import (poly1d, zeros as np_zeros, full as np_full,
+                   empty as np_empty, maximum as np_maximum,
+                   asarray as np_asarray, exp as np_exp, log10 as np_log10,
+                   log as np_log, sqrt as np_sqrt, argsort, searchsorted,
+                   insert, array, linspace, arange, where)
+from fatoolsng.lib.fautil.backend import get_backend
 # import pprint
 
-from matplotlib import pylab as plt
-
 # dynamic programming for peak alignment
 #
 # dp: y -> sizes
 #     x -> retention_time
 #
+# the score matrices and the DP run on NumPy whatever the numeric backend,
+# see backend.py
+#
+
+# gap penalty of the ladder alignment dp(), of pair_f() and ZFunc
+GAP_PENALTY = -5e-3
+
+# cells of a banded score matrix are evaluated within this many tolerances
+# of the ladder size, the score falls below exp(-BAND_CUTOFF**2 / 2) beyond
+BAND_CUTOFF = float(np_sqrt(-np_log(0.001)))
 
 
 def estimate_z(x, y, degree=3):
@@ -21,7 +32,7 @@ def estimate_z(x, y, degree=3):
         y ~ f(x) where f = poly1d(z)
         rss ~ SUM( (f(x) - y)**2 ) for all (x,y)
     """
-    z = polyfit(x, y, degree)
+    z = get_backend().polyfit(x, y, degree)
     p = poly1d(z)
     y_p = p(x)
     rss = ((y_p - y) ** 2).sum()
@@ -52,7 +63,7 @@ def align_peaks(ladders, peaks, z, rss):
 
         # pprint.pprint(S)
 
-        result = dp(S, -5e-3)
+        result = dp(S, GAP_PENALTY)
 
         # pprint.pprint(result)
 
@@ -90,7 +101,7 @@ def create_scoring_function(A, B):
     return _scoring
 
 
-def generate_scores(ladders, peaks, func, tolerance=4):
+def generate_scores(ladders, peaks, func, tolerance=4, banded=False):
     """ return a numpy matrix for scoring peak similarity
             func -> polynomial fit funcs
             size[bp] = func(rtime[sec])
@@ -105,32 +116,65 @@ def generate_scores(ladders, peaks, func, tolerance=4):
         S[ladder][peak] = 1 if ladder & peak are similar
 
     """
-    M = np_zeros((len(ladders), len(peaks)), dtype='d')
-
-    _TOL = 0.001
-    cutoff = tolerance * sqrt(-1.0 * log(_TOL))
-    highest_peak = max([x.height for x in peaks])
+    heights = np_asarray([x.height for x in peaks], dtype='d')
     ladder_N = len(ladders)
+    similarity = (np_log10(heights/heights.max()) + ladder_N)/ladder_N
+    rtimes = np_asarray([x.rtime for x in peaks], dtype='d')
+
+    return gaussian_scores(ladders, func(rtimes), similarity, tolerance,
+                           banded)
+
+
+def gaussian_scores(sizes, rtime_sizes, similarity, tolerance=4,
+                    banded=False):
+    """ return score matrix S[size][rtime] for the estimated sizes of rtimes
+
+            S = similarity[rtime] * exp(-((rtime_size - size)/tolerance)**2 / 2)
+
+        rtime_sizes of shape (batch, rtimes) give a stack of score matrices
+        of shape (batch, sizes, rtimes), one per row
+
+        with banded=True, only the cells of rtimes sized within BAND_CUTOFF
+        tolerances of the ladder size are evaluated, the rest are zero; the
+        dropped scores are small but not nil, so peaks sized between two
+        ladder sizes may align differently than with the dense matrix
+    """
+    sizes = np_asarray(sizes, dtype='d')
+    rtime_sizes = np_asarray(rtime_sizes, dtype='d')
+    similarity = np_asarray(similarity, dtype='d')
+
+    if banded:
+        return _banded_scores(sizes, rtime_sizes, similarity, tolerance)
+
+    delta = (rtime_sizes[..., None, :] - sizes[:, None]) / tolerance
+    return similarity * np_exp(-delta ** 2 / 2)
+
 
-    row = 0
-    col = 0
+def _banded_scores(sizes, rtime_sizes, similarity, tolerance):
+    """ return the banded score matrix of gaussian_scores() """
 
-    for ladder in ladders:
-        for peak in peaks:
-            size = func(peak.rtime)
-            similarity = (log10(peak.height/highest_peak) + ladder_N)/ladder_N
-            M[row][col] = similarity * exp(-((size-ladder)/(tolerance))**2 / 2)
-            # print(ladder, peak)
-            # print('  =>', '%3.2f' % size, '%1.2f' % similarity, M[row][col] )
-            col += 1
-        row += 1
-        col = 0
+    if rtime_sizes.ndim != 1:
+        raise ValueError('banded scores need a single row of rtime sizes')
 
-    return M
+    # the columns of each ladder size are a range of the sorted rtime sizes
+    order = argsort(rtime_sizes, kind='stable')
+    sorted_sizes = rtime_sizes[order]
+    cutoff = BAND_CUTOFF * tolerance
+    lo = searchsorted(sorted_sizes, sizes - cutoff, side='left')
+    hi = searchsorted(sorted_sizes, sizes + cutoff, side='right')
+
+    S = np_zeros((len(sizes), len(rtime_sizes)), dtype='d')
+    for (i, size) in enumerate(sizes):
+        cols = order[lo[i]:hi[i]]
+        delta = (rtime_sizes[cols] - size) / tolerance
+        S[i, cols] = similarity[cols] * np_exp(-delta ** 2 / 2)
+    return S
 
 
 def plot_z(peaks, ladders, z):
 
+    from matplotlib import pylab as plt
+
     # x = linspace(0, peaks[-1].rtime + 100)
     x = linspace(0, max(ladders))
     p = poly1d(z)
@@ -184,6 +228,11 @@ def dp(S, gap_penalty, peak_penalty=0):
     @summary: Solves optimal path in score matrix based on global sequence
     alignment
 
+    The score matrix is filled one row at a time: the match and gap moves
+    from the previous row are evaluated for the whole row at once, and the
+    moves within the row are resolved with a running maximum. Results are
+    identical to the cell-by-cell recurrence in L{_dp_scalar}.
+
     @param S: Score matrix
     @type S: numpy.
     @param gap_penalty: Gap penalty
@@ -194,23 +243,104 @@ def dp(S, gap_penalty, peak_penalty=0):
 
     @author: Tim Erwin
     """
-    row_length = len(S[:, 0])
-    col_length = len(S[0, :])
+    S = np_asarray(S, dtype='d')
+    row_length, col_length = S.shape
 
-    # free for 25% peaks
-    missing_20 = row_length/4
+    D, trace_matrix = _init_dp(row_length, col_length, gap_penalty)
+
+    # missing ladders are penalized less at the last peak column
+    up_penalty = np_full(col_length, gap_penalty, dtype='d')
+    up_penalty[-1] = 0.25 * gap_penalty
+
+    for i in range(1, row_length+1):
+        # Needleman-Wunsch Algorithm assuming a score function S(x,x)=0
+        #
+        #              | D[i-1,j-1] + S(i,j)
+        # D[i,j] = max | D(i-1,j] + gap
+        #              | D[i,j-1] + peak_penalty
+        #
+        # ties are resolved in the order above, as in the scalar version
+        prev_row = D[i-1]
+        match = prev_row[:-1] + S[i-1]
+        up = prev_row[1:] + up_penalty
+        best = np_maximum(match, up)
+        directions = (up > match).astype('d')
+
+        row = D[i]
+        if peak_penalty == 0:
+            row[1:] = best
+            np_maximum.accumulate(row, out=row)
+            directions[row[:-1] > best] = 2
+        else:
+            for j in range(1, col_length+1):
+                left = row[j-1] + peak_penalty
+                if left > best[j-1]:
+                    row[j] = left
+                    directions[j-1] = 2
+                else:
+                    row[j] = best[j-1]
+
+        trace_matrix[i, 1:] = directions
+
+    return _traceback(D, trace_matrix)
+
+
+def dp_batch(S, gap_penalty):
+    """ return (scores, matches) of dp(S[b], gap_penalty) for a stack of
+        score matrices S of shape (batch, rows, columns)
+
+        scores[b] is the score of the optimal alignment of S[b] and
+        matches[b, i] the column matched with row i, or -1; rows of all
+        matrices are filled and traced back together, with the ties of dp()
+    """
+    S = np_asarray(S, dtype='d')
+    batch, row_length, col_length = S.shape
+
+    up_penalty = np_full(col_length, gap_penalty, dtype='d')
+    up_penalty[-1] = 0.25 * gap_penalty
+
+    # directions of dp() for rows and columns from 1
+    directions = np_zeros((batch, row_length, col_length), dtype='i1')
+    row = np_zeros((batch, col_length+1), dtype='d')
+    for i in range(row_length):
+        prev_row = row
+        match = prev_row[:, :-1] + S[:, i]
+        up = prev_row[:, 1:] + up_penalty
+        best = np_maximum(match, up)
+        direction = (up > match).astype('i1')
+
+        row = np_empty((batch, col_length+1), dtype='d')
+        row[:, 0] = 0.25 * gap_penalty
+        row[:, 1:] = best
+        np_maximum.accumulate(row, axis=1, out=row)
+        direction[row[:, :-1] > best] = 2
+        directions[:, i] = direction
+
+    # trace back all alignments from bottom right
+    members = arange(batch)
+    i = np_full(batch, row_length)
+    j = np_full(batch, col_length)
+    matches = np_full((batch, row_length), -1)
+    for _ in range(row_length + col_length):
+        inner = directions[members, i-1, j-1]
+        direction = where((i > 0) & (j > 0), inner,
+                          where(i > 0, 1, where(j > 0, 2, 3)))
+        matched = direction == 0
+        matches[members[matched], i[matched]-1] = j[matched]-1
+        i -= matched | (direction == 1)
+        j -= matched | (direction == 2)
+
+    return row[:, -1], matches
+
+
+def _init_dp(row_length, col_length, gap_penalty):
+    """ return (D, trace_matrix) with the boundary rows and columns set """
 
     # D contains the score of the optimal alignment
     D = np_zeros((row_length+1, col_length+1), dtype='d')
-    for i in range(1, row_length+1):
-        # D[i,0] = 0 if i < missing_20 else gap_penalty*(i-missing_20)
-        # missing ladders
-        D[i, 0] = 0.25 * gap_penalty
-    for j in range(1, col_length+1):
-        # missing peaks
-        D[0, j] = 0  # gap_penalty*j
-    D[0, 0] = 0.0
-    D[1:(row_length+1), 1:(col_length+1)] = S.copy()
+    # missing ladders
+    D[1:, 0] = 0.25 * gap_penalty
+    # missing peaks are free, D[0, j] = 0
 
     # Directions for trace
     # 0 - match               (move diagonal)
@@ -221,24 +351,14 @@ def dp(S, gap_penalty, peak_penalty=0):
     trace_matrix[:, 0] = 1
     trace_matrix[0, :] = 2
     trace_matrix[0, 0] = 3
-    for i in range(1, row_length+1):
-        for j in range(1, col_length+1):
-            # Needleman-Wunsch Algorithm assuming a score function S(x,x)=0
-            #
-            #              | D[i-1,j-1] + S(i,j)
-            # D[i,j] = min | D(i-1,j] + gap
-            #              | D[i,j-1] + gap
-            #
-            # darray = [D[i-1,j-1]+S[i-1,j-1], D[i-1,j]+gap_penalty, D[i,j-1]+gap_penalty]
-            if j == col_length:
-                penalty = 0.25 * gap_penalty
-            else:
-                penalty = gap_penalty
-            darray = [D[i-1, j-1]+S[i-1, j-1], D[i-1, j]+penalty,
-                      D[i, j-1] + peak_penalty]
-            D[i, j] = max(darray)
-            # Store direction in trace matrix
-            trace_matrix[i, j] = darray.index(D[i, j])
+
+    return D, trace_matrix
+
+
+def _traceback(D, trace_matrix):
+
+    row_length = D.shape[0] - 1
+    col_length = D.shape[1] - 1
 
     # Trace back from bottom right
     trace = []
@@ -273,3 +393,27 @@ def dp(S, gap_penalty, peak_penalty=0):
 
     return {'p': p, 'q': q, 'trace': trace, 'matches': matches, 'D': D,
             'phi': trace_matrix}
+
+
+def _dp_scalar(S, gap_penalty, peak_penalty=0):
+    """ cell-by-cell reference implementation of dp(), kept for verification
+        and benchmarking
+    """
+    row_length = len(S[:, 0])
+    col_length = len(S[0, :])
+
+    D, trace_matrix = _init_dp(row_length, col_length, gap_penalty)
+
+    for i in range(1, row_length+1):
+        for j in range(1, col_length+1):
+            if j == col_length:
+                penalty = 0.25 * gap_penalty
+            else:
+                penalty = gap_penalty
+            darray = [D[i-1, j-1]+S[i-1, j-1], D[i-1, j]+penalty,
+                      D[i, j-1] + peak_penalty]
+            D[i, j] = max(darray)
+            # Store direction in trace matrix
+            trace_matrix[i, j] = darray.index(D[i, j])
+
+    return _traceback(D, trace_matrix)
@@ -1,8 +1,11 @@
 
-from numpy import poly1d
+from numpy import (poly1d, zeros as np_zeros, asarray as np_asarray,
+                   arange, isin, where)
 from scipy.optimize import minimize, differential_evolution
 from fatoolsng.lib.utils import cerr, is_verbosity
 from fatoolsng.lib import const
+from fatoolsng.lib.fautil.dpalign import (dp_batch, gaussian_scores,
+                                          GAP_PENALTY)
 from fatoolsng.lib.fautil.alignutils import (estimate_z, pair_f, align_dp,
                                              pair_sized_peaks, DPResult,
                                              AlignResult, generate_similarity,
@@ -74,6 +77,15 @@ class ZFunc:
         return rss
         """
 
+        return self.evaluate(z)[0]
+
+    def evaluate(self, z):
+        """
+        z is array for polynomial curve
+        return (score, pairs) with the score of __call__() and the
+        [ (rtime, size, f(rtime), dev), ... ] pairs it is computed from
+        """
+
         # prepare z function
         f = poly1d(z)
         pairs = pair_f(f, self.rtimes, self.sizes, self.similarity,
@@ -81,8 +93,9 @@ class ZFunc:
 
         # calculate anchors
         rss = 0.0
-        for (rtime, bpsize) in self.anchor_pairs:
-            rss += (bpsize - f(rtime)) ** 2
+        anchor_sizes = f(np_asarray(self.anchor_rtimes, dtype='d'))
+        for (bpsize, anchor_size) in zip(self.anchor_sizes, anchor_sizes):
+            rss += (bpsize - anchor_size) ** 2
 
         # calculate the rest of peaks
         for (rtime, bpsize, rsize, err) in pairs:
@@ -98,7 +111,59 @@ class ZFunc:
         else:
             score = rss * missing_peaks**self.penalty
 
-        return score
+        return score, pairs
+
+    def scores(self, zs):
+        """
+        zs is array of shape (len(z), S) of S polynomial curves, as passed by
+        differential_evolution(vectorized=True)
+        return array of the S scores of __call__(), with the dp() alignments
+        of all curves run together
+        """
+
+        zs = np_asarray(zs, dtype='d')
+        if zs.ndim == 1:
+            zs = zs[:, None]
+
+        # same reversed order as pair_f
+        rtimes = np_asarray(self.rtimes[::-1], dtype='d')
+        sizes = np_asarray(self.sizes[::-1], dtype='d')
+        similarity = np_asarray(self.similarity[::-1], dtype='d')
+        rtime_sizes = _polyval(zs, rtimes)
+
+        S = gaussian_scores(sizes, rtime_sizes, similarity)
+        _, matches = dp_batch(S, GAP_PENALTY)
+
+        # calculate anchors, then the rest of peaks in pair_f order
+        rss = np_zeros(zs.shape[1], dtype='d')
+        anchor_sizes = _polyval(zs, np_asarray(self.anchor_rtimes, dtype='d'))
+        for (i, bpsize) in enumerate(self.anchor_sizes):
+            rss += (bpsize - anchor_sizes[:, i]) ** 2
+
+        members = arange(zs.shape[1])
+        matched = matches >= 0
+        is_anchor = isin(rtimes, self.anchor_rtimes)
+        for (i, size) in enumerate(sizes):
+            rtime_size = rtime_sizes[members, matches[:, i]]
+            counted = matched[:, i] & ~is_anchor[matches[:, i]]
+            rss += where(counted, (size - rtime_size) ** 2, 0.0)
+
+        missing_peaks = len(self.sizes) - matched.sum(axis=1) + 1
+
+        # increase the penalty for missing ladders
+        return where(missing_peaks / len(self.sizes) > 0.5,
+                     1e3 * missing_peaks.astype('d') ** 4,
+                     rss * missing_peaks.astype('d') ** self.penalty)
+
+
+def _polyval(zs, x):
+    """ return array of shape (S, len(x)) of the S curves of zs at x, by the
+        Horner scheme of poly1d
+    """
+    y = np_zeros((zs.shape[1], len(x)), dtype='d')
+    for coefs in zs:
+        y = y * x + coefs[:, None]
+    return y
 
 
 def align_gm(peaks, ladder, anchor_pairs, z=None):
@@ -199,8 +264,10 @@ def align_de(peaks, ladder, initial_pair=[]):
 
         # prev_rss = rss
 
-        res = differential_evolution(f, bounds, tol=1e-5, mutation=(0.4, 1.5),
-                                     popsize=30, recombination=0.8)
+        res = differential_evolution(f.scores, bounds, tol=1e-5,
+                                     mutation=(0.4, 1.5), popsize=30,
+                                     recombination=0.8, vectorized=True,
+                                     updating='deferred')
 
         pairs, final_rss = f.get_pairs(res.x)
         rtimes, bpsizes = zip(*pairs)
@@ -237,9 +304,10 @@ def estimate_de(peaks, sizes):
 
         # prev_rss = rss
 
-        res = differential_evolution(f, bounds, tol=1e-5, mutation=(0.3, 1.7),
-                                     popsize=45, recombination=0.5,
-                                     strategy='rand1bin')
+        res = differential_evolution(f.scores, bounds, tol=1e-5,
+                                     mutation=(0.3, 1.7), popsize=45,
+                                     recombination=0.5, strategy='rand1bin',
+                                     vectorized=True, updating='deferred')
 
         pairs, final_rss = f.get_pairs(res.x)
         pairs.sort()
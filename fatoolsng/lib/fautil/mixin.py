@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from fatoolsng.lib.fautil import algo
+from fatoolsng.lib.fautil.sizing import SIZERS
 from fatoolsng.lib.utils import cout, cerr  # , cexit
 from fatoolsng.lib import const
 from abc import ABC, abstractmethod
@@ -57,6 +58,10 @@ class ChannelMixIn(ABC):
         else:
             self.marker = marker
 
+    def set_peaks(self, peaks: Any) -> None:
+        """ set scanned peaks (a PeakTable) of this channel """
+        algo.create_alleles(self, peaks)
+
     def get_alleles(self) -> list:
         if self.status == const.channelstatus.reseted:
             # create alleles first
@@ -75,7 +80,7 @@ class ChannelMixIn(ABC):
 #    def preannotate(self, parameters):
 #        pass
 
-    def align(self, parameters=None, anchor_pairs=None):
+    def align(self, parameters=None, anchor_pairs=None, initial_z=None):
 
         # sanity checks
         if self.marker.code != 'ladder':
@@ -92,14 +97,37 @@ class ChannelMixIn(ABC):
                                                               ladder['relax'])
 
         start_time = process_time()
-        result = algo.align_peaks(self, parameters, ladder, anchor_pairs)
+        cache = self.fsa.align_cache
+        if cache is None:
+            result = algo.align_peaks(self, parameters, ladder, anchor_pairs,
+                                      initial_z)
+        else:
+            portfolio = algo.alignment_portfolio(parameters, anchor_pairs)
+            key = cache.key(self.get_alleles(), ladder, anchor_pairs,
+                            initial_z, portfolio)
+            result = cache.get(key)
+            if result is not None:
+                algo.adopt_align_result(self, result)
+            else:
+                result = algo.align_peaks(self, parameters, ladder,
+                                          anchor_pairs, initial_z)
+                cache.put(key, result)
+        self.set_alignment(result, process_time() - start_time)
+
+    def set_alignment(self, result, duration):
+        """ store alignment result of this ladder channel into its FSA """
+
+        ladder = self.fsa.panel.get_ladder()
         dpresult = result.dpresult
         fsa = self.fsa
         fsa.z = dpresult.z
         fsa.rss = dpresult.rss
         fsa.nladder = len(dpresult.sized_peaks)
         fsa.score = result.score
-        fsa.duration = process_time() - start_time
+        fsa.duration = duration
+        # process time of each aligner, wherever it ran (empty when the
+        # result comes from the alignment cache)
+        fsa.timings = dict(result.timings or {})
         fsa.status = const.assaystatus.aligned
         fsa.ztranspose = dpresult.ztranspose
 
@@ -122,7 +150,8 @@ class FSAMixIn(ABC):
     """
 
     __slots__ = ['panel', 'channels', 'excluded_markers', 'filename', 'rss',
-                 'z', 'score', 'nladder', 'duration', 'status', 'ztranspose',]
+                 'z', 'score', 'nladder', 'duration', 'timings', 'status',
+                 'ztranspose',]
 
     @abstractmethod
     def get_data_stream(self) -> BinaryIO:
@@ -134,10 +163,21 @@ class FSAMixIn(ABC):
         """ add this channel to fsa """
         ...
 
+    # TraceArchive holding the traces of FSA, read before the FSA content
+    trace_archive = None
+
+    # AlignCache of the alignment results of ladder channels, if any
+    align_cache = None
+
     def get_trace(self):
         if not hasattr(self, '_trace'):
-            from fatoolsng.lib.fautil import traceio
-            self._trace = traceio.read_abif_stream(self.get_data_stream())
+            archive = self.trace_archive
+            name = None if archive is None else archive.resolve(self.filename)
+            if name is not None:
+                self._trace = archive.get_trace(name)
+            else:
+                from fatoolsng.lib.fautil import traceio
+                self._trace = traceio.read_abif_stream(self.get_data_stream())
         return self._trace
 
     def set_panel(self, panel, options=None):
@@ -153,10 +193,13 @@ class FSAMixIn(ABC):
             if panel.has_marker(marker_code):
                 self.excluded_markers.append(marker_code.lower())
 
-    def create_channels(self):
+    def create_channels(self, trace_channels: list | None = None) -> None:
+        """ create channels from trace_channels, the normalized channels of
+            the trace (see tracebatch.create_channels()), or from the trace
+        """
         cerr(f'I: Generating channels for {self.filename}')
-        trace = self.get_trace()
-        trace_channels = algo.separate_channels(trace)
+        if trace_channels is None:
+            trace_channels = algo.separate_channels(self.get_trace())
         for tc in trace_channels:
             channel = self.Channel(data=tc.smooth_channel, dye=tc.dye_name,
                                    wavelen=tc.dye_wavelength,
@@ -166,8 +209,12 @@ class FSAMixIn(ABC):
             # channel.status = const.channelstatus.reseted
         self.status = const.assaystatus.normalized
 
-    def align(self, parameters: Any = None) -> tuple[float, float, int]:
+    def align(self, parameters: Any = None,
+              initial_z: Any = None) -> tuple[float, float, int]:
         """ return (score, rss, nladder)
+
+            initial_z, the z of an aligned sibling capillary, is used as a
+            warm start for the alignment (see wsalign.align_ws())
         """
 
         # check if this FSA has not been aligned previously
@@ -176,7 +223,7 @@ class FSAMixIn(ABC):
 
         c = self.get_ladder_channel()
 
-        c.align(parameters)
+        c.align(parameters, initial_z=initial_z)
         alleles = c.get_alleles()
 
         return (self.score, self.rss, self.nladder)
@@ -192,7 +239,9 @@ class FSAMixIn(ABC):
         # prepare ladders and calling function
         ladders = [p for p in ladder.get_alleles() if p.size > 0]
         ladders.sort(key=lambda x: x.size)
-        func = algo.local_southern(ladders)
+        method = (parameters.sizing.method if parameters
+                  else const.allelemethod.localsouthern)
+        func = SIZERS[const.allelemethod(method)](ladders)
         min_rtime = ladders[1].rtime
         max_rtime = ladders[-2].rtime
 
@@ -0,0 +1,158 @@
+"""Baseline normalization of all channels of a trace in one pass.
+
+normalize_channels() takes the raw traces of an FSA as a single
+(n_channels, n_samples) array and applies the normalization steps of
+algo.normalize_baseline() to every row at once: a running median and a
+wide Savitzky-Golay filter estimate the baseline, which is subtracted and
+clipped at zero, and the result is smoothed by a narrow Savitzky-Golay
+filter followed by a white top-hat transform.
+
+Filter coefficients and edge-fitting matrices are computed once per
+(window, order) and shared by every channel and every trace. Wide
+Savitzky-Golay windows are applied with an FFT convolution instead of the
+O(N*w) direct convolution of scipy.signal.savgol_filter.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+from numpy import (abs as np_abs, arange, asarray, atleast_2d, concatenate,
+                   empty, maximum, vander, zeros)
+from numpy.linalg import pinv
+from numpy.typing import NDArray
+from scipy.ndimage import correlate1d, median_filter, white_tophat
+from scipy.optimize import curve_fit
+from scipy.signal import fftconvolve, savgol_coeffs, savgol_filter
+
+
+# Savitzky-Golay windows above this size are applied by FFT convolution
+FFT_MIN_WINDOW = 64
+
+
+@dataclass
+class NormalizedChannels:
+    signal: NDArray
+    baseline: NDArray
+    mma: NDArray | None = None
+    mmb: NDArray | None = None
+
+
+def running_median(x: Any, window: int) -> NDArray:
+    """ return the running median of every row of x, zero padded at both ends
+        as scipy.signal.medfilt does
+
+        each row goes through the 1-D rank filter of scipy.ndimage, which
+        keeps the window sorted while sliding (O(N log w)); a 2-D footprint
+        would fall back to a full sort of every window
+    """
+    x = atleast_2d(asarray(x, dtype=float))
+    out = empty(x.shape)
+    for (row, out_row) in zip(x, out):
+        median_filter(row, size=window, mode='constant', cval=0.0,
+                      output=out_row)
+    return out
+
+
+@lru_cache(maxsize=None)
+def _savgol_plan(window: int, order: int) -> tuple[NDArray, NDArray, NDArray]:
+    """ return (coefficients, start edge matrix, end edge matrix) """
+    coeffs = savgol_coeffs(window, order)
+    # savgol_filter(mode='interp') replaces the half windows at both ends
+    # by the values of a polynomial fitted to the first/last window
+    half = window // 2
+    # positions scaled to [-1, 1] keep the Vandermonde matrix well
+    # conditioned, the projection onto polynomials does not change
+    V = vander((arange(window) - half) / half, order + 1)
+    fit = V @ pinv(V)
+    return coeffs, fit[:half], fit[window - half:]
+
+
+def savgol_rows(x: Any, window: int, order: int) -> NDArray:
+    """ return savgol_filter(x, window, order, axis=-1) for every row of x """
+    x = atleast_2d(asarray(x, dtype=float))
+    if window <= FFT_MIN_WINDOW or x.shape[1] < window:
+        return savgol_filter(x, window, order, axis=-1)
+
+    coeffs, start, end = _savgol_plan(window, order)
+    y = fftconvolve(x, coeffs[None, :], mode='same', axes=-1)
+    half = window // 2
+    y[:, :half] = x[:, :window] @ start.T
+    y[:, -half:] = x[:, -window:] @ end.T
+    return y
+
+
+def smooth_rows(x: Any, window: int = 11, order: int = 7) -> NDArray:
+    """ return traceutils.savitzky_golay(row, window, order) for every row of
+        x, ie. Savitzky-Golay smoothing of rows padded at both ends by
+        values mirrored around their first and last samples
+    """
+    x = atleast_2d(asarray(x, dtype=float))
+    half = window // 2
+    first = x[:, :1]
+    last = x[:, -1:]
+    padded = concatenate((first - np_abs(x[:, half:0:-1] - first), x,
+                          last + np_abs(x[:, -2:-half - 2:-1] - last)), axis=1)
+    coeffs = savgol_coeffs(window, order, use='dot')
+    return correlate1d(padded, coeffs, axis=-1)[:, half:-half]
+
+
+def smooth_channels(raw: Any, window: int = 11, order: int = 7,
+                    tophat_factor: float = 0.01) -> NDArray:
+    """ return traceutils.correct_baseline(traceutils.smooth_signal(row))
+        for every row of raw, an array of (n_channels, n_samples) traces
+    """
+    smooth = smooth_rows(raw, window, order)
+    tophat_size = int(round(smooth.shape[1] * tophat_factor))
+    return white_tophat(smooth, size=(1, tophat_size))
+
+
+def func_mm(x, a, b):
+    """ Michaelis Menten kinetics equation """
+    return a*x/(b+x)
+
+
+def fit_mm(line: NDArray, step: int = 1) -> tuple[float, float]:
+    """ return (a, b) of func_mm() fitted to every step-th sample of line,
+        or (0, 0)
+    """
+    x = arange(0, len(line), step)
+    try:
+        popt, pcov = curve_fit(func_mm, x, line[x])
+    except (RuntimeError, ValueError, TypeError):
+        # michaelis menten are not appropriate for this scale
+        return (0, 0)
+    return (popt[0], popt[1])
+
+
+def normalize_channels(raw: Any, medwinsize: int = 399, savgol_size: int = 11,
+                       savgol_order: int = 5, tophat_factor: float = 0.01,
+                       mm_winsize: int = 0) -> NormalizedChannels:
+    """ return normalized signals and baselines of raw, an array of
+        (n_channels, n_samples) traces
+
+        with mm_winsize, a Michaelis-Menten curve is also fitted to the
+        running median of each channel over mm_winsize samples; such a wide
+        median is smooth, so it is only sampled every mm_winsize/16 samples
+    """
+
+    raw = atleast_2d(asarray(raw, dtype=float))
+
+    median_line = running_median(raw, medwinsize)
+    baseline = savgol_rows(median_line, medwinsize, savgol_order)
+    corrected_baseline = maximum(raw - baseline, 0)
+    savgol = savgol_rows(corrected_baseline, savgol_size, savgol_order)
+    tophat_size = int(round(raw.shape[1] * tophat_factor))
+    smooth = white_tophat(savgol, size=(1, tophat_size))
+
+    result = NormalizedChannels(signal=smooth, baseline=baseline)
+    if mm_winsize:
+        result.mma = zeros(len(raw))
+        result.mmb = zeros(len(raw))
+        step = max(mm_winsize // 16, 1)
+        for (i, line) in enumerate(running_median(raw, mm_winsize)):
+            result.mma[i], result.mmb[i] = fit_mm(line, step)
+
+    return result
@@ -3,8 +3,15 @@
 from __future__ import annotations
 
 import sqlite3
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterator
+from pickle import loads as pickle_loads
+from struct import Struct
+from typing import Any, Iterable, Iterator
+
+from numpy import empty, frombuffer, ndarray
+
+from fatoolsng.lib.fautil.peaktable import PEAK_DTYPE, PeakTable
 
 
 _SCHEMA = """
@@ -15,19 +22,86 @@ CREATE TABLE IF NOT EXISTS peak_cache (
 );
 """
 
+_INSERT = 'INSERT OR REPLACE INTO peak_cache (key, data) VALUES (?, ?)'
+
+
+# ----------------------------------------------------------------------
+# Peak list encoding
+#
+# A header (magic, version, number of peaks) followed by one little-endian
+# column per PEAK_DTYPE field, in field order. PEAK_FORMAT_VERSION must be
+# increased whenever PEAK_DTYPE changes.
+
+PEAK_FORMAT_VERSION = 1
+
+_PEAK_MAGIC = b'FAPK'
+_PEAK_HEADER = Struct('<4sHxxQ')
+
+
+def peaks_to_array(peaks: Iterable[Any]) -> ndarray:
+    """Return peaks (a PeakTable or Peak-like objects) as a PEAK_DTYPE
+    structured array."""
+    if isinstance(peaks, PeakTable):
+        return peaks.data
+    if isinstance(peaks, ndarray):
+        return peaks.astype(PEAK_DTYPE, copy=False)
+    return PeakTable.from_peaks(peaks).data
+
+
+def encode_peaks(peaks: Iterable[Any] | ndarray) -> bytes:
+    """Encode peaks (a PeakTable, Peak-like objects or a structured array)
+    as bytes."""
+    arr = peaks_to_array(peaks)
+    return b''.join(
+        [_PEAK_HEADER.pack(_PEAK_MAGIC, PEAK_FORMAT_VERSION, len(arr))] +
+        [arr[name].tobytes() for name in PEAK_DTYPE.names])
+
+
+def decode_peaks(data: bytes) -> ndarray:
+    """Decode bytes from encode_peaks() into a PEAK_DTYPE structured array."""
+    if len(data) < _PEAK_HEADER.size:
+        raise ValueError('peak data too short')
+    magic, version, n = _PEAK_HEADER.unpack_from(data)
+    if magic != _PEAK_MAGIC:
+        raise ValueError('not an encoded peak list')
+    if version != PEAK_FORMAT_VERSION:
+        raise ValueError(f'unsupported peak format version: {version}')
+    if len(data) != _PEAK_HEADER.size + n * PEAK_DTYPE.itemsize:
+        raise ValueError('peak data size does not match its header')
+    arr = empty(n, dtype=PEAK_DTYPE)
+    offset = _PEAK_HEADER.size
+    for name in PEAK_DTYPE.names:
+        field = PEAK_DTYPE.fields[name][0]
+        arr[name] = frombuffer(data, dtype=field, count=n, offset=offset)
+        offset += n * field.itemsize
+    return arr
+
 
 class PeakCache:
     """Persistent key→bytes cache stored in a single SQLite file.
 
     Interface is compatible with the plyvel.DB subset used in this project:
     get/Get, put/Put, iterator, close.
+
+    The database uses WAL journal mode, so other processes can open and read
+    the cache while it is being populated. Writes are committed once
+    flush_interval of them are pending (every write by default); use
+    put_many() or transaction() to commit a batch at once. Pending writes
+    are committed by flush() and close().
     """
 
-    def __init__(self, path: str | Path, create_if_missing: bool = True) -> None:
+    def __init__(self, path: str | Path, create_if_missing: bool = True,
+                 flush_interval: int = 1) -> None:
         path = Path(path)
         if not create_if_missing and not path.exists():
             raise FileNotFoundError(f'Peak cache not found: {path}')
+        self.flush_interval = max(flush_interval, 1)
+        self._pending = 0
+        self._tx_depth = 0
         self._conn = sqlite3.connect(str(path))
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # with WAL, NORMAL only risks the last commits on power loss
+        self._conn.execute('PRAGMA synchronous=NORMAL')
         self._conn.execute(_SCHEMA)
         self._conn.commit()
 
@@ -45,20 +119,75 @@ class PeakCache:
     # plyvel used capitalised .Get()
     Get = get
 
+    def get_peaks(self, key: str | bytes) -> ndarray | None:
+        """Return the peaks stored under key as a PEAK_DTYPE array.
+
+        Entries pickled by earlier versions are converted on the fly.
+        """
+        data = self.get(key)
+        if data is None:
+            return None
+        if data[:len(_PEAK_MAGIC)] != _PEAK_MAGIC:
+            return peaks_to_array(pickle_loads(data))
+        return decode_peaks(data)
+
     # ------------------------------------------------------------------
     # Write
 
     def put(self, key: str | bytes, value: bytes) -> None:
         if isinstance(key, bytes):
             key = key.decode()
-        self._conn.execute(
-            'INSERT OR REPLACE INTO peak_cache (key, data) VALUES (?, ?)',
-            (key, value)
-        )
-        self._conn.commit()
+        self._conn.execute(_INSERT, (key, value))
+        self._written(1)
 
     Put = put
 
+    def put_peaks(self, key: str | bytes,
+                  peaks: Iterable[Any] | ndarray) -> None:
+        """Store peaks (Peak-like objects or a structured array) under key."""
+        self.put(key, encode_peaks(peaks))
+
+    def put_many(self, items: Iterable[tuple[str | bytes, bytes]]) -> None:
+        """Store (key, value) pairs and commit them as a single batch."""
+        rows = [(k.decode() if isinstance(k, bytes) else k, v)
+                for (k, v) in items]
+        self._conn.executemany(_INSERT, rows)
+        self._written(len(rows), force=True)
+
+    @contextmanager
+    def transaction(self) -> Iterator[PeakCache]:
+        """Group writes into one commit, rolled back if the block raises.
+
+        Nested transactions are merged into the outermost one. Writes
+        pending before the outermost one are committed first, so that they
+        are not rolled back with it.
+        """
+        if self._tx_depth == 0 and self._pending:
+            self.flush()
+        self._tx_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self._conn.rollback()
+                self._pending = 0
+            raise
+        self._tx_depth -= 1
+        if self._tx_depth == 0:
+            self.flush()
+
+    def flush(self) -> None:
+        """Commit pending writes."""
+        self._conn.commit()
+        self._pending = 0
+
+    def _written(self, count: int, force: bool = False) -> None:
+        self._pending += count
+        if self._tx_depth == 0 and (force or
+                                    self._pending >= self.flush_interval):
+            self.flush()
+
     # ------------------------------------------------------------------
     # Iteration
 
@@ -79,6 +208,7 @@ class PeakCache:
     # Lifecycle
 
     def close(self) -> None:
+        self.flush()
         self._conn.close()
 
     def __enter__(self) -> PeakCache:
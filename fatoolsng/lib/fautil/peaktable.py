@@ -0,0 +1,111 @@
+"""Column-wise peak storage used by the peak scanning stages.
+
+A PeakTable keeps the peaks of a channel in a single structured array, so
+peak scanning and filtering run as array operations instead of loops over
+per-peak objects. Peak (and Allele) objects are only created when a caller
+iterates the table.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Iterable, Iterator
+
+from numpy import argsort, dtype as np_dtype, empty, ndarray
+
+
+PEAK_DTYPE = np_dtype([
+    ('rtime', '<i4'),
+    ('rfu', '<i4'),
+    ('area', '<f8'),
+    ('brtime', '<i4'),
+    ('ertime', '<i4'),
+    ('srtime', '<f8'),
+    ('beta', '<f8'),
+    ('theta', '<f8'),
+    ('omega', '<f8'),
+    ('size', '<f8'),
+    ('bin', '<i4'),
+])
+
+
+class PeakTable:
+    """Peaks held in a PEAK_DTYPE structured array.
+
+    Columns are available, and assignable, as attributes (table.rtime,
+    table.rfu, ...); wrtime is derived from brtime and ertime. Indexing with
+    a slice, a boolean mask or an array of positions returns a new
+    PeakTable, while indexing with an integer or iterating returns Peak
+    objects.
+    """
+
+    __slots__ = ['data']
+
+    def __init__(self, data: ndarray | None = None) -> None:
+        self.data = empty(0, dtype=PEAK_DTYPE) if data is None else data
+
+    @classmethod
+    def from_rtimes(cls, rtimes: Any, rfus: Any) -> PeakTable:
+        """ return a table of peaks with only rtime and rfu measured """
+        data = empty(len(rtimes), dtype=PEAK_DTYPE)
+        for name in PEAK_DTYPE.names:
+            data[name] = -1
+        data['rtime'] = rtimes
+        data['rfu'] = rfus
+        return cls(data)
+
+    @classmethod
+    def from_peaks(cls, peaks: Iterable[Any]) -> PeakTable:
+        """ return a table of Peak-like objects """
+        peaks = list(peaks)
+        data = empty(len(peaks), dtype=PEAK_DTYPE)
+        for name in PEAK_DTYPE.names:
+            data[name] = [getattr(p, name, -1) for p in peaks]
+        return cls(data)
+
+    @property
+    def wrtime(self) -> ndarray:
+        return self.data['ertime'] - self.data['brtime']
+
+    def sorted(self, key: str = 'rtime', reverse: bool = False) -> PeakTable:
+        """ return a copy sorted by column key, keeping the order of ties """
+        values = self.data[key]
+        order = argsort(-values if reverse else values, kind='stable')
+        return PeakTable(self.data[order])
+
+    def __getattr__(self, name: str) -> ndarray:
+        if name in PEAK_DTYPE.names:
+            return self.data[name]
+        raise AttributeError(name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in PEAK_DTYPE.names:
+            self.data[name] = value
+        else:
+            super().__setattr__(name, value)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, index: Any) -> Any:
+        result = self.data[index]
+        if isinstance(result, ndarray):
+            return PeakTable(result)
+        return _to_peak(result)
+
+    def __iter__(self) -> Iterator[Any]:
+        for row in self.data:
+            yield _to_peak(row)
+
+    def __array__(self, dtype: Any = None, copy: Any = None) -> ndarray:
+        return self.data if dtype is None else self.data.astype(dtype)
+
+    def __repr__(self) -> str:
+        return f'<PeakTable: {len(self)} peak(s)>'
+
+
+def _to_peak(row: Any) -> Any:
+    from fatoolsng.lib.fautil.algo import Peak
+
+    p = Peak(*row.tolist())
+    p.wrtime = p.ertime - p.brtime
+    return p
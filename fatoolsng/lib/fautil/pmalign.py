@@ -1,11 +1,12 @@
 # pair minimization algorithm
-from numpy import poly1d
+from numpy import (poly1d, arange, argsort, asarray, cumsum, diff, floor,
+                   isin, log, median, meshgrid, repeat, searchsorted, stack,
+                   unique, zeros)
 from itertools import product
-from jax.scipy.optimize import minimize
 from fatoolsng.lib.utils import cverr, is_verbosity
 from fatoolsng.lib.fautil.alignutils import (estimate_z, pair_f, align_dp,
                                              pair_sized_peaks, DPResult,
-                                             AlignResult, plot)
+                                             AlignResult, PolyFit, plot)
 from fatoolsng.lib.fautil.gmalign import ZFunc, align_gm
 from fatoolsng.lib import const
 
@@ -13,6 +14,14 @@ ANCHOR_RTIME_LOWER_BOUND = 1400
 ANCHOR_RTIME_UPPER_BOUND = 5000
 PEAK_RTIME_UPPER_BOUND = 11000
 
+# geometric hashing of estimate_pm(): triplets span up to SIGNATURE_WINDOW
+# signature sizes and PEAK_WINDOW peaks between consecutive members, so that
+# missing and spurious peaks are skipped
+SIGNATURE_WINDOW = 3
+PEAK_WINDOW = 4
+ANCHOR_RATIO_TOLERANCE = 0.05
+ANCHOR_CANDIDATES = 3
+
 
 def align_pm(peaks, ladder, anchor_pairs=None):
 
@@ -68,6 +77,7 @@ def align_lower_pm(peaks, ladder, anchor_pairs, anchor_z):
     zscore = estimate_z(anchor_rtimes, anchor_bpsizes, 3)
     z = zscore.z
     rss = zscore.rss
+    pairs = anchor_pairs
     f = ZFunc(peaks, current_sizes, anchor_pairs)
 
     while True:
@@ -107,6 +117,7 @@ def align_upper_pm(peaks, ladder, anchor_pairs, anchor_z):
     order = ladder['order']
     zres = estimate_z(anchor_rtimes, anchor_bpsizes, order)
     z, rss = zres.z, zres.rss
+    pairs = anchor_pairs
     f = ZFunc(peaks, current_sizes, anchor_pairs)
 
     while remaining_sizes:
@@ -141,6 +152,38 @@ def align_upper_pm(peaks, ladder, anchor_pairs, anchor_z):
 
 
 def minimize_score(f, z, order):
+    """ return (score, z) after refitting z to its own peak pairs until the
+        score settles
+
+        each iteration runs a single dp for both the score and the pairs, and
+        the fit is only updated with the pairs that changed since the last
+        iteration
+    """
+
+    last_score = score = 0
+    fit = PolyFit(order, f.rtimes[0], f.rtimes[-1])
+
+    niter = 1
+    while niter < 50:
+
+        score, pairs = f.evaluate(z)
+
+        if last_score and abs(last_score - score) < 1e-6:
+            break
+
+        fit.update([(rtime, bpsize) for (rtime, bpsize, _, _) in pairs])
+
+        z = fit.z
+        last_score = score
+        niter += 1
+
+    return last_score, z
+
+
+def _minimize_score_refit(f, z, order):
+    """ return (score, z) of minimize_score() by refitting all pairs with
+        estimate_z() at each iteration, the reference of minimize_score()
+    """
 
     last_score = score = 0
 
@@ -164,6 +207,132 @@ def minimize_score(f, z, order):
 
 
 def estimate_pm(peaks, bpsizes):
+    """ return (anchor_pairs, z) of the anchor peaks of bpsizes, the ladder
+        signature, found by geometric hashing
+
+        a linear sizing curve keeps the ratio of consecutive spacings, so
+        triplets of nearby peaks vote for the line of the signature triplets
+        with the same spacing ratio; only the lines with most votes are
+        aligned, falling back on the sweep over all pairs of early and late
+        peaks when no triplet matches
+    """
+
+    f = ZFunc(peaks, bpsizes, [], estimate=True)
+    rtimes = asarray(f.rtimes, dtype=float)
+    sizes = asarray(f.sizes, dtype=float)
+
+    candidates = vote_anchor_lines(rtimes, sizes)
+    if not candidates:
+        return _estimate_pm_sweep(peaks, bpsizes)
+
+    results = []
+    for zres in candidates:
+        dp_result = align_dp(f.rtimes, f.sizes, f.similarity, zres.z,
+                             zres.rss)
+        results.append((f(dp_result.z), dp_result))
+        if is_verbosity(5):
+            plot(f.rtimes, f.sizes, dp_result.z,
+                 [(x[1], x[0]) for x in dp_result.sized_peaks])
+
+    results.sort(key=lambda x: x[0])
+    dp_result = results[0][1]
+
+    return ([(x[1], x[0]) for x in dp_result.sized_peaks], dp_result.z)
+
+
+def spacing_triplets(values, window):
+    """ return (i, j, k, key) of the triplets of ascending values with at
+        most window - 1 values between consecutive members, key being the
+        log ratio of their spacings
+    """
+
+    n = len(values)
+    steps = arange(1, window + 1)
+    i, dj, dk = [x.ravel() for x in meshgrid(arange(n), steps, steps,
+                                              indexing='ij')]
+    j = i + dj
+    k = j + dk
+    valid = k < n
+    i, j, k = i[valid], j[valid], k[valid]
+    first = values[j] - values[i]
+    second = values[k] - values[j]
+    valid = (first > 0) & (second > 0)
+    i, j, k = i[valid], j[valid], k[valid]
+    return i, j, k, log(first[valid] / second[valid])
+
+
+def vote_anchor_lines(rtimes, sizes, tolerance=ANCHOR_RATIO_TOLERANCE,
+                      n_candidates=ANCHOR_CANDIDATES):
+    """ return ZResult of the lines size = a * rtime + b with most votes
+        from peak triplets matching signature triplets, best first
+
+        a vote is binned by the rtimes of the second and the second last
+        signature sizes on its line, with bins of half the median peak
+        spacing, and a line gathers the votes of its bin and neighbour bins
+    """
+
+    if len(rtimes) < 3 or len(sizes) < 3:
+        return []
+
+    si, sj, sk, skeys = spacing_triplets(sizes, SIGNATURE_WINDOW)
+    order = argsort(skeys)
+    si, sj, sk, skeys = si[order], sj[order], sk[order], skeys[order]
+
+    pi, pj, pk, pkeys = spacing_triplets(rtimes, PEAK_WINDOW)
+    lo = searchsorted(skeys, pkeys - tolerance)
+    hi = searchsorted(skeys, pkeys + tolerance, side='right')
+    counts = hi - lo
+    if not counts.sum():
+        return []
+
+    # one vote per (peak triplet, signature triplet) match
+    peak_idx = repeat(arange(len(pkeys)), counts)
+    sig_idx = (arange(counts.sum()) - repeat(cumsum(counts) - counts, counts)
+               + repeat(lo, counts))
+    pi, pk = pi[peak_idx], pk[peak_idx]
+    si, sk = si[sig_idx], sk[sig_idx]
+
+    slope = (sizes[sk] - sizes[si]) / (rtimes[pk] - rtimes[pi])
+    intercept = sizes[si] - slope * rtimes[pi]
+    x1 = (sizes[1] - intercept) / slope
+    x2 = (sizes[-2] - intercept) / slope
+
+    width = max(median(diff(rtimes)) / 2, 1.0)
+    bins = stack([floor(x1 / width), floor(x2 / width)], axis=1).astype(int)
+    cells, cell_idx, cell_votes = unique(bins, axis=0, return_inverse=True,
+                                         return_counts=True)
+    cell_idx = cell_idx.ravel()
+
+    # votes of each cell and its neighbours
+    neighbourhood = {}
+    index = {tuple(cell): n for (n, cell) in enumerate(cells.tolist())}
+    scores = zeros(len(cells), dtype=int)
+    for (n, (c1, c2)) in enumerate(cells.tolist()):
+        members = [index[(c1 + d1, c2 + d2)]
+                   for d1 in (-1, 0, 1) for d2 in (-1, 0, 1)
+                   if (c1 + d1, c2 + d2) in index]
+        neighbourhood[n] = members
+        scores[n] = cell_votes[members].sum()
+
+    candidates = []
+    used = set()
+    for n in argsort(-scores, kind='stable'):
+        if len(candidates) >= n_candidates:
+            break
+        if n in used:
+            continue
+        used.update(neighbourhood[n])
+        votes = isin(cell_idx, neighbourhood[n])
+        candidates.append(estimate_z([median(x1[votes]), median(x2[votes])],
+                                     [sizes[1], sizes[-2]], 1))
+
+    return candidates
+
+
+def _estimate_pm_sweep(peaks, bpsizes):
+    """ return (anchor_pairs, z) from the line through every early and late
+        peak with the best score, the reference of estimate_pm()
+    """
 
     rtimes = [p.rtime for p in peaks]
 
@@ -0,0 +1,286 @@
+"""Racing portfolio of ladder aligners.
+
+align_ladder() tries the aligners one after the other, so that the expensive
+ones only start once all cheaper ones have failed. align_ladder_portfolio()
+runs them concurrently in a pool of worker processes instead: aligners are
+started in the configured order as workers become free, each with its own
+timeout, the first result passing the strict criteria of the ladder is
+accepted and the aligners still running are cancelled.
+
+Workers are spawned once and reused across alignments; the worker of a
+cancelled or timed out aligner is terminated and replaced at once. The
+process time spent in each aligner, including cancelled ones, is set as the
+timings of the returned AlignResult.
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from multiprocessing import get_context
+from multiprocessing.connection import wait
+from time import perf_counter, process_time
+from typing import Any
+
+from fatoolsng.lib.utils import cerr
+from fatoolsng.lib.fautil.alignutils import AlignResult
+
+
+# aligners of the portfolio, in the order align_ladder() tries them; hc is
+# refined by gm from its initial pairs as in align_ladder()
+PORTFOLIO_METHODS = ('hc', 'ws', 'pm', 'sh', 'de')
+DEFAULT_PORTFOLIO = 'hc,ws,pm,sh,de'
+
+
+def parse_portfolio(spec: str) -> list[tuple[str, float | None]]:
+    """ return [(method, timeout), ...] of spec, comma-separated aligners
+        with an optional timeout in seconds, eg. 'hc:10,pm:60,sh,de:600'
+    """
+    portfolio = []
+    for item in spec.split(','):
+        method, _, timeout = item.strip().partition(':')
+        if method not in PORTFOLIO_METHODS:
+            raise ValueError(f'unknown aligner {method!r}, expected one of: '
+                             f'{", ".join(PORTFOLIO_METHODS)}')
+        if method in dict(portfolio):
+            raise ValueError(f'aligner {method!r} is given more than once')
+        portfolio.append((method, float(timeout) if timeout else None))
+    return portfolio
+
+
+def is_applicable(method: str, peaks: list, ladder: dict,
+                  initial_z: Any = None) -> bool:
+    """ return whether align_ladder() would run method on peaks """
+    if method == 'ws':
+        return initial_z is not None
+    if method == 'hc':
+        return len(peaks) <= len(ladder['sizes']) + 5
+    return True
+
+
+def run_aligner(method: str, peaks: list, ladder: dict,
+                initial_z: Any = None) -> AlignResult:
+    """ return AlignResult of the method aligner of the portfolio """
+
+    from fatoolsng.lib.fautil import algo
+
+    if method == 'hc':
+        result = algo.align_hc(peaks, ladder)
+        if result.score > 0.9 or not result.initial_pairs:
+            return result
+        gm_result = algo.align_gm(peaks, ladder, result.initial_pairs)
+        return gm_result if gm_result.score > result.score else result
+    if method == 'ws':
+        return algo.align_ws(peaks, ladder, initial_z)
+    return {'pm': algo.align_pm, 'sh': algo.align_sh,
+            'de': algo.align_de}[method](peaks, ladder)
+
+
+def _worker(conn: Any) -> None:
+    """ worker process: run the (method, peaks, ladder, initial_z) tasks
+        received on conn, sending ('start', process time) when a task starts
+        and ('done', result, strict, duration, error) when it ends
+    """
+
+    from fatoolsng.lib.fautil import algo
+
+    while True:
+        try:
+            method, peaks, ladder, initial_z = conn.recv()
+        except EOFError:
+            return
+        start_time = process_time()
+        conn.send(('start', start_time))
+        ladder['qcfunc'] = algo.generate_scoring_function(ladder['strict'],
+                                                          ladder['relax'])
+        try:
+            result = run_aligner(method, peaks, ladder, initial_z)
+            if result.dpresult is None:
+                raise RuntimeError(result.msg)
+            score, msg = ladder['qcfunc'](result.dpresult, method='strict')
+            strict, error = score > 0.9, None
+        except Exception as exc:
+            result, strict = None, False
+            error = f'{exc.__class__.__name__}: {exc}'
+        conn.send(('done', result, strict, process_time() - start_time,
+                   error))
+
+
+@dataclass
+class _Task:
+    method: str
+    process: Any
+    conn: Any
+    timeout: float | None
+    # process time of the worker and time of the start of the task, which
+    # may wait for a new worker to start up
+    start_time: float | None = None
+    deadline: float | None = None
+
+
+class AlignerPool:
+    """Worker processes racing the aligners of a portfolio.
+    """
+
+    def __init__(self, workers: int = 1) -> None:
+        self.workers = max(workers, 1)
+        # JAX is multithreaded, hence workers must not be forked
+        self._context = get_context('spawn')
+        self._idle: list[tuple[Any, Any]] = []
+
+    def _acquire(self) -> tuple[Any, Any]:
+        # the longest idle worker is the most likely to have started up
+        return self._idle.pop(0) if self._idle else self._spawn()
+
+    def _spawn(self) -> tuple[Any, Any]:
+        conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_worker, args=(child_conn,),
+                                        daemon=True)
+        process.start()
+        child_conn.close()
+        return (process, conn)
+
+    def _terminate(self, task: _Task) -> float | None:
+        """ terminate the worker of task, return the process time it spent
+            in the task or None if the task has not started
+        """
+        while task.start_time is None and task.conn.poll():
+            try:
+                message = task.conn.recv()
+            except EOFError:
+                # the worker died before starting the task
+                break
+            if message[0] == 'start':
+                task.start_time = message[1]
+        # a terminated worker is reaped here, and its process time added to
+        # that of the children of this process
+        before = os.times()
+        task.process.terminate()
+        task.process.join()
+        after = os.times()
+        task.conn.close()
+        if task.start_time is None:
+            return None
+        total = (after.children_user - before.children_user +
+                 after.children_system - before.children_system)
+        return max(total - task.start_time, 0.0)
+
+    def _cancel(self, task: _Task, timings: dict[str, float]) -> None:
+        duration = self._terminate(task)
+        if duration is not None:
+            timings[task.method] = duration
+        # the replacement starts up while the pool is idle
+        self._idle.append(self._spawn())
+
+    def race(self, peaks: list, ladder: dict,
+             portfolio: list[tuple[str, float | None]],
+             initial_z: Any = None) -> AlignResult:
+        """ return the AlignResult of the first aligner of portfolio passing
+            the strict criteria, otherwise, as align_ladder(), the first one
+            in portfolio order passing the relaxed threshold or else the one
+            with the best score
+        """
+
+        ladder = {k: v for (k, v) in ladder.items() if k != 'qcfunc'}
+        pending = [(method, timeout) for (method, timeout) in portfolio
+                   if is_applicable(method, peaks, ladder, initial_z)]
+        running: dict[Any, _Task] = {}
+        results = {}
+        timings = {}
+        accepted = None
+
+        try:
+            while (pending or running) and accepted is None:
+
+                while pending and len(running) < self.workers:
+                    method, timeout = pending.pop(0)
+                    process, conn = self._acquire()
+                    conn.send((method, peaks, ladder, initial_z))
+                    running[conn] = _Task(method, process, conn, timeout)
+
+                deadlines = [task.deadline for task in running.values()
+                             if task.deadline is not None]
+                wait_time = (max(min(deadlines) - perf_counter(), 0)
+                             if deadlines else None)
+
+                for conn in wait(list(running), wait_time):
+                    task = running[conn]
+                    try:
+                        message = conn.recv()
+                    except EOFError:
+                        cerr(f'E: aligner {task.method} worker died')
+                        del running[conn]
+                        self._cancel(task, timings)
+                        continue
+                    if message[0] == 'start':
+                        task.start_time = message[1]
+                        if task.timeout is not None:
+                            task.deadline = perf_counter() + task.timeout
+                        continue
+                    _, result, strict, duration, error = message
+                    del running[conn]
+                    self._idle.append((task.process, conn))
+                    timings[task.method] = duration
+                    if error:
+                        cerr(f'W: aligner {task.method} failed: {error}')
+                        continue
+                    results[task.method] = result
+                    if strict:
+                        accepted = result
+                        break
+
+                now = perf_counter()
+                for (conn, task) in list(running.items()):
+                    if task.deadline is not None and now >= task.deadline:
+                        cerr(f'W: aligner {task.method} timed out')
+                        del running[conn]
+                        self._cancel(task, timings)
+
+        finally:
+            # cancel the aligners still running
+            for task in running.values():
+                self._cancel(task, timings)
+
+        if accepted is None:
+            candidates = [results[method] for (method, _) in portfolio
+                          if method in results]
+            if not candidates:
+                raise RuntimeError('no aligner of the portfolio has aligned '
+                                   'the ladder')
+            accepted = next((r for r in candidates if r.score > 0.75),
+                            max(candidates, key=lambda r: r.score))
+
+        accepted.timings = timings
+        return accepted
+
+    def close(self) -> None:
+        """ stop the idle workers """
+        for (process, conn) in self._idle:
+            conn.close()
+            process.join()
+        self._idle = []
+
+    def __enter__(self) -> AlignerPool:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+@lru_cache(maxsize=None)
+def get_aligner_pool(workers: int = 1) -> AlignerPool:
+    """ return the AlignerPool of workers processes of this process """
+    return AlignerPool(workers)
+
+
+def align_ladder_portfolio(peaks: list, ladder: dict,
+                           portfolio: list[tuple[str, float | None]],
+                           workers: int = 1,
+                           initial_z: Any = None) -> AlignResult:
+    """ align peaks, Peak copies of the ladder channel alleles (see
+        algo.ladder_peaks()), with ladder by racing the aligners of
+        portfolio in workers processes
+    """
+    return get_aligner_pool(workers).race(peaks, ladder, portfolio,
+                                          initial_z)
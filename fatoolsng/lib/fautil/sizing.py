@@ -0,0 +1,168 @@
+"""Sizing of peaks from the aligned ladder peaks of their FSA.
+
+A sizer is built once from the ladder peaks (with rtime, size and qscore)
+and sizes whole arrays of rtimes: size(rtimes) returns the arrays of size,
+deviation, qcall and allele method of the rtimes in one call, locating the
+ladder interval of each rtime with searchsorted. Calling a sizer with a
+single rtime returns the (size, deviation, qcall, method) tuple of the
+sizing functions given to algo.call_peaks().
+
+LocalSouthern precomputes the two 3-point quadratics of every ladder
+interval; CubicSpline and LeastSquare size with a cubic spline through the
+ladder peaks and a global least squares polynomial. FSA.call() sizes with
+the sizer of SIZERS selected by parameters.sizing.method (fa --sizing).
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Any
+
+from numpy import (asarray, empty, minimum, poly1d, searchsorted,
+                   zeros as np_zeros, interp)
+from numpy.typing import ArrayLike, NDArray
+
+from fatoolsng.lib import const
+from fatoolsng.lib.fautil.backend import get_backend
+
+
+class Sizer(ABC):
+    """ base class of sizers, sizing rtimes from ladder peaks """
+
+    method = const.allelemethod.uncalled
+    # least number of ladder peaks the sizer needs
+    min_ladders = 2
+
+    def __init__(self, ladder_alleles: list) -> None:
+        ladders = sorted(ladder_alleles, key=lambda p: p.rtime)
+        if len(ladders) < self.min_ladders:
+            raise ValueError(f'{self.__class__.__name__} needs at least '
+                             f'{self.min_ladders} ladder peaks, got '
+                             f'{len(ladders)}')
+        self.rtimes = asarray([p.rtime for p in ladders], dtype=float)
+        self.sizes = asarray([p.size for p in ladders], dtype=float)
+        self.qscores = asarray([p.qscore for p in ladders], dtype=float)
+
+    @abstractmethod
+    def size(self, rtimes: ArrayLike) -> tuple[NDArray, NDArray, NDArray,
+                                               NDArray]:
+        """ return (sizes, deviations, qcalls, methods) arrays of rtimes """
+        ...
+
+    def __call__(self, rtime: float) -> tuple[float, float, float, Any]:
+        sizes, devs, qcalls, methods = self.size([rtime])
+        return (float(sizes[0]), float(devs[0]), float(qcalls[0]), methods[0])
+
+    def _interval(self, rtimes: NDArray) -> NDArray:
+        """ return the index of the ladder peak ending the ladder interval of
+            each rtime, rtimes outside the ladder in the first or last one
+        """
+        return searchsorted(self.rtimes, rtimes, side='right').clip(
+            1, len(self.rtimes) - 1)
+
+    def _qcalls(self, rtimes: NDArray) -> NDArray:
+        """ return the lowest qscore of the ladder peaks around each rtime """
+        idx = self._interval(rtimes)
+        return minimum(self.qscores[idx - 1], self.qscores[idx])
+
+    def _methods(self, n: int) -> NDArray:
+        # full() would turn the str enum into a truncated str
+        methods = empty(n, dtype=object)
+        methods.fill(self.method)
+        return methods
+
+
+class LocalSouthern(Sizer):
+    """ southern local interpolation
+
+        an rtime between ladder peaks i-1 and i is sized with the mean of the
+        quadratics through ladder peaks i-2, i-1, i and i-1, i, i+1, with the
+        squared difference of the two as deviation and the mean of the lowest
+        qscore of their ladder peaks as qcall
+
+        the quadratics through every 3 consecutive ladder peaks are kept in
+        Newton form, y0 + (x - x0) * (d1 + (x - x1) * d2), which is exact
+        whatever the offset of the rtimes
+    """
+
+    method = const.allelemethod.localsouthern
+    min_ladders = 4
+
+    def __init__(self, ladder_alleles: list) -> None:
+        super().__init__(ladder_alleles)
+        x, y, q = self.rtimes, self.sizes, self.qscores
+        # quadratic j goes through ladder peaks j, j+1, j+2
+        self.x0, self.x1 = x[:-2], x[1:-1]
+        self.y0 = y[:-2]
+        slopes = (y[1:] - y[:-1]) / (x[1:] - x[:-1])
+        self.d1 = slopes[:-1]
+        self.d2 = (slopes[1:] - slopes[:-1]) / (x[2:] - x[:-2])
+        self.min_qscores = minimum(minimum(q[:-2], q[1:-1]), q[2:])
+
+    def _quadratic(self, j: NDArray, rtimes: NDArray) -> NDArray:
+        return self.y0[j] + (rtimes - self.x0[j]) * (
+            self.d1[j] + (rtimes - self.x1[j]) * self.d2[j])
+
+    def size(self, rtimes: ArrayLike) -> tuple[NDArray, NDArray, NDArray,
+                                               NDArray]:
+        rtimes = asarray(rtimes, dtype=float)
+        # as the original bisection, rtimes beyond the second and the second
+        # last ladder peaks are extrapolated from the outermost quadratics
+        idx = searchsorted(self.rtimes, rtimes, side='right').clip(
+            2, len(self.rtimes) - 2)
+        size1 = self._quadratic(idx - 2, rtimes)
+        size2 = self._quadratic(idx - 1, rtimes)
+        qcalls = (self.min_qscores[idx - 2] + self.min_qscores[idx - 1]) / 2
+        return ((size1 + size2) / 2, (size1 - size2)**2, qcalls,
+                self._methods(rtimes.size))
+
+
+class CubicSpline(Sizer):
+    """ cubic spline through the ladder peaks
+
+        the spline goes through every ladder peak, hence the deviation is 0
+    """
+
+    method = const.allelemethod.cubicspline
+
+    def __init__(self, ladder_alleles: list) -> None:
+        super().__init__(ladder_alleles)
+        from scipy.interpolate import CubicSpline as _CubicSpline
+        self.spline = _CubicSpline(self.rtimes, self.sizes)
+
+    def size(self, rtimes: ArrayLike) -> tuple[NDArray, NDArray, NDArray,
+                                               NDArray]:
+        rtimes = asarray(rtimes, dtype=float)
+        return (self.spline(rtimes), np_zeros(rtimes.shape),
+                self._qcalls(rtimes), self._methods(rtimes.size))
+
+
+class LeastSquare(Sizer):
+    """ least squares polynomial of degree through the ladder peaks
+
+        the deviation is the squared residual of the fit at the ladder peaks,
+        interpolated between them
+    """
+
+    method = const.allelemethod.leastsquare
+
+    def __init__(self, ladder_alleles: list, degree: int = 3) -> None:
+        self.min_ladders = degree + 1
+        super().__init__(ladder_alleles)
+        self.z = get_backend().polyfit(self.rtimes, self.sizes, degree)
+        self.f = poly1d(self.z)
+        self.residuals = (self.sizes - self.f(self.rtimes))**2
+
+    def size(self, rtimes: ArrayLike) -> tuple[NDArray, NDArray, NDArray,
+                                               NDArray]:
+        rtimes = asarray(rtimes, dtype=float)
+        return (self.f(rtimes), interp(rtimes, self.rtimes, self.residuals),
+                self._qcalls(rtimes), self._methods(rtimes.size))
+
+
+# sizers by the allele method of SizingParameter.method
+SIZERS = {
+    const.allelemethod.localsouthern: LocalSouthern,
+    const.allelemethod.cubicspline: CubicSpline,
+    const.allelemethod.leastsquare: LeastSquare,
+}
@@ -0,0 +1,179 @@
+"""Packed archive of the raw traces of a run.
+
+A trace archive holds the raw channels of many FSA files in one file: a
+small header, every channel as a contiguous little-endian int16 array, and
+a JSON index describing each assay (name, content digest, run start and
+the position of each channel). Readers memory-map the archive, so fetching
+the trace of any assay and dye is an O(1) slice of the mapped data and no
+FSA file is parsed.
+
+The digest is the sha256 of the original FSA file, so channels normalized
+from an archive share their channel cache entries with the FSA file.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from hashlib import sha256
+from json import dumps as json_dumps, loads as json_loads
+from mmap import mmap, ACCESS_READ
+from os import PathLike, replace
+from pathlib import Path, PurePath
+from struct import Struct
+from typing import Any, Iterable
+
+from numpy import ascontiguousarray, dtype, frombuffer, ndarray
+
+from fatoolsng.lib.fautil.traceio import ABIF_Channel, ABIFTags, ABIF
+
+
+# magic, format version, index offset and index size
+_HEADER = Struct('<4sHxxQQ')
+_MAGIC = b'FATR'
+ARCHIVE_FORMAT_VERSION = 1
+
+_TRACE_DTYPE = dtype('<i2')
+
+
+class ArchivedTrace:
+    """Trace of one assay of a TraceArchive, read as traceio.ABIF is."""
+
+    def __init__(self, archive: TraceArchive, assay: dict[str, Any]) -> None:
+        self._archive = archive
+        self._assay = assay
+
+    def get_channels(self) -> dict[str, ABIF_Channel]:
+        """Return {dye_name: ABIF_Channel} with data viewing the archive."""
+        return {c['dye']: ABIF_Channel(c['dye'], c['wavelength'],
+                                       self._archive._slice(c))
+                for c in self._assay['channels']}
+
+    def get_run_start_time(self) -> datetime:
+        """Return run start as a datetime object."""
+        return datetime.fromisoformat(self._assay['run_start'])
+
+
+class TraceArchive:
+    """Memory-mapped reader of a trace archive."""
+
+    def __init__(self, path: str | PathLike) -> None:
+        self.path = Path(path)
+        with self.path.open('rb') as f:
+            try:
+                self._buf = mmap(f.fileno(), 0, access=ACCESS_READ)
+            except ValueError as exc:
+                raise RuntimeError(f'Not a trace archive: {path}') from exc
+
+        buf = self._buf
+        if len(buf) < _HEADER.size or buf[:4] != _MAGIC:
+            raise RuntimeError(f'Not a trace archive: {path}')
+        (_magic, version, index_offset, index_size) = \
+            _HEADER.unpack_from(buf, 0)
+        if version != ARCHIVE_FORMAT_VERSION:
+            raise RuntimeError(
+                f'Unsupported trace archive version {version}: {path}')
+        if index_offset + index_size > len(buf):
+            raise RuntimeError(f'Truncated trace archive: {path}')
+
+        index = json_loads(buf[index_offset:index_offset + index_size])
+        self._data = frombuffer(buf, _TRACE_DTYPE,
+                                (index_offset - _HEADER.size) // 2,
+                                _HEADER.size)
+        self._assays = {a['name']: a for a in index['assays']}
+
+        # FSA file names, which are unique within most runs, also find
+        # their assay
+        self._basenames: dict[str, str | None] = {}
+        for name in self._assays:
+            basename = PurePath(name).name
+            self._basenames[basename] = (
+                None if basename in self._basenames else name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._assays
+
+    def __len__(self) -> int:
+        return len(self._assays)
+
+    @property
+    def names(self) -> list[str]:
+        return list(self._assays)
+
+    def resolve(self, filename: str | PathLike) -> str | None:
+        """ return the assay name of an FSA filename, or None """
+        name = PurePath(filename).as_posix()
+        if name in self._assays:
+            return name
+        return self._basenames.get(PurePath(filename).name)
+
+    def info(self, name: str) -> dict[str, Any]:
+        """ return the index entry of an assay """
+        return self._assays[name]
+
+    def digest(self, name: str) -> str:
+        """ return sha256 hex digest of the original FSA file """
+        return self._assays[name]['digest']
+
+    def get_trace(self, name: str) -> ArchivedTrace:
+        return ArchivedTrace(self, self._assays[name])
+
+    def get_data(self, name: str, dye: str) -> ndarray:
+        """ return the raw trace of a dye of an assay, a read-only view """
+        for channel in self._assays[name]['channels']:
+            if channel['dye'] == dye:
+                return self._slice(channel)
+        raise KeyError(dye)
+
+    def _slice(self, channel: dict[str, Any]) -> ndarray:
+        start = channel['offset']
+        return self._data[start:start + channel['length']]
+
+
+def pack_archive(path: str | PathLike,
+                 files: Iterable[tuple[str, str | PathLike]]) -> int:
+    """ write the raw traces of files, (name, FSA path) pairs, to a trace
+        archive at path and return the number of assays
+    """
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    assays = []
+    names = set()
+    offset = 0
+    try:
+        with tmp_path.open('wb') as out:
+            out.write(bytes(_HEADER.size))
+            for (name, fsa_path) in files:
+                name = PurePath(name).as_posix()
+                if name in names:
+                    raise ValueError(f'Duplicated assay name: {name}')
+                names.add(name)
+
+                raw_data = Path(fsa_path).read_bytes()
+                trace = ABIF(ABIFTags(raw_data))
+                channels = []
+                for c in trace.get_channels().values():
+                    data = ascontiguousarray(c.raw, dtype=_TRACE_DTYPE)
+                    out.write(data.tobytes())
+                    channels.append({'dye': c.dye_name,
+                                     'wavelength': c.wavelength,
+                                     'offset': offset, 'length': len(data)})
+                    offset += len(data)
+                assays.append({
+                    'name': name,
+                    'digest': sha256(raw_data).hexdigest(),
+                    'run_start': trace.get_run_start_time().isoformat(),
+                    'channels': channels,
+                })
+
+            index = json_dumps({'assays': assays}).encode()
+            index_offset = out.tell()
+            out.write(index)
+            out.seek(0)
+            out.write(_HEADER.pack(_MAGIC, ARCHIVE_FORMAT_VERSION,
+                                   index_offset, len(index)))
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    replace(tmp_path, path)
+    return len(assays)
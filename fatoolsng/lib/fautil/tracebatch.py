@@ -0,0 +1,285 @@
+"""Batched normalization and peak detection of equal-length traces.
+
+The FSA files of one capillary run share their scan count, so the channels
+of many FSA can be stacked into one (n_traces, n_samples) array, which is
+normalized and searched for local maxima in one pass instead of channel
+after channel. Results go back into the channels: create_channels() gives
+every FSA its normalized channels and scan_channels() sets the peaks of
+every channel, as FSAMixIn.create_channels() and ChannelMixIn.scan() do.
+
+With the NumPy backend (backend.py) the stack goes through
+normalize_channels() and NumPy kernels working on all rows at once. With
+the JAX backend the same kernels are jit-compiled and vmap-ed over the
+rows; only the running median, which has no JAX counterpart, is computed
+by SciPy beforehand. Local maxima are those of peakutils.indexes(),
+including its suppression of maxima closer than min_dist to a higher one,
+which is resolved for all channels at once on the host.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Callable
+
+from numpy import (argsort, arange, asarray, concatenate, diff, empty, inf,
+                   maximum, minimum, ones, pad, searchsorted, stack,
+                   take_along_axis, where, zeros)
+from numpy.typing import NDArray
+
+from fatoolsng.lib import const
+from fatoolsng.lib.fautil import algo
+from fatoolsng.lib.fautil.backend import get_backend
+from fatoolsng.lib.fautil.normalize import (FFT_MIN_WINDOW,
+                                            NormalizedChannels,
+                                            normalize_channels, running_median,
+                                            _savgol_plan)
+
+
+# relative threshold of the local maxima of find_raw_peaks()
+PEAK_THRESHOLD = 1e-7
+
+# zeros appended to traces by find_raw_peaks() so that peaks at the end of
+# a trace are found
+PEAK_PADDING = 3
+
+
+def normalize_batch(raw: Any, medwinsize: int = 399, savgol_size: int = 11,
+                    savgol_order: int = 5,
+                    tophat_factor: float = 0.01) -> NormalizedChannels:
+    """ return normalize_channels() of raw, an array of (n_traces,
+        n_samples) traces, computed on the current backend
+    """
+    B = get_backend()
+    if B.name == 'numpy':
+        return normalize_channels(raw, medwinsize, savgol_size, savgol_order,
+                                  tophat_factor)
+
+    raw = asarray(raw, dtype=float)
+    tophat_size = int(round(raw.shape[1] * tophat_factor))
+    kernel = _jax_normalize_kernel(medwinsize, savgol_size, savgol_order,
+                                   tophat_size)
+    signal, baseline = kernel(B.asarray(raw),
+                              B.asarray(running_median(raw, medwinsize)))
+    return NormalizedChannels(signal=B.to_numpy(signal),
+                              baseline=B.to_numpy(baseline))
+
+
+def local_maxima(y: Any, offsets: Any, thres: float = PEAK_THRESHOLD) -> NDArray:
+    """ return the (n_traces, n_samples) mask of the local maxima of the rows
+        of y that peakutils.indexes(row[offset:], thres) finds before
+        enforcing its minimum distance, computed on the current backend
+    """
+    B = get_backend()
+    y = asarray(y, dtype=float)
+    offsets = asarray(offsets, dtype=int)
+    if B.name == 'numpy':
+        return _local_maxima(y, offsets, thres)
+    return B.to_numpy(_jax_local_maxima()(B.asarray(y), B.asarray(offsets),
+                                          thres))
+
+
+def suppress_close(positions: NDArray, ranks: NDArray,
+                   min_dist: int) -> NDArray:
+    """ return the mask of the ascending positions that peakutils.indexes()
+        keeps when it walks them by rank, dropping the positions within
+        min_dist of each position it keeps
+
+        instead of walking positions one by one, all positions ranking first
+        among their undecided neighbours are kept at once, which leads to
+        the same positions in a few passes
+    """
+    kept = zeros(len(positions), dtype=bool)
+    undecided = arange(len(positions))
+    while len(undecided):
+        pos = positions[undecided]
+        rank = ranks[undecided]
+        first = ones(len(pos), dtype=bool)
+        near = []
+        # undecided neighbours are contiguous, none is near a kept position
+        for k in range(1, min_dist + 1):
+            close = pos[k:] - pos[:-k] <= min_dist
+            if not close.any():
+                break
+            near.append((k, close))
+            first[k:] &= ~close | (rank[k:] < rank[:-k])
+            first[:-k] &= ~close | (rank[:-k] < rank[k:])
+        kept[undecided[first]] = True
+        dropped = first.copy()
+        for (k, close) in near:
+            dropped[k:] |= close & first[:-k]
+            dropped[:-k] |= close & first[k:]
+        undecided = undecided[~dropped]
+    return kept
+
+
+def find_local_maxima(data: Any, offsets: Any, min_dist: int) -> list[NDArray]:
+    """ return, for every row of data, the indices of the local maxima of
+        row[offset:] that find_raw_peaks() detects
+    """
+    y = pad(asarray(data, dtype=float), ((0, 0), (0, PEAK_PADDING)))
+    rows, cols = local_maxima(y, offsets).nonzero()
+    bounds = searchsorted(rows, arange(len(y) + 1))
+
+    # rank the maxima of each row in the order peakutils walks them
+    ranks = empty(len(cols), dtype=int)
+    for (row, start, end) in zip(y, bounds[:-1], bounds[1:]):
+        order = argsort(row[cols[start:end]])[::-1]
+        ranks[start + order] = arange(end - start)
+    if min_dist > 1:
+        # rows far enough apart not to interact
+        positions = rows * (y.shape[1] + min_dist + 1) + cols
+        keep = suppress_close(positions, ranks, min_dist)
+    else:
+        keep = ones(len(cols), dtype=bool)
+
+    return [cols[start:end][keep[start:end]] - offset
+            for (start, end, offset) in zip(bounds[:-1], bounds[1:], offsets)]
+
+
+def create_channels(fsas: list) -> None:
+    """ create the normalized channels of FSA without channels, normalizing
+        the channels of equal length of all of them together
+    """
+    traces = {}
+    for fsa in fsas:
+        if not fsa.channels:
+            traces[fsa] = list(fsa.get_trace().get_channels().values())
+
+    groups = defaultdict(list)
+    for (fsa, channels) in traces.items():
+        for (i, c) in enumerate(channels):
+            groups[len(c.raw)].append((fsa, i))
+
+    signals = {}
+    for members in groups.values():
+        nc = normalize_batch(stack([traces[fsa][i].raw
+                                    for (fsa, i) in members]),
+                             **algo.NORMALIZATION_PARAMS)
+        for (key, signal) in zip(members, nc.signal):
+            signals[key] = signal
+
+    for (fsa, channels) in traces.items():
+        fsa.create_channels([
+            algo.TraceChannel(c.dye_name, c.wavelength, asarray(c.raw),
+                              signals[fsa, i])
+            for (i, c) in enumerate(channels)])
+
+
+def scan_channels(channels: list, parameters: Any) -> None:
+    """ scan the channels not scanned yet for peaks, as ChannelMixIn.scan()
+        does, detecting the local maxima of channels of equal length
+        together
+    """
+    groups = defaultdict(list)
+    for c in channels:
+        if c.status != const.channelstatus.reseted:
+            continue
+        params = parameters.ladder if c.is_ladder() else parameters.nonladder
+        groups[len(c.data), id(params)].append((c, params))
+
+    for members in groups.values():
+        params = members[0][1]
+        setups = [algo.scan_setup(c, params) for (c, _) in members]
+        if params.method == 'cwt':
+            indices = [None] * len(members)
+        else:
+            indices = find_local_maxima(stack([c.data for (c, _) in members]),
+                                        [offset for (offset, _) in setups],
+                                        params.min_dist)
+        for ((c, _), (offset, _), idx) in zip(members, setups, indices):
+            algo.scan_peaks(c, params, offset, indices=idx)
+
+
+# kernels
+
+def _local_maxima(y: NDArray, offsets: NDArray, thres: float) -> NDArray:
+    n_samples = y.shape[1]
+    valid = arange(n_samples)[None, :] >= offsets[:, None]
+    low = where(valid, y, inf).min(axis=1, keepdims=True)
+    high = where(valid, y, -inf).max(axis=1, keepdims=True)
+    level = thres * (high - low) + low
+
+    # the zero differences of plateaus take the closest non-zero difference
+    # before the middle of the plateau and the one after it from there on
+    j = arange(n_samples - 1)
+    dvalid = j[None, :] >= offsets[:, None]
+    dy = where(dvalid, diff(y, axis=1), 0)
+    nonzero = dy != 0
+    prev = maximum.accumulate(where(nonzero, j, -1), axis=1)
+    nxt = minimum.accumulate(where(nonzero, j, n_samples - 1)[:, ::-1],
+                             axis=1)[:, ::-1]
+    has_next = nxt < n_samples - 1
+    take_prev = ((prev >= 0) & (j < (prev + nxt) / 2)) | ~has_next
+    fill = take_along_axis(dy, where(take_prev, prev, nxt).clip(0,
+                                                              n_samples - 2),
+                           axis=1)
+    dy = where(nonzero | ~dvalid, dy, fill)
+
+    pad0 = zeros((len(y), 1))
+    return ((concatenate((dy, pad0), axis=1) < 0)
+            & (concatenate((pad0, dy), axis=1) > 0)
+            & (y > level) & valid & nonzero.any(axis=1, keepdims=True))
+
+
+@lru_cache(maxsize=None)
+def _jax_local_maxima() -> Callable:
+    from jax import jit, lax, vmap
+    import jax.numpy as jnp
+
+    def row_maxima(y, offset, thres):
+        n_samples = y.shape[0]
+        valid = jnp.arange(n_samples) >= offset
+        low = jnp.where(valid, y, jnp.inf).min()
+        high = jnp.where(valid, y, -jnp.inf).max()
+        level = thres * (high - low) + low
+
+        j = jnp.arange(n_samples - 1)
+        dvalid = j >= offset
+        dy = jnp.where(dvalid, jnp.diff(y), 0)
+        nonzero = dy != 0
+        prev = lax.cummax(jnp.where(nonzero, j, -1))
+        nxt = lax.cummin(jnp.where(nonzero, j, n_samples - 1), reverse=True)
+        has_next = nxt < n_samples - 1
+        take_prev = ((prev >= 0) & (j < (prev + nxt) / 2)) | ~has_next
+        fill = dy[jnp.where(take_prev, prev, nxt).clip(0, n_samples - 2)]
+        dy = jnp.where(nonzero | ~dvalid, dy, fill)
+
+        return ((jnp.append(dy, 0.0) < 0) & (jnp.insert(dy, 0, 0.0) > 0)
+                & (y > level) & valid & nonzero.any())
+
+    return jit(vmap(row_maxima, in_axes=(0, 0, None)))
+
+
+@lru_cache(maxsize=None)
+def _jax_normalize_kernel(medwinsize: int, savgol_size: int,
+                          savgol_order: int, tophat_size: int) -> Callable:
+    from jax import jit, lax, vmap
+    from jax.scipy.signal import fftconvolve
+    import jax.numpy as jnp
+
+    def savgol(x, window, order):
+        # savgol_rows(), ie. savgol_filter(mode='interp'), of one row
+        coeffs, start, end = _savgol_plan(window, order)
+        half = window // 2
+        convolve = fftconvolve if window > FFT_MIN_WINDOW else jnp.convolve
+        y = convolve(x, jnp.asarray(coeffs), mode='same')
+        y = y.at[:half].set(jnp.asarray(start) @ x[:window])
+        return y.at[-half:].set(jnp.asarray(end) @ x[-window:])
+
+    def grey(x, op, init, before):
+        # flat grey erosion/dilation of scipy.ndimage, mode='reflect'
+        after = tophat_size - 1 - before
+        padded = jnp.pad(x, (before, after), mode='symmetric')
+        return lax.reduce_window(padded, init, op, (tophat_size,), (1,),
+                                 'valid')
+
+    def row_normalize(raw, median_line):
+        baseline = savgol(median_line, medwinsize, savgol_order)
+        smooth = savgol(jnp.maximum(raw - baseline, 0), savgol_size,
+                        savgol_order)
+        eroded = grey(smooth, lax.min, jnp.inf, tophat_size // 2)
+        opened = grey(eroded, lax.max, -jnp.inf, (tophat_size - 1) // 2)
+        return smooth - opened, baseline
+
+    return jit(vmap(row_normalize))
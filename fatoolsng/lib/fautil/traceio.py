@@ -1,8 +1,12 @@
-"""ABIF/FSA file reader — Biopython-backed, instrument-agnostic.
+"""ABIF/FSA file reader — instrument-agnostic.
 
-Replaces the original hand-rolled struct parser with Bio.SeqIO.AbiIO,
-which handles all ABIF data types and all instruments (ABI 3500/3730,
-SeqStudio, SeqStudio Flex, RapidHIT, Promega CE, third-party clones).
+read_abif_stream() memory-maps the file when it can, parses the ABIF
+directory and decodes a tag only when it is asked for, so reading an FSA
+file only touches the DATA, DyeN/DyeW and RUND/RUNT tags. DATA arrays
+are returned as zero-copy big-endian numpy views of the file.
+
+read_abif_stream_biopython() decodes the whole file with Bio.SeqIO.AbiIO
+and is kept as a reference for the native reader.
 
 Public interface is unchanged: read_abif_stream() → ABIF, with
 ABIF.get_channels() and ABIF.get_run_start_time().
@@ -10,16 +14,18 @@ ABIF.get_channels() and ABIF.get_run_start_time().
 
 from __future__ import annotations
 
-from datetime import datetime
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import date, datetime, time
 from io import BytesIO
-from typing import BinaryIO
+from mmap import mmap, ACCESS_READ
+from struct import Struct, error as StructError
+from os import PathLike
+from typing import Any, BinaryIO, Iterator
 
-from Bio.SeqIO import read as bio_read
-from jax.numpy import array
+from numpy import asarray, dtype, frombuffer
 from numpy.typing import NDArray
 
-from fatoolsng.lib.fautil.traceutils import smooth_signal, correct_baseline
-
 
 # Fallback wavelengths when DyeW tags are absent from the file.
 WAVELENGTH = {
@@ -50,14 +56,134 @@ _DYE_ALIASES = {
 }
 
 
-def _decode_dye(raw: str | bytes) -> str:
-    """Decode a bytes dye name, strip nulls/whitespace, apply alias map."""
+# ABIF header: magic and version, followed by the directory entry pointing
+# to the tag directory; each directory entry holds name, number, element
+# type, element size, element count, data size, data offset and a handle
+_HEADER = Struct('>4sh')
+_DIR_ENTRY = Struct('>4sihhiiii')
+
+# element types decoded as numpy arrays, everything else is decoded as
+# Bio.SeqIO.AbiIO does
+_NUMERIC_DTYPES = {
+    1:  dtype('i1'),     # byte
+    3:  dtype('>u2'),    # word
+    4:  dtype('>i2'),    # short
+    5:  dtype('>i4'),    # long
+    7:  dtype('>f4'),    # float
+    8:  dtype('>f8'),    # double
+    13: dtype('?'),      # bool
+}
+_DATE = Struct('>hBB')
+_TIME = Struct('>4B')
+
+
+class ABIFTags(Mapping):
+    """Tags of an ABIF buffer, keyed as Biopython's abif_raw ('DATA1', ...).
+
+    Only the directory is parsed on construction; a tag is decoded when it
+    is first looked up. Arrays of numeric elements are returned as views of
+    the buffer, single elements as Python scalars.
+    """
+
+    def __init__(self, buf: Any) -> None:
+        self._buf = buf
+        # key -> (element type, element size, element count, data size,
+        #         data offset)
+        self._entries: dict[str, tuple[int, int, int, int, int]] = {}
+        self._values: dict[str, Any] = {}
+
+        if bytes(buf[:4]) != b'ABIF':
+            raise RuntimeError('Not a valid ABIF file')
+        try:
+            (_name, _number, _type, entry_size, n_entries, _size, dir_offset,
+             _handle) = _DIR_ENTRY.unpack_from(buf, _HEADER.size)
+            for i in range(n_entries):
+                start = dir_offset + i * entry_size
+                (name, number, elem_type, elem_size, count, data_size, offset,
+                 _handle) = _DIR_ENTRY.unpack_from(buf, start)
+                if data_size <= 4:
+                    # small data are stored in the offset field of the entry
+                    offset = start + 20
+                key = name.decode('ascii', errors='replace') + str(number)
+                self._entries[key] = (elem_type, elem_size, count, data_size,
+                                      offset)
+        except StructError as exc:
+            raise RuntimeError('Not a valid ABIF file') from exc
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        value = self._values[key] = self._decode(*self._entries[key])
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def count(self, key: str) -> int:
+        """Return the number of elements of a tag without decoding it."""
+        return self._entries[key][2]
+
+    def validate(self) -> None:
+        """Raise RuntimeError unless the data of every tag lies within the
+        buffer and is large enough for its elements."""
+        buf_size = len(self._buf)
+        for (key, (elem_type, elem_size, count, data_size, offset)) \
+                in self._entries.items():
+            if offset < 0 or offset + data_size > buf_size:
+                raise RuntimeError(f'ABIF tag {key} lies outside of the file')
+            if count * elem_size > data_size or (
+                    elem_type in _NUMERIC_DTYPES and
+                    count * _NUMERIC_DTYPES[elem_type].itemsize > data_size):
+                raise RuntimeError(f'ABIF tag {key} holds too few bytes')
+
+    def _decode(self, elem_type: int, _elem_size: int, count: int,
+                data_size: int, offset: int) -> Any:
+        buf = self._buf
+        if elem_type in _NUMERIC_DTYPES:
+            values = frombuffer(buf, _NUMERIC_DTYPES[elem_type], count, offset)
+            return values[0].item() if count == 1 else values
+        if elem_type == 2:
+            return bytes(buf[offset:offset + count])
+        if elem_type == 10:
+            return str(date(*_DATE.unpack_from(buf, offset)))
+        if elem_type == 11:
+            return str(time(*_TIME.unpack_from(buf, offset)[:3]))
+        if elem_type == 18:
+            return bytes(buf[offset + 1:offset + count])
+        if elem_type == 19:
+            return bytes(buf[offset:offset + count - 1])
+        return None
+
+
+def _decode_text(raw: str | bytes | None) -> str:
+    """Decode a bytes string, strip nulls/whitespace."""
     if isinstance(raw, bytes):
         raw = raw.decode('ascii', errors='replace')
-    name = raw.strip('\x00').strip()
+    return (raw or '').strip('\x00').strip()
+
+
+def _decode_dye(raw: str | bytes) -> str:
+    """Decode a bytes dye name, strip nulls/whitespace, apply alias map."""
+    name = _decode_text(raw)
     return _DYE_ALIASES.get(name, name)
 
 
+@dataclass
+class ABIFInfo:
+    """Run metadata read from the directory of an ABIF file."""
+    dyes: list[str]
+    dye_set: str
+    run_start: datetime
+    instrument: str
+    model: str
+    scans: int
+
+
 class ABIF_Channel:
     """One fluorescence channel from an FSA file."""
 
@@ -70,14 +196,17 @@ class ABIF_Channel:
     def smooth(self) -> NDArray:
         """Return baseline-corrected Savitzky-Golay smoothed trace (cached)."""
         if self._smooth is None:
+            from fatoolsng.lib.fautil.traceutils import (smooth_signal,
+                                                         correct_baseline)
             self._smooth = correct_baseline(smooth_signal(self.raw))
         return self._smooth
 
 
 class ABIF:
-    """Thin wrapper around Biopython's abif_raw tag dictionary."""
+    """Thin wrapper around an ABIF tag dictionary, either ABIFTags or
+    Biopython's abif_raw."""
 
-    def __init__(self, raw: dict) -> None:
+    def __init__(self, raw: Mapping) -> None:
         self._raw = raw  # dict: tag+number → parsed value
 
     # ------------------------------------------------------------------
@@ -121,7 +250,7 @@ class ABIF:
                 else WAVELENGTH.get(dye_name, 0)
 
             results[dye_name] = ABIF_Channel(dye_name, wavelength,
-                                             array(trace_data))
+                                             asarray(trace_data))
         return results
 
     def get_run_start_time(self) -> datetime:
@@ -134,12 +263,71 @@ class ABIF:
 # ------------------------------------------------------------------
 # Public entry point
 
+def _map_stream(istream: BinaryIO) -> Any:
+    """Return a read-only mmap of a file stream, or its content."""
+    try:
+        if istream.tell() == 0:
+            return mmap(istream.fileno(), 0, access=ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        # not a file (BytesIO, ...) or an empty file
+        pass
+    return istream.read()
+
+
 def read_abif_stream(istream: BinaryIO) -> ABIF:
     """Parse an ABIF/FSA stream and return an ABIF object.
 
-    Accepts any binary stream (file handle, BytesIO, etc.).
+    Accepts any binary stream (file handle, BytesIO, etc.); files are
+    memory-mapped and stay mapped while their DATA arrays are in use.
     Raises RuntimeError if the stream is not a valid ABIF file.
     """
+    return ABIF(ABIFTags(_map_stream(istream)))
+
+
+def scan_abif_file(path: str | PathLike) -> ABIFInfo:
+    """Validate the ABIF directory of a file and return its run metadata.
+
+    Only the header, the directory and a few small tags are read; trace
+    data are never decoded. Raises RuntimeError if the file is not a valid
+    ABIF file, OSError if it cannot be read.
+    """
+    with open(path, 'rb') as istream:
+        buf = _map_stream(istream)
+    try:
+        tags = ABIFTags(buf)
+        tags.validate()
+        dyes = [_decode_dye(tags[f'DyeN{idx}']) for idx in range(1, 6)
+                if f'DyeN{idx}' in tags]
+        if 'SCAN1' in tags:
+            scans = int(tags['SCAN1'])
+        else:
+            scans = next((tags.count(key) for key in ('DATA1', 'DATA9')
+                          if key in tags), 0)
+        try:
+            run_start = ABIF(tags).get_run_start_time()
+        except ValueError as exc:
+            raise RuntimeError(f'Invalid run date or time: {exc}') from exc
+        info = ABIFInfo(dyes=dyes,
+                        dye_set=_decode_text(tags.get('DySN1')),
+                        run_start=run_start,
+                        instrument=_decode_text(tags.get('MCHN1')),
+                        model=_decode_text(tags.get('MODL1')),
+                        scans=scans)
+    finally:
+        if isinstance(buf, mmap):
+            try:
+                buf.close()
+            except BufferError:
+                # a view of a malformed tag is still referenced, the map is
+                # closed when it is released
+                pass
+    return info
+
+
+def read_abif_stream_biopython(istream: BinaryIO) -> ABIF:
+    """Parse an ABIF/FSA stream with Biopython, decoding every tag."""
+    from Bio.SeqIO import read as bio_read
+
     data = istream.read()
     if not data.startswith(b'ABIF'):
         raise RuntimeError('Not a valid ABIF file')
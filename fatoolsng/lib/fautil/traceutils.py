@@ -1,46 +1,13 @@
 from math import factorial
-from jax.numpy import (repeat, min, max, mean, median, std, linalg, abs,
-                       maximum, linspace, hanning, r_, ones, sum, array,
-                       concatenate, convolve)
-from numpy import asmatrix as mat
+from numpy import asarray, mean, median, std
 from dataclasses import dataclass
 from typing import Any
-from scipy.optimize import curve_fit
 from scipy.ndimage import white_tophat
-from scipy.signal import medfilt, savgol_filter
-from scipy.signal import find_peaks as _scipy_find_peaks
-from numpy import (asarray as _asarray, percentile as _percentile,
-                   absolute as _absolute, zeros as _zeros, convolve as _convolve,
-                   pi as _pi, exp as _np_exp, arange as _arange, sqrt as _np_sqrt)
-
-
-def _ricker(points, a):
-    """Ricker (Mexican hat) wavelet."""
-    A = 2 / (_np_sqrt(3 * a) * (_pi ** 0.25))
-    vec = _arange(points) - (points - 1.0) / 2
-    tsq = vec ** 2
-    wsq = a ** 2
-    return A * (1 - tsq / wsq) * _np_exp(-tsq / (2 * wsq))
-
-
-def _cwt(data, widths):
-    """Continuous wavelet transform using the Ricker wavelet."""
-    out = _zeros((len(widths), len(data)))
-    for i, w in enumerate(widths):
-        n = 10 * int(w)
-        if n > len(data):
-            n = len(data)
-        wav = _ricker(n, w)[::-1]
-        out[i] = _convolve(data, wav, mode='same')
-    return out
-
-
-def _cwt_find_peaks(vector, widths, min_snr=1):
-    cwt_matrix = _cwt(_asarray(vector, dtype=float), widths)
-    response = cwt_matrix.max(axis=0)
-    noise = float(_percentile(_absolute(response), 10)) or 1.0
-    peaks, _ = _scipy_find_peaks(response, height=min_snr * noise)
-    return peaks
+from fatoolsng.lib.fautil.backend import get_backend
+from fatoolsng.lib.fautil.normalize import (normalize_channels, func_mm,
+                                            smooth_rows)
+from fatoolsng.lib.fautil.cwt import (ricker as _ricker, cwt as _cwt,
+                                      cwt_find_peaks as _cwt_find_peaks)
 
 _TOPHAT_FACTOR = 0.01  # 025   #05
 _MEDWINSIZE = 299
@@ -54,14 +21,13 @@ def b(txt):
 
 def smooth_signal(raw_signal):
     """ smooth signal using savitzky_golay algorithm """
-    return savitzky_golay(raw_signal, 11, 7)
+    return smooth_rows(raw_signal, 11, 7)[0]
 
 
 def correct_baseline(signal):
     """ use tophat morphological transform to correct for baseline """
 
-    return white_tophat(signal, None,
-                        repeat([1], int(round(signal.size*_TOPHAT_FACTOR))))
+    return white_tophat(signal, int(round(signal.size*_TOPHAT_FACTOR)))
 
 
 @dataclass
@@ -72,33 +38,14 @@ class NormalizedTrace:
     mmb: Any
 
 
-def func_mm(x, a, b):
-    """ Michaelis Menten kinetics equation -
-        this has a nice property of passing initial value and plateau
-    """
-    return a*x/(b+x)
-
-
 def normalize_baseline(raw):
     """ return mean, median, sd and smooth signal """
 
-    median_line = medfilt(raw, [_MEDWINSIZE])
-    baseline = savgol_filter(median_line, _MEDWINSIZE, 7)
-    corrected_baseline = raw - baseline
-    maximum(corrected_baseline, 0, out=corrected_baseline)
-    smooth = correct_baseline(savgol_filter(corrected_baseline, 11, 7))
-
-    # perform michaelis-menten equation for baseline assessment
-    mm_line = medfilt(raw, [_MEDMMSIZE])
-    xx = linspace(0, len(raw))
-    try:
-        popt, pcov = curve_fit(func_mm, xx, mm_line)
-    except:
-        # michaelis menten are not appropriate for this scale
-        popt = pcov = [0, 0]
+    nc = normalize_channels(raw, _MEDWINSIZE, 11, 7, _TOPHAT_FACTOR,
+                            mm_winsize=_MEDMMSIZE)
 
-    return NormalizedTrace(signal=smooth, baseline=baseline, mma=popt[0],
-                           mmb=popt[1])
+    return NormalizedTrace(signal=nc.signal[0], baseline=nc.baseline[0],
+                           mma=nc.mma[0], mmb=nc.mmb[0])
 
 
 def search_peaks(signal, cwt_widths, min_snr):
@@ -217,7 +164,7 @@ def separate_channels(trace):
             except KeyError:
                 dye_wavelength = WAVELENGTH[dye_name]
 
-            raw_channel = array(trace.get_data(b(f'DATA{data_idx}')))
+            raw_channel = asarray(trace.get_data(b(f'DATA{data_idx}')))
             nt = normalize_baseline(raw_channel)
 
             results.append(TraceChannel(dye_name, dye_wavelength, raw_channel,
@@ -290,16 +237,19 @@ def savitzky_golay(y, window_size, order, deriv=0, rate=1):
         raise TypeError("window_size is too small for the polynomials order")
     order_range = range(order+1)
     half_window = (window_size - 1) // 2
+    B = get_backend()
     # precompute coefficients
-    b = mat([[k**i for i in order_range] for k in range(-half_window,
-                                                        half_window+1)])
-    m = linalg.pinv(b).A[deriv] * rate**deriv * factorial(deriv)
+    b = B.asarray([[k**i for i in order_range] for k in range(-half_window,
+                                                              half_window+1)],
+                  dtype=float)
+    m = B.linalg.pinv(b)[deriv] * rate**deriv * factorial(deriv)
     # pad the signal at the extremes with
     # values taken from the signal itself
-    firstvals = y[0] - abs(y[1:half_window+1][::-1] - y[0])
-    lastvals = y[-1] + abs(y[-half_window-1:-1][::-1] - y[-1])
-    y = concatenate((firstvals, y, lastvals))
-    return convolve(m[::-1], y, mode='valid')
+    y = B.asarray(y)
+    firstvals = y[0] - B.abs(y[1:half_window+1][::-1] - y[0])
+    lastvals = y[-1] + B.abs(y[-half_window-1:-1][::-1] - y[-1])
+    y = B.concatenate((firstvals, y, lastvals))
+    return B.to_numpy(B.convolve(m[::-1], y, mode='valid'))
 
 
 def smooth(x, window_len=11, window='hanning'):
@@ -350,12 +300,14 @@ def smooth(x, window_len=11, window='hanning'):
     if not window in ['flat', 'hanning', 'hamming', 'bartlett', 'blackman']:
         raise ValueError("Window is on of 'flat', 'hanning', 'hamming', 'bartlett', 'blackman'")
 
-    s = r_[x[window_len-1:0:-1], x, x[-1:-window_len:-1]]
+    B = get_backend()
+    x = B.asarray(x)
+    s = B.concatenate((x[window_len-1:0:-1], x, x[-1:-window_len:-1]))
     # print(len(s))
     if window == 'flat':  # moving average
-        w = ones(window_len, 'd')
+        w = B.ones(window_len, dtype='d')
     else:
-        w = eval('hanning(window_len)')
+        w = B.hanning(window_len)
 
-    y = convolve(w/w.sum(), s, mode='valid')
-    return y
+    y = B.convolve(w/w.sum(), s, mode='valid')
+    return B.to_numpy(y)
@@ -0,0 +1,34 @@
+# wsalign.py
+# warm-start alignment from the z of a sibling capillary
+
+from fatoolsng.lib.utils import cerr
+from fatoolsng.lib import const
+from fatoolsng.lib.fautil.alignutils import align_dp, AlignResult
+from fatoolsng.lib.fautil.gmalign import ZFunc, align_gm
+
+
+def align_ws(peaks, ladder, z):
+    """ warm-start method: align peaks starting from z, the sizing curve of
+        an aligned capillary of the same run, whose sizing curve is nearly
+        identical
+
+        the dynamic programming alignment from z is accepted if it passes
+        the strict criteria, otherwise it is refined by generalized
+        minimization from its z
+    """
+
+    cerr('I: warm-start method is running!')
+
+    f = ZFunc(peaks, ladder['sizes'], [])
+    dp_result = align_dp(f.rtimes, f.sizes, f.similarity, z, -1)
+    dp_result.sized_peaks = f.get_sized_peaks(dp_result.sized_peaks)
+
+    score, msg = ladder['qcfunc'](dp_result, method='strict')
+    if score > 0.9:
+        return AlignResult(score, msg, dp_result, const.alignmethod.ws_strict)
+
+    result = align_gm(peaks, ladder, [], dp_result.z)
+    result.method = (const.alignmethod.ws_strict
+                     if result.method == const.alignmethod.gm_strict
+                     else const.alignmethod.ws_relax)
+    return result
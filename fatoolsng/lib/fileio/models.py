@@ -7,8 +7,11 @@ from fatoolsng.lib.utils import cerr  # , cout
 from fatoolsng.lib.fautil.mixin import (MarkerMixIn, PanelMixIn, ChannelMixIn,
                                         FSAMixIn, AlleleMixIn)
 from fatoolsng.lib import const
+from fatoolsng.lib.fautil.algo import NORMALIZATION_PARAMS, create_alleles
+from fatoolsng.lib.fautil.channelcache import (get_channel_cache,
+                                               DEFAULT_MAX_SIZE)
 from pathlib import Path
-from pickle import load as pickle_load, dump as pickle_dump
+from io import BytesIO
 
 
 class Marker(MarkerMixIn):
@@ -46,6 +49,10 @@ class Panel(PanelMixIn):
     def get_panel(cls, panel_code):
         return cls.container[panel_code]
 
+    def set_ladder_dye(self, ladder):
+        # file-based panels use the dye of the ladder in const.ladders
+        pass
+
 
 class Allele(AlleleMixIn):
 
@@ -70,7 +77,7 @@ class Allele(AlleleMixIn):
 
 class Channel(ChannelMixIn):
 
-    __slots__ = []
+    __slots__ = ['_alleles', '_peaks']
 
     Allele = Allele
 
@@ -85,6 +92,23 @@ class Channel(ChannelMixIn):
 
         self.assign()
 
+    @property
+    def alleles(self):
+        # alleles of scanned peaks are only created once they are needed
+        if self._peaks is not None:
+            peaks, self._peaks = self._peaks, None
+            create_alleles(self, peaks)
+        return self._alleles
+
+    @alleles.setter
+    def alleles(self, alleles):
+        self._alleles = alleles
+        self._peaks = None
+
+    def set_peaks(self, peaks):
+        self.alleles = []
+        self._peaks = peaks
+
     def add_allele(self, allele):
         self.alleles.append(allele)
         return allele
@@ -92,13 +116,19 @@ class Channel(ChannelMixIn):
 
 class FSA(FSAMixIn):
 
-    __slots__ = ['_fhdl', '_trace']
+    __slots__ = ['_fhdl', '_trace', '_cache_entry', '_align_cache']
 
     Channel = Channel
 
     def __init__(self):
         self.channels = []
         self.excluded_markers = []
+        self._cache_entry = None
+        self._align_cache = None
+
+    @property
+    def align_cache(self):
+        return self._align_cache
 
     def get_data_stream(self):
         return self._fhdl
@@ -107,39 +137,66 @@ class FSA(FSAMixIn):
         self.channels.append(channel)
         return channel
 
+    def release(self):
+        """ drop trace data once the results of this FSA have been written """
+        for c in self.channels:
+            c.data = None
+        if hasattr(self, '_trace'):
+            del self._trace
+
     @classmethod
     def from_file(cls, fsa_filename, panel, excluded_markers=None,
-                  cache=True, cache_path=None):
+                  cache=True, cache_path=None, cache_size=DEFAULT_MAX_SIZE,
+                  archive=None, normalize=True, align_cache=None):
+        """ return FSA of fsa_filename, whose trace is read from archive, a
+            TraceArchive, when it holds the file, and whose ladder alignment
+            is looked up in and stored into align_cache, an AlignCache
+
+            with normalize=False, channels not found in the cache are left
+            to be created by create_channels(), eg. for many FSA at once
+            by tracebatch.create_channels()
+        """
         fsa = cls()
         fsa.filename = Path(fsa_filename).name
         fsa.set_panel(panel, excluded_markers)
-        # with fileio, we need to prepare channels everytime or seek from cache
-        if cache_path is None:
-            cache = False
+        fsa._align_cache = align_cache
+        name = archive.resolve(fsa_filename) if archive is not None else None
+        if name is None:
+            with open(fsa_filename, 'rb') as fsa_handle:
+                raw_data = fsa_handle.read()
+            digest = None
         else:
-            cache_file = Path(cache_path) / fsa.filename
-        if cache and cache_file.exists():
-            if Path(fsa_filename).stat().st_mtime < cache_file.stat().st_mtime:
+            raw_data = None
+            digest = archive.digest(name)
+        # with fileio, we need to prepare channels everytime or seek from cache
+        channel_cache = None
+        if cache and cache_path is not None:
+            channel_cache = get_channel_cache(Path(cache_path), cache_size)
+            key = channel_cache.key(raw_data, NORMALIZATION_PARAMS, digest)
+            channels = channel_cache.get(key)
+            if channels is not None:
                 cerr(f'I: uploading channel cache for {fsa_filename}')
-                try:
-                    with open(cache_file, 'rb') as cache_handle_read:
-                        fsa.channels = pickle_load(cache_handle_read)
-                    for c in fsa.channels:
-                        c.fsa = fsa
-                    # assume channels are already normalized
-                    fsa.status = const.assaystatus.normalized
-                    return fsa
-                except AttributeError:
-                    cerr('E: uploading failed, will recreate cache')
-        with open(fsa_filename, 'rb') as fsa_handle:
-            fsa._fhdl = fsa_handle
+                for (dye, wavelen, data) in channels:
+                    fsa.add_channel(cls.Channel(
+                        data=data, dye=dye, wavelen=wavelen,
+                        status=const.channelstatus.reseted, fsa=fsa))
+                # channels are already normalized
+                fsa.status = const.assaystatus.normalized
+                return fsa
+        if name is None:
+            fsa._fhdl = BytesIO(raw_data)
+        else:
+            fsa._trace = archive.get_trace(name)
+        if channel_cache:
+            fsa._cache_entry = (channel_cache, key)
+        if normalize:
             fsa.create_channels()
-            fsa._fhdl = None
-        if cache and Path(cache_path).exists():
-            for c in fsa.channels:
-                c.fsa = None
-            with open(cache_file, 'wb') as cache_handle_write:
-                pickle_dump(fsa.channels, cache_handle_write)
-            for c in fsa.channels:
-                c.fsa = fsa
         return fsa
+
+    def create_channels(self, trace_channels=None):
+        super().create_channels(trace_channels)
+        self._fhdl = None
+        if self._cache_entry:
+            (channel_cache, key), self._cache_entry = self._cache_entry, None
+            channel_cache.put(key, [(c.dye, c.wavelen, c.data)
+                                    for c in self.channels])
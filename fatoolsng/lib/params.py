@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from jax.numpy import arange
+from numpy import arange
 from numpy.typing import NDArray
 
 
@@ -113,9 +113,34 @@ class LadderScanningParameter(ScanningParameter):
         self.artifact_ratio = 0.5
 
 
+class AlignmentParameter:
+
+    portfolio: list[tuple[str, float | None]] | None
+    workers: int
+
+    def __init__(self) -> None:
+        # [(method, timeout in seconds or None), ...] of the aligners raced
+        # by portfolio.align_ladder_portfolio(), or None to try the aligners
+        # in sequence with algo.align_ladder()
+        self.portfolio = None
+        self.workers = 1
+
+
+class SizingParameter:
+
+    method: str
+
+    def __init__(self) -> None:
+        # const.allelemethod of the sizer of non-ladder peaks, see
+        # sizing.SIZERS
+        self.method = 'localsouthern'
+
+
 class Params:
     ladder: LadderScanningParameter = LadderScanningParameter()
     nonladder: ScanningParameter = ScanningParameter()
+    alignment: AlignmentParameter = AlignmentParameter()
+    sizing: SizingParameter = SizingParameter()
 
 
 default_panels = {
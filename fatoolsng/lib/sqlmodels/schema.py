@@ -31,7 +31,7 @@ from io import BytesIO
 from ruamel.yaml import YAML as yaml
 from copy import deepcopy
 from sys import exit
-from jax.numpy import save, load
+from numpy import save, load
 # __all__ = ['get_base', 'get_dbsession', 'set_datalogger']
 
 
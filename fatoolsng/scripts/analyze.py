@@ -4,7 +4,6 @@
 
 from argparse import ArgumentParser
 from ruamel.yaml import YAML as yaml
-from fatoolsng.lib.analytics.query import Query, load_yaml
 from fatoolsng.lib.utils import cout, cerr, cexit, get_dbhandler
 from fatoolsng.lib import params
 
@@ -171,6 +170,7 @@ def do_export(args, dbh):
 
 
 def get_query(args, dbh):
+    from fatoolsng.lib.analytics.query import Query, load_yaml
 
     query_params = load_yaml(open(args.yamlquery).read())
     if args.sample_qual_threshold >= 0:
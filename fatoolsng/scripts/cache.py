@@ -0,0 +1,94 @@
+from argparse import ArgumentParser
+from datetime import datetime
+from fatoolsng.lib.utils import cout, cerr
+
+
+def init_argparser(parser=None):
+
+    if parser is None:
+        p = ArgumentParser('cache')
+    else:
+        p = parser
+
+# commands
+    p.add_argument('--stats', default=False, action='store_true',
+                   help='show number of entries and size of channel cache and alignment cache')
+    p.add_argument('--prune', default=False, action='store_true',
+                   help='evict least recently used entries down to --max-size (0 also clears the alignment cache)')
+# options
+    p.add_argument('--cache-path',
+                   help='cache location used with --cache-path of fa command (defaults to home)')
+    p.add_argument('--max-size', default='2G',
+                   help='maximum cache size for --prune, eg. 500M or 2G; 0 clears the cache')
+
+    return p
+
+
+def main(args):
+    do_cache(args)
+
+
+def do_cache(args):
+
+    from fatoolsng.lib.fautil.channelcache import (ChannelCache,
+                                                   default_cache_path,
+                                                   parse_size)
+
+    cache = ChannelCache(default_cache_path(args.cache_path))
+
+    if args.stats:
+        do_stats(args, cache)
+    elif args.prune:
+        max_size = parse_size(args.max_size)
+        do_prune(args, cache, max_size)
+        if max_size == 0:
+            do_clear_alignments(args)
+    else:
+        cerr('Unknown command, nothing to do!')
+        return False
+    return True
+
+
+def do_stats(args, cache):
+
+    entries = cache.entries()
+    total = sum(e[1] for e in entries)
+    cout(f'Channel cache: {cache.path}')
+    cout(f'\tentries\t{len(entries)}')
+    cout(f'\tsize\t{total / 1024**2:.1f} MiB')
+    if entries:
+        cout(f'\toldest\t{datetime.fromtimestamp(entries[0][0]):%Y-%m-%d %H:%M:%S}')
+        cout(f'\tnewest\t{datetime.fromtimestamp(entries[-1][0]):%Y-%m-%d %H:%M:%S}')
+
+    align_cache = open_align_cache(args)
+    if align_cache is not None:
+        cout(f'Alignment cache: {align_cache.path}')
+        cout(f'\tentries\t{len(align_cache)}')
+        align_cache.close()
+
+
+def do_prune(args, cache, max_size):
+
+    removed, removed_size = cache.prune(max_size)
+    cout(f'Removed {removed} entries ({removed_size / 1024**2:.1f} MiB) from {cache.path}')
+
+
+def do_clear_alignments(args):
+
+    align_cache = open_align_cache(args)
+    if align_cache is not None:
+        removed = align_cache.clear()
+        cout(f'Removed {removed} alignments from {align_cache.path}')
+        align_cache.close()
+
+
+def open_align_cache(args):
+    """ return the AlignCache of args.cache_path, or None if there is none """
+
+    from fatoolsng.lib.fautil.aligncache import (AlignCache,
+                                                 default_align_cache_path)
+
+    path = default_align_cache_path(args.cache_path)
+    if not path.exists():
+        return None
+    return AlignCache(path)
@@ -1,8 +1,13 @@
 from argparse import ArgumentParser
 from csv import DictReader
 from collections import defaultdict
-from fatoolsng.lib.utils import cerr, cexit, get_dbhandler
-from fatoolsng.lib.fautil.traceio import read_abif_stream
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import get_context
+from fatoolsng.lib.utils import cout, cerr, cexit, get_dbhandler
+
+
+# number of table rows formatted at once by --fsa2tab
+TAB_CHUNK_ROWS = 4096
 
 
 def init_argparser(parser=None):
@@ -26,6 +31,10 @@ def init_argparser(parser=None):
     p.add_argument('--species', default=False, help='species for markers')
     p.add_argument('--fsadir', default=False,
                    help='root directory for FSA files')
+    p.add_argument('--format', default='tab', choices=['tab', 'npy', 'npz'],
+                   help='--fsa2tab output: .raw.tab/.base.tab text tables, .raw.npy/.base.npy arrays or a single .npz, arrays being (samples, dyes) (default: tab)')
+    p.add_argument('--jobs', default=1, type=int,
+                   help='number of threads checking FSA files with --checkfsa, or of worker processes with --fsa2tab (default: 1)')
 # mandatory options
     p.add_argument('infiles', nargs='+')
 
@@ -55,24 +64,91 @@ def do_convert(args, dbh=None):
 
 def do_fsa2tab(args):
 
-    for infile in args.infiles:
-        with open(infile, 'rb') as instream:
-            t = read_abif_stream(instream)
-        channels = t.get_channels()
-        names = ['"' + c + '"' for c in channels]
-        print(f"Dyes: {' '.join(channels)}")
-        with open(infile + '.raw.tab', 'wt') as out:
-            out.write('\t'.join(names))
-            out.write('\n')
-            for p in zip(*[channels[c].raw for c in channels]):
-                out.write('\t'.join(str(x) for x in p))
-                out.write('\n')
-        with open(infile + '.base.tab', 'wt') as out:
-            out.write('\t'.join(names))
-            out.write('\n')
-            for p in zip(*[channels[c].smooth() for c in channels]):
-                out.write('\t'.join(str(x) for x in p))
-                out.write('\n')
+    jobs = args.jobs or 1
+    if jobs == 1:
+        results = (fsa2tab_p((infile, args.format))
+                   for infile in args.infiles)
+        report_fsa2tab(args.infiles, results)
+        return
+
+    # JAX is multithreaded, hence workers must not be forked
+    with ProcessPoolExecutor(max_workers=jobs,
+                             mp_context=get_context('spawn')) as executor:
+        results = executor.map(fsa2tab_p,
+                                [(infile, args.format)
+                                 for infile in args.infiles],
+                                chunksize=8)
+        report_fsa2tab(args.infiles, results)
+
+
+def report_fsa2tab(infiles, results):
+    for (infile, (dyes, error)) in zip(infiles, results):
+        if error:
+            cerr(f'ERR file: {infile} - {error}')
+        else:
+            cout(f"Dyes: {' '.join(dyes)}")
+
+
+def fsa2tab_p(args):
+    """ worker for do_fsa2tab(), return (dyes, error) """
+
+    infile, fmt = args
+    try:
+        return (fsa2tab(infile, fmt), None)
+    except Exception as exc:
+        return (None, f'{exc.__class__.__name__}: {exc}')
+
+
+def fsa2tab(infile, fmt='tab'):
+    """ write raw and baseline-corrected traces of infile as (samples, dyes)
+        tables and return the dye names
+    """
+
+    from numpy import array, empty, int16, save as np_save, savez as np_savez
+    from fatoolsng.lib.fautil.traceio import read_abif_stream
+    from fatoolsng.lib.fautil.normalize import smooth_channels
+
+    with open(infile, 'rb') as instream:
+        channels = list(read_abif_stream(instream).get_channels().values())
+    dyes = [c.dye_name for c in channels]
+
+    # as with zip(), tables are as long as the shortest channel
+    length = min((len(c.raw) for c in channels), default=0)
+    raw = empty((len(channels), length), dtype=int16)
+    base = empty((len(channels), length))
+    for (i, c) in enumerate(channels):
+        raw[i] = c.raw[:length]
+    if len({len(c.raw) for c in channels}) == 1:
+        base[:] = smooth_channels(raw)
+    else:
+        for (i, c) in enumerate(channels):
+            base[i] = smooth_channels(c.raw)[0, :length]
+
+    if fmt == 'npz':
+        np_savez(infile + '.npz', dyes=array(dyes), raw=raw.T, base=base.T)
+    elif fmt == 'npy':
+        np_save(infile + '.raw.npy', raw.T)
+        np_save(infile + '.base.npy', base.T)
+    else:
+        names = ['"' + d + '"' for d in dyes]
+        write_tab(infile + '.raw.tab', names, raw.T, '%d')
+        # 9 significant digits, as many as float32 traces used to be
+        # written with
+        write_tab(infile + '.base.tab', names, base.T, '%.9g')
+    return dyes
+
+
+def write_tab(path, names, table, spec):
+    """ write table as tab-separated lines of values formatted with spec """
+
+    line = '\t'.join([spec] * table.shape[1]) + '\n'
+    with open(path, 'wt') as out:
+        out.write('\t'.join(names))
+        out.write('\n')
+        for start in range(0, len(table), TAB_CHUNK_ROWS):
+            rows = table[start:start + TAB_CHUNK_ROWS]
+            # one formatting operation for the whole chunk
+            out.write((line * len(rows)) % tuple(rows.ravel().tolist()))
 
 
 def do_genemapper2tab(args, dbh):
@@ -131,10 +207,24 @@ def do_genemapper2tab(args, dbh):
                 outfile.write(f'{sample}\t{assay}\t{panel}\t{excludes}\n')
 
 
+def check_fsa(path):
+    """ return (ABIFInfo, None) for a valid FSA file, else (None, reason) """
+    from fatoolsng.lib.fautil.traceio import scan_abif_file
+    try:
+        return (scan_abif_file(path), None)
+    except Exception as exc:
+        return (None, str(exc) or type(exc).__name__)
+
+
 def do_checkfsa(args):
+    """ validate the FSA files listed in manifests and write their run
+        metadata as tab-separated lines
+    """
 
     fsadir = args.fsadir or '.'
 
+    # read all manifests first, so the files are checked in parallel
+    assays = []
     for infile in args.infiles:
         with open(infile) as csv_fh:
             data = DictReader(csv_fh, delimiter='\t')
@@ -151,11 +241,19 @@ def do_checkfsa(args):
                 if assay_file in files:
                     cerr(f'WARN file: {infile} - duplicated assay: {assay_file} for sample {sample} panel {panel}')
                 files[assay_file] = True
-                try:
-                    with open(f'{fsadir}/{assay_file}', 'rb') as instream:
-                        t = read_abif_stream(instream)
-                    line += 1
-                except:
-                    cerr(f'ERR file: {infile} line: {line}  - sample: {sample} assay: {assay_file}')
-                    # raise
-                    line += 1
+                assays.append((infile, line, sample, assay_file))
+                line += 1
+
+    cout('ASSAY\tDYES\tDYE_SET\tRUN_START\tINSTRUMENT\tMODEL\tSCANS')
+    with ThreadPoolExecutor(max_workers=args.jobs or 1) as executor:
+        results = executor.map(
+            check_fsa, [f'{fsadir}/{assay_file}'
+                        for (_, _, _, assay_file) in assays])
+        for ((infile, line, sample, assay_file), (info, reason)) \
+                in zip(assays, results):
+            if info is None:
+                cerr(f'ERR file: {infile} line: {line}  - sample: {sample} assay: {assay_file} - {reason}')
+                continue
+            cout(f"{assay_file}\t{','.join(info.dyes)}\t{info.dye_set}\t"
+                 f"{info.run_start.isoformat(' ')}\t{info.instrument}\t"
+                 f"{info.model}\t{info.scans}")
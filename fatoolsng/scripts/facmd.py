@@ -4,7 +4,7 @@ from transaction import manager as transaction_manager
 from fatoolsng.lib.utils import cout, cerr, cexit, get_dbhandler, set_verbosity
 from fatoolsng.lib import params
 from fatoolsng.lib.const import assaystatus, peaktype
-from fatoolsng.lib.fautil import algo
+from fatoolsng.lib.fautil.backend import BACKENDS, set_backend
 
 
 def init_argparser(parser=None):
@@ -112,11 +112,17 @@ def init_argparser(parser=None):
     p.add_argument('--verbose', default=0, type=int,
                    help='show verbositiy of the processing')
 
+    p.add_argument('--backend', choices=BACKENDS,
+                   help='numeric backend of trace and alignment math (default: numpy, or FATOOLSNG_BACKEND)')
+
     return p
 
 
 def main(args):
 
+    if args.backend:
+        set_backend(args.backend)
+
     if args.commit:
         with transaction_manager:
             do_facmd(args)
@@ -303,7 +309,8 @@ def do_findpeaks(args, dbh):
     if args.peakcachedb == '-':
         peakdb = None
     else:
-        peakdb = PeakCache(args.peakcachedb)
+        # commit in batches, readers still see progress
+        peakdb = PeakCache(args.peakcachedb, flush_interval=64)
 
     scanning_parameter = params.Params()
     assay_list = get_assay_list(args, dbh)
@@ -329,7 +336,8 @@ def do_findpeaks(args, dbh):
 
     do_parallel_find_peaks(channel_list, peakdb)
 
-    # peakdb.close()
+    if peakdb:
+        peakdb.close()
 
 
 def do_setallele(args, dbh):
@@ -424,8 +432,7 @@ def do_showz(args, dbh):
     assay_list = get_assay_list(args, dbh)
 
     from matplotlib import pylab as plt
-    from numpy import poly1d
-    from jax.numpy import linspace
+    from numpy import poly1d, linspace
 
     for (assay, sample_code) in assay_list:
         ladder_peaks = list(assay.ladder.alleles)
@@ -511,7 +518,6 @@ def printout_assay(assay, outfile=stdout, fmt='text'):
 def do_parallel_find_peaks(channel_list, peakdb):
 
     import concurrent.futures
-    from pickle import dumps as pickle_dumps
 
     cerr('I: Processing channel(s)')
     total = len(channel_list)
@@ -519,7 +525,7 @@ def do_parallel_find_peaks(channel_list, peakdb):
     with concurrent.futures.ProcessPoolExecutor() as executor:
         for (tag, peaks) in executor.map(find_peaks_p, channel_list):
             if peakdb:
-                peakdb.put(tag.encode(), pickle_dumps(peaks))
+                peakdb.put_peaks(tag.encode(), peaks)
             else:
                 cout(f'== channel {tag}\n')
                 cout(str(peaks))
@@ -528,6 +534,7 @@ def do_parallel_find_peaks(channel_list, peakdb):
 
 
 def find_peaks_p(args):
+    from fatoolsng.lib.fautil import algo
     tag, data, param = args
 
     return (tag, algo.find_raw_peaks(data, param))
@@ -0,0 +1,67 @@
+from argparse import ArgumentParser
+from pathlib import Path
+from fatoolsng.lib.utils import cout, cerr, cexit
+
+
+def init_argparser(parser=None):
+
+    if parser is None:
+        p = ArgumentParser('pack')
+    else:
+        p = parser
+
+# commands
+    p.add_argument('--list', default=False, action='store_true',
+                   help='list the assays of trace archive(s)')
+# options
+    p.add_argument('-o', '--outfile',
+                   help='trace archive to write the traces of the FSA files to')
+    p.add_argument('--fsadir', default=False,
+                   help='root directory of FSA files, assays are named relative to it')
+# mandatory options
+    p.add_argument('infiles', nargs='+',
+                   help='FSA files to pack, or trace archives with --list')
+
+    return p
+
+
+def main(args):
+    do_pack(args)
+
+
+def do_pack(args):
+
+    if args.list:
+        do_list(args)
+        return True
+
+    from fatoolsng.lib.fautil.tracearchive import pack_archive
+
+    if not args.outfile:
+        cexit('ERR: packing FSA files requires --outfile argument!')
+
+    fsadir = Path(args.fsadir) if args.fsadir else None
+    files = [(infile, fsadir / infile if fsadir else Path(infile))
+             for infile in args.infiles]
+
+    try:
+        count = pack_archive(args.outfile, files)
+    except (OSError, RuntimeError, ValueError) as exc:
+        cexit(f'ERR: cannot pack FSA files: {exc}')
+    cerr(f'I: packed {count} FSA into {args.outfile}')
+    return True
+
+
+def do_list(args):
+
+    from fatoolsng.lib.fautil.tracearchive import TraceArchive
+
+    cout('ARCHIVE\tASSAY\tRUN_START\tDYES\tSCANS')
+    for infile in args.infiles:
+        archive = TraceArchive(infile)
+        for name in archive.names:
+            info = archive.info(name)
+            channels = info['channels']
+            dyes = ','.join(c['dye'] for c in channels)
+            scans = max((c['length'] for c in channels), default=0)
+            cout(f"{infile}\t{name}\t{info['run_start']}\t{dyes}\t{scans}")
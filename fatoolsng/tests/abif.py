@@ -0,0 +1,82 @@
+"""Minimal ABIF writer used to build synthetic FSA files for tests."""
+
+from struct import pack
+
+from numpy import asarray
+
+
+def _tag(name, number, elem_type, elem_size, count, data):
+    return (name.encode(), number, elem_type, elem_size, count, data)
+
+
+def data_tag(number, trace):
+    trace = asarray(trace, dtype='>i2')
+    return _tag('DATA', number, 4, 2, len(trace), trace.tobytes())
+
+
+def pstring_tag(name, number, text):
+    raw = text.encode()
+    return _tag(name, number, 18, 1, len(raw) + 1, bytes([len(raw)]) + raw)
+
+
+def cstring_tag(name, number, text):
+    raw = text.encode() + b'\x00'
+    return _tag(name, number, 19, 1, len(raw), raw)
+
+
+def short_tag(name, number, value):
+    return _tag(name, number, 4, 2, 1, pack('>h', value))
+
+
+def long_tag(name, number, value):
+    return _tag(name, number, 5, 4, 1, pack('>i', value))
+
+
+def date_tag(name, number, year, month, day):
+    return _tag(name, number, 10, 4, 1, pack('>hBB', year, month, day))
+
+
+def time_tag(name, number, hour, minute, second):
+    return _tag(name, number, 11, 4, 1, pack('>BBBB', hour, minute, second, 0))
+
+
+def build_abif(tags):
+    """ return ABIF file content holding tags """
+
+    header_size = 128
+    body = b''
+    entries = []
+    for (name, number, elem_type, elem_size, count, data) in tags:
+        if len(data) <= 4:
+            offset = int.from_bytes(data.ljust(4, b'\x00'), 'big')
+        else:
+            offset = header_size + len(body)
+            body += data
+        entries.append(pack('>4sihhiiii', name, number, elem_type, elem_size,
+                            count, len(data), offset, 0))
+    directory = b''.join(entries)
+    dir_offset = header_size + len(body)
+    header = b'ABIF' + pack('>h', 101) + pack(
+        '>4sihhiiii', b'tdir', 1, 1023, 28, len(entries), len(directory),
+        dir_offset, 0)
+    header = header.ljust(header_size, b'\x00')
+    return header + body + directory
+
+
+def build_fsa(traces, wavelengths=None, run_date=(2024, 1, 31),
+              run_time=(13, 45, 10), extra_tags=()):
+    """ return FSA content for traces, a dict of {dye_name: trace}
+
+        the 5th dye is stored as DATA105, as ABI instruments do
+    """
+
+    tags = []
+    for idx, (dye, trace) in enumerate(traces.items(), 1):
+        tags.append(data_tag(idx if idx < 5 else 105, trace))
+        tags.append(pstring_tag('DyeN', idx, dye))
+        if wavelengths:
+            tags.append(short_tag('DyeW', idx, wavelengths[dye]))
+    tags.append(date_tag('RUND', 1, *run_date))
+    tags.append(time_tag('RUNT', 1, *run_time))
+    tags.extend(extra_tags)
+    return build_abif(tags)
@@ -0,0 +1,62 @@
+"""Synthetic ladder peaks and FSA with a scanned LIZ500 ladder channel, for
+tests and benchmarks of ladder alignment."""
+
+from numpy import zeros
+
+from fatoolsng.lib import const, params
+from fatoolsng.lib.fautil.algo import Peak
+from fatoolsng.lib.fileio.models import FSA, Allele, Marker, Panel
+
+
+LIZ500_SIZES = [35, 50, 75, 100, 139, 150, 160, 200,
+                250, 300, 340, 350, 400, 450, 490, 500]
+
+
+def upload_panels():
+    """ upload the default markers and panels, GS500LIZ among them """
+    Marker.upload(params.default_markers)
+    Panel.upload(params.default_panels)
+
+
+def make_ladder_fsa(filename, rtimes, rfus=None, align_cache=None):
+    """ return a normalized GS500LIZ FSA whose LIZ channel holds scanned
+        peaks at rtimes, of heights rfus (in the order of sorted rtimes)
+    """
+    fsa = FSA()
+    fsa.filename = filename
+    fsa.set_panel(Panel.get_panel('GS500LIZ'))
+    fsa._align_cache = align_cache
+    c = fsa.add_channel(FSA.Channel(data=zeros(6000), dye='LIZ', wavelen=655,
+                                    status=const.channelstatus.scanned,
+                                    fsa=fsa))
+    for i, rtime in enumerate(sorted(int(rtime) for rtime in rtimes)):
+        rfu = 1000 + (i % 5) * 200 if rfus is None else int(rfus[i])
+        allele = Allele(rtime, rfu, rfu * 5, rtime - 5, rtime + 5, 10, 0.0,
+                        8.0, 100.0, rtime)
+        allele.type = const.peaktype.scanned
+        c.add_allele(allele)
+    fsa.status = const.assaystatus.normalized
+    return fsa
+
+
+def make_ladder_peaks(rng, sizes, spurious=0, max_missing=0):
+    """ return (peaks, curve) of a synthetic ladder channel of sizes whose
+        random sizing curve gives the rtime of a size, rtime = curve(size),
+        with up to max_missing ladder peaks left out and spurious peaks
+        added, drawing from the numpy Generator rng
+    """
+    a, b, c = rng.uniform(8, 13), rng.uniform(100, 900), rng.uniform(-4e-3,
+                                                                       4e-3)
+    rtimes = [int(s * a + b + c * s**2 + rng.normal(0, 2)) for s in sizes]
+    if max_missing:
+        n_missing = rng.integers(0, max_missing + 1)
+        missing = set(rng.choice(len(rtimes), n_missing, replace=False))
+        rtimes = [r for (i, r) in enumerate(rtimes) if i not in missing]
+    rtimes += list(rng.integers(min(rtimes), max(rtimes), spurious))
+    peaks = []
+    for rtime in sorted(set(int(r) for r in rtimes)):
+        rfu = int(rng.uniform(500, 3000))
+        peaks.append(Peak(rtime=rtime, rfu=rfu, area=rfu * 5,
+                          brtime=rtime - 5, ertime=rtime + 5, srtime=0.0,
+                          beta=8.0, theta=100.0, omega=rtime))
+    return peaks, lambda s: a * s + b + c * s**2
@@ -1,5 +1,8 @@
 import pytest
-from fatoolsng.lib.fautil.algo import Peak, Channel
+from numpy import arange, exp, errstate, isclose, percentile, round as np_round
+from numpy.random import default_rng
+from fatoolsng.lib.fautil.algo import (Peak, Channel, calculate_area,
+                                       calculate_areas)
 
 
 class TestPeak:
@@ -71,3 +74,43 @@ class TestChannel:
     def test_fsa_settable(self):
         ch = Channel(data=[], marker=None, fsa='mock_fsa')
         assert ch.fsa == 'mock_fsa'
+
+
+def _noisy_trace(seed, length=5000, n_peaks=80):
+    rng = default_rng(seed)
+    x = arange(length)
+    y = abs(rng.normal(0, 3, length))
+    for c in rng.integers(0, length, n_peaks):
+        y += rng.uniform(10, 2000) * exp(-0.5 * ((x - c) / rng.uniform(1, 8))**2)
+    return y
+
+
+class TestCalculateAreas:
+
+    @pytest.mark.parametrize('seed', range(6))
+    @pytest.mark.parametrize('integer', [False, True])
+    def test_matches_calculate_area(self, seed, integer):
+        y = _noisy_trace(seed)
+        if integer:
+            y = np_round(y).astype(int)
+        rng = default_rng(seed)
+        rtimes = rng.choice(len(y), 200, replace=False)
+        rtimes[:2] = [0, len(y) - 1]
+        baseline = percentile(y, 50)
+
+        areas = calculate_areas(y, rtimes, 5e-2, baseline)
+        for (i, t) in enumerate(rtimes.tolist()):
+            try:
+                with errstate(all='ignore'):
+                    expected = calculate_area(y, t, 5e-2, baseline)
+            except (ZeroDivisionError, ValueError):
+                # srtime of an empty or negative half area
+                continue
+            result = [a[i] for a in areas]
+            assert result[:3] == list(expected[:3])
+            assert result[4:] == list(expected[4:])
+            assert isclose(result[3], expected[3], rtol=1e-14, equal_nan=True)
+
+    def test_no_peaks(self):
+        areas = calculate_areas(_noisy_trace(0), [], 5e-2, 0)
+        assert all(len(a) == 0 for a in areas)
@@ -0,0 +1,144 @@
+import pytest
+from numpy import allclose
+
+from fatoolsng.lib import params, const
+from fatoolsng.lib.fautil import algo, cmds
+from fatoolsng.lib.fautil.aligncache import (AlignCache,
+                                             default_align_cache_path)
+from fatoolsng.lib.fautil.portfolio import parse_portfolio
+from fatoolsng.scripts import cache as cache_script
+from fatoolsng.tests.ladder import (LIZ500_SIZES, make_ladder_fsa,
+                                    upload_panels)
+
+
+@pytest.fixture(scope='module', autouse=True)
+def panels():
+    upload_panels()
+
+
+def _make_fsa(filename, align_cache=None, shift=0):
+    rtimes = [int(size * 10 + 200) + shift for size in LIZ500_SIZES]
+    return make_ladder_fsa(filename, rtimes, align_cache=align_cache)
+
+
+def _alignment(fsa):
+    return ([(a.rtime, a.size, a.type, a.dev, getattr(a, 'qscore', None))
+             for a in fsa.get_ladder_channel().alleles],
+            fsa.score, fsa.rss, fsa.nladder, list(fsa.z),
+            list(fsa.ztranspose))
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError('alignment should have been cached')
+
+
+class TestAlignCache:
+
+    def test_key(self):
+        ladder = dict(const.ladders['LIZ500'])
+        alleles = _make_fsa('a.fsa').get_ladder_channel().alleles
+        key = AlignCache.key(alleles, ladder)
+
+        # sizes are set by alignment, qcfunc and T are derived from ladder
+        alleles[0].size = 35.0
+        ladder.update(qcfunc=object(), T=object())
+        assert AlignCache.key(alleles, ladder) == key
+
+        shifted = _make_fsa('b.fsa', shift=1).get_ladder_channel().alleles
+        assert AlignCache.key(shifted, ladder) != key
+        assert AlignCache.key(alleles, const.ladders['LIZ600']) != key
+        assert AlignCache.key(alleles, ladder, [(550, 35)]) != key
+        assert AlignCache.key(alleles, ladder, None, [0.1, -20.0]) != key
+        racing = AlignCache.key(alleles, ladder, portfolio=[('hc', None),
+                                                            ('pm', 60.0)])
+        assert racing != key
+        assert AlignCache.key(alleles, ladder,
+                              portfolio=[('hc', None), ('pm', 30.0)]) != racing
+
+    def test_missing_key(self, tmp_path):
+        assert AlignCache(tmp_path / 'a.sqlite').get('0' * 64) is None
+
+    def test_cached_alignment_is_reused(self, tmp_path, monkeypatch):
+        cache = AlignCache(tmp_path / 'a.sqlite')
+        expected = _make_fsa('a.fsa')
+        expected.align(params.Params())
+
+        first = _make_fsa('a.fsa', cache)
+        first.align(params.Params())
+        assert len(cache) == 1
+        assert _alignment(first) == _alignment(expected)
+
+        monkeypatch.setattr(algo, 'align_peaks', _fail)
+        cached = _make_fsa('a.fsa', AlignCache(tmp_path / 'a.sqlite'))
+        cached.align(params.Params())
+        assert cached.status == const.assaystatus.aligned
+        assert cached.get_ladder_channel().alleles[0].size == 35
+        got, exp = _alignment(cached), _alignment(expected)
+        assert got[0] == exp[0] and got[1:4] == exp[1:4]
+        assert allclose(got[4], exp[4]) and allclose(got[5], exp[5])
+
+    def test_warm_and_cold_alignments_are_kept_apart(self, tmp_path,
+                                                     monkeypatch):
+        cache = AlignCache(tmp_path / 'a.sqlite')
+        cold = _make_fsa('a.fsa', cache)
+        cold.align(params.Params())
+
+        # the cold result is not served to a warm start, nor the reverse
+        calls = []
+        align_peaks = algo.align_peaks
+
+        def _align_peaks(*args):
+            calls.append(args[-1])
+            return align_peaks(*args)
+
+        monkeypatch.setattr(algo, 'align_peaks', _align_peaks)
+        _make_fsa('a.fsa', cache).align(params.Params(), initial_z=cold.z)
+        assert len(calls) == 1 and calls[0] is cold.z
+        assert len(cache) == 2
+
+        _make_fsa('a.fsa', cache).align(params.Params())
+        _make_fsa('a.fsa', cache).align(params.Params(), initial_z=cold.z)
+        assert len(calls) == 1
+        assert len(cache) == 2
+
+    def test_raced_and_sequential_alignments_are_kept_apart(self, tmp_path):
+        cache = AlignCache(tmp_path / 'a.sqlite')
+        _make_fsa('a.fsa', cache).align(params.Params())
+
+        racing = params.Params()
+        racing.alignment = params.AlignmentParameter()
+        racing.alignment.portfolio = parse_portfolio('hc,pm')
+        racing.alignment.workers = 1
+        _make_fsa('a.fsa', cache).align(racing)
+        assert len(cache) == 2
+
+    def test_parallel_align_uses_cache(self, tmp_path):
+        cache = AlignCache(tmp_path / 'a.sqlite')
+        serial = _make_fsa('a.fsa', cache)
+        serial.align(params.Params())
+
+        # cached alignments are not sent to workers
+        fsas = [(_make_fsa('a.fsa', cache), '1'),
+                (_make_fsa('b.fsa', cache, shift=7), '2')]
+        cmds.do_parallel_align(fsas, params.Params(), 2)
+        assert [fsa.status for (fsa, _) in fsas] == \
+            [const.assaystatus.aligned] * 2
+        assert len(cache) == 2
+        assert allclose(fsas[0][0].z, serial.z)
+        assert fsas[0][0].score == serial.score
+
+
+def test_cache_script_clears_alignments(tmp_path, monkeypatch):
+    output = []
+    monkeypatch.setattr(cache_script, 'cout', output.append)
+    cache = AlignCache(default_align_cache_path(tmp_path))
+    _make_fsa('a.fsa', cache).align(params.Params())
+
+    parser = cache_script.init_argparser()
+    cache_script.main(parser.parse_args(['--stats',
+                                         '--cache-path', str(tmp_path)]))
+    assert output[-1] == '\tentries\t1'
+
+    cache_script.main(parser.parse_args(['--prune', '--max-size', '0',
+                                         '--cache-path', str(tmp_path)]))
+    assert len(cache) == 0
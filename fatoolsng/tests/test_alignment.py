@@ -1,7 +1,12 @@
-"""Tests for the three advanced ladder alignment strategies:
+"""Tests for the advanced ladder alignment strategies:
 align_gm  — Nelder-Mead generalised minimisation        (deterministic, fast)
 align_de  — differential evolution                       (stochastic,   slow)
 align_sh  — semi-heuristic: DE on subset + GM refinement (stochastic,   slow)
+align_ws  — warm start from the z of a sibling capillary (deterministic, fast)
+
+the geometric-hashing anchor search and the incremental refit of align_pm
+(estimate_pm, minimize_score) and the population-vectorized objective of
+align_de (ZFunc.scores).
 
 DE and SH tests are marked ``slow`` and skipped by default.
 Run them explicitly with:  pytest -m slow
@@ -9,9 +14,17 @@ Run them explicitly with:  pytest -m slow
 
 import copy
 import pytest
-
-from fatoolsng.lib.fautil.algo import Peak, generate_scoring_function
-from fatoolsng.lib.fautil.gmalign import align_gm, align_sh, align_de
+from numpy import array
+from numpy.random import default_rng
+
+from fatoolsng.lib.fautil import algo
+from fatoolsng.lib.fautil.algo import Peak, align_ladder, generate_scoring_function
+from fatoolsng.lib.fautil.gmalign import ZFunc, align_gm, align_sh, align_de
+from fatoolsng.lib.fautil.pmalign import (estimate_pm, vote_anchor_lines,
+                                          minimize_score, align_lower_pm,
+                                          _estimate_pm_sweep,
+                                          _minimize_score_refit)
+from fatoolsng.lib.fautil.wsalign import align_ws
 from fatoolsng.lib.fautil.alignutils import AlignResult
 from fatoolsng.lib.const import ladders, alignmethod
 
@@ -201,3 +214,165 @@ class TestAlignSh:
     @pytest.mark.slow
     def test_sized_peaks_non_empty(self, liz500):
         assert len(align_sh(*liz500).dpresult.sized_peaks) > 0
+
+
+# ---------------------------------------------------------------------------
+# align_ws — warm start from the z of a sibling capillary (deterministic)
+# ---------------------------------------------------------------------------
+
+def _sibling_peaks(shift, spurious=()):
+    """LIZ500 peaks of a capillary whose sizing curve is shifted by shift
+    scans, with spurious peaks at the given rtimes."""
+    peaks = _make_peaks(_LIZ500_SIZES, scale=10.5, offset=150 + shift)
+    for rtime in spurious:
+        peaks.append(Peak(rtime=rtime, rfu=900, area=4500, brtime=rtime - 5,
+                          ertime=rtime + 5, srtime=0.0, beta=8.0, theta=100.0,
+                          omega=rtime))
+    return sorted(peaks, key=lambda p: p.rtime)
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError('warm start should have been accepted')
+
+
+class TestAlignWs:
+
+    def test_sibling_z_aligns_shifted_capillary(self, liz500):
+        _, ladder = liz500
+        z = align_ladder(_sibling_peaks(0), ladder, None).dpresult.z
+
+        result = align_ws(_sibling_peaks(25), ladder, z)
+        assert result.method == alignmethod.ws_strict
+        assert [(s, p.rtime) for (s, p) in result.dpresult.sized_peaks] == \
+            [(s, int(s * 10.5 + 175)) for s in _LIZ500_SIZES]
+
+    def test_stochastic_fallbacks_are_skipped(self, liz500, monkeypatch):
+        _, ladder = liz500
+        z = align_ladder(_sibling_peaks(0), ladder, None).dpresult.z
+        for name in ('align_gm', 'align_pm', 'align_sh', 'align_de'):
+            monkeypatch.setattr(algo, name, _fail)
+
+        # too many peaks for align_hc
+        spurious = [700, 1333, 1900, 2450, 3100, 3650, 4300, 5000]
+        result = align_ladder(_sibling_peaks(-30, spurious), ladder, None, z)
+        assert result.method == alignmethod.ws_strict
+        assert len(result.dpresult.sized_peaks) == len(_LIZ500_SIZES)
+
+    def test_relax_warm_start_falls_back_after_gm(self, liz500, monkeypatch):
+        peaks, ladder = liz500
+        warm = AlignResult(0.8, None, None, alignmethod.ws_relax)
+        hc = AlignResult(0.5, None, None, alignmethod.hcm_relax,
+                         initial_pairs=[(35, 550)])
+        gm = AlignResult(0.95, None, None, alignmethod.gm_strict)
+        monkeypatch.setattr(algo, 'align_hc', lambda *args: hc)
+        monkeypatch.setattr(algo, 'align_ws', lambda *args: warm)
+        monkeypatch.setattr(algo, 'align_gm', lambda *args: gm)
+        for name in ('align_pm', 'align_sh', 'align_de'):
+            monkeypatch.setattr(algo, name, _fail)
+
+        # the refined align_hc() result of a cold alignment is kept
+        assert align_ladder(peaks, ladder, None, [0.1, -15]) is gm
+
+        gm.score = 0.5
+        assert align_ladder(peaks, ladder, None, [0.1, -15]) is warm
+
+
+# ---------------------------------------------------------------------------
+# estimate_pm — geometric hashing of the ladder signature (deterministic)
+# ---------------------------------------------------------------------------
+
+class TestEstimatePm:
+
+    def _expected(self, signature):
+        return [(int(s * 10.5 + 150), s) for s in signature]
+
+    def test_finds_signature_among_spurious_peaks(self, liz500):
+        _, ladder = liz500
+        signature = ladder['signature']
+        peaks = _sibling_peaks(0, [1020, 1333, 1900, 2450, 2800])
+        pairs, z = estimate_pm(peaks, signature)
+        assert sorted(pairs) == self._expected(signature)
+        assert len(z) == 4
+
+    def test_matches_sweep_on_clean_peaks(self, liz500):
+        _, ladder = liz500
+        peaks = _sibling_peaks(0)
+        pairs, z = estimate_pm(peaks, ladder['signature'])
+        sweep_pairs, sweep_z = _estimate_pm_sweep(peaks, ladder['signature'])
+        assert sorted(pairs) == sorted(sweep_pairs) == \
+            self._expected(ladder['signature'])
+        assert z == pytest.approx(sweep_z)
+
+    def test_too_few_peaks_have_no_vote(self):
+        assert vote_anchor_lines(array([1000.0, 2000.0]),
+                                 array([75.0, 100.0, 139.0])) == []
+
+
+# ---------------------------------------------------------------------------
+# minimize_score — incremental refit of the align_pm curve (deterministic)
+# ---------------------------------------------------------------------------
+
+class TestMinimizeScore:
+
+    def _zfunc(self, liz500):
+        _, ladder = liz500
+        peaks = _sibling_peaks(0, [1020, 1333, 1900, 2450, 2800])
+        return ZFunc(peaks, ladder['sizes'][:10], [])
+
+    def test_evaluate_matches_call_and_get_pairs(self, liz500):
+        f = self._zfunc(liz500)
+        z = [0.0, 0.0, 1 / 10.4, -150 / 10.4]
+        score, pairs = f.evaluate(z)
+        assert score == f(z)
+        assert [(rtime, size) for (rtime, size, _, _) in pairs] == \
+            f.get_pairs(z)[0]
+
+    @pytest.mark.parametrize('order', [1, 2, 3])
+    def test_matches_refit_reference(self, liz500, order):
+        f = self._zfunc(liz500)
+        initial_z = [0.0] * (order - 1) + [1 / 10.4, -150 / 10.4]
+        score, z = minimize_score(f, initial_z, order)
+        ref_score, ref_z = _minimize_score_refit(f, initial_z, order)
+        assert score == pytest.approx(ref_score, rel=1e-6)
+        assert f.get_pairs(z)[0] == f.get_pairs(ref_z)[0]
+
+    def test_lower_pm_without_lower_sizes_keeps_anchor_pairs(self, liz500):
+        _, ladder = liz500
+        anchor_pairs = [(int(s * 10.5 + 150), s) for s in ladder['sizes'][:5]]
+        pairs, z, rss, f = align_lower_pm(_sibling_peaks(0), ladder,
+                                          anchor_pairs, None)
+        assert pairs == anchor_pairs
+
+
+# ---------------------------------------------------------------------------
+# ZFunc.scores — population-vectorized objective of align_de (deterministic)
+# ---------------------------------------------------------------------------
+
+class TestZFuncScores:
+
+    def _population(self, n=50):
+        rng = default_rng(0)
+        return array([rng.uniform(-1e-10, 1e-10, n),
+                      rng.uniform(-1e-5, 1e-5, n),
+                      rng.uniform(0.08, 0.11, n),
+                      rng.uniform(-30, 0, n)])
+
+    @pytest.mark.parametrize('anchors,estimate', [(False, False),
+                                                  (True, False),
+                                                  (False, True)])
+    def test_matches_scalar_zfunc(self, liz500, anchors, estimate):
+        _, ladder = liz500
+        peaks = _sibling_peaks(0, [1020, 1333, 1900, 2450, 2800])
+        anchor_pairs = ([(int(s * 10.5 + 150), s) for s in (100, 250)]
+                        if anchors else [])
+        f = ZFunc(peaks, ladder['sizes'], anchor_pairs, estimate)
+        zs = self._population()
+        # scalar ** 2 may round differently from the array square
+        assert f.scores(zs) == pytest.approx([f(z) for z in zs.T],
+                                             rel=1e-12)
+
+    def test_single_curve(self, liz500):
+        _, ladder = liz500
+        f = ZFunc(_sibling_peaks(0), ladder['sizes'], [])
+        z = [0.0, 0.0, 1 / 10.5, -150 / 10.5]
+        assert f.scores(z) == pytest.approx([f(z)], rel=1e-12)
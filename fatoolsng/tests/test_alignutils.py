@@ -1,6 +1,9 @@
 import pytest
+from math import exp
+from numpy import poly1d, allclose, count_nonzero
 from fatoolsng.lib.fautil.alignutils import (
-    AlignResult, DPResult, ZResult, PeakPairs, estimate_z,
+    AlignResult, DPResult, ZResult, PeakPairs, PolyFit, estimate_z,
+    generate_scores, pair_f,
 )
 
 
@@ -92,3 +95,102 @@ class TestEstimateZ:
         for degree in (1, 2, 3):
             result = estimate_z(x, y, degree=degree)
             assert len(result.z) == degree + 1
+
+
+class TestPolyFit:
+
+    rtimes = [700, 1220, 1700, 2190, 2710, 3200, 3690, 4210, 4700, 5200]
+    sizes = [50.3, 99.1, 151.0, 199.2, 250.8, 300.4, 349.0, 401.1, 449.7,
+             500.2]
+
+    def _fit(self, degree, pairs):
+        fit = PolyFit(degree, 700, 5200)
+        fit.update(pairs)
+        return fit
+
+    @pytest.mark.parametrize('degree', [1, 2, 3])
+    def test_matches_estimate_z(self, degree):
+        fit = self._fit(degree, list(zip(self.rtimes, self.sizes)))
+        expected = estimate_z(self.rtimes, self.sizes, degree)
+        assert allclose(poly1d(fit.z)(self.rtimes), expected.f(self.rtimes),
+                        rtol=1e-9)
+        assert fit.rss == pytest.approx(float(expected.rss), rel=1e-6)
+
+    def test_update_adds_and_drops_pairs(self):
+        pairs = list(zip(self.rtimes, self.sizes))
+        fit = self._fit(3, pairs[:7])
+        fit.update(pairs[2:])
+        assert len(fit) == 8
+        expected = estimate_z(self.rtimes[2:], self.sizes[2:], 3)
+        assert allclose(poly1d(fit.z)(self.rtimes), expected.f(self.rtimes),
+                        rtol=1e-9)
+
+    @pytest.mark.filterwarnings('ignore:Polyfit may be poorly conditioned')
+    def test_too_few_pairs_fall_back_on_estimate_z(self):
+        pairs = list(zip(self.rtimes, self.sizes))[:2]
+        fit = self._fit(3, pairs)
+        assert len(fit.z) == 4
+        assert allclose(poly1d(fit.z)(self.rtimes[:2]), self.sizes[:2],
+                        atol=1e-3)
+
+
+class TestPairF:
+
+    rtimes = [700, 1220, 1700, 2190, 2710, 3200, 3690, 4210, 4700, 5200]
+    sizes = [50, 100, 150, 200, 250, 300, 350, 400, 450, 500]
+
+    def test_deviation_uses_curve_of_each_rtime(self):
+        f = poly1d([0.1, -20])
+        pairs = pair_f(f, self.rtimes, self.sizes, [1.0] * 10,
+                       deviation=True)
+        assert len(pairs) == 10
+        for (rtime, size, rtime_size, err) in pairs:
+            assert rtime_size == f(rtime)
+            assert err == (size - f(rtime)) ** 2
+
+    def test_pairs_without_deviation(self):
+        pairs = pair_f(poly1d([0.1, -20]), self.rtimes, self.sizes,
+                       [1.0] * 10)
+        assert sorted(pairs) == list(zip(self.rtimes, self.sizes))
+
+
+class TestGenerateScores:
+
+    sizes = [500, 450, 400, 350, 300, 250, 200, 150, 100, 50]
+    rtimes = [5200, 4700, 4210, 3690, 3200, 2710, 2190, 1700, 1220, 700]
+    similarity = [1.0, 0.9, 0.95, 1.0, 0.8, 1.0, 0.7, 1.0, 0.99, 0.6]
+    func = poly1d([0.1, -20])
+
+    def _reference(self, tolerance=4):
+        return [[self.similarity[c] *
+                 exp(-((self.func(rtime) - size)/tolerance)**2 / 2)
+                 for c, rtime in enumerate(self.rtimes)]
+                for size in self.sizes]
+
+    def test_matches_cellwise_scores(self):
+        M = generate_scores(self.sizes, self.rtimes, self.similarity,
+                            self.func)
+        assert M.shape == (len(self.sizes), len(self.rtimes))
+        assert allclose(M, self._reference(), rtol=1e-12, atol=0)
+
+    def test_custom_tolerance(self):
+        M = generate_scores(self.sizes, self.rtimes, self.similarity,
+                            self.func, tolerance=2)
+        assert allclose(M, self._reference(tolerance=2), rtol=1e-12, atol=0)
+
+    def test_banded_zeroes_cells_outside_cutoff(self):
+        dense = generate_scores(self.sizes, self.rtimes, self.similarity,
+                                self.func)
+        banded = generate_scores(self.sizes, self.rtimes, self.similarity,
+                                 self.func, banded=True)
+        # only the cells near the diagonal are within the cutoff
+        assert count_nonzero(banded) < count_nonzero(dense)
+        in_band = banded != 0
+        assert allclose(banded[in_band], dense[in_band], rtol=1e-12, atol=0)
+        assert (dense[~in_band] < 0.05).all()
+
+    def test_banded_keeps_diagonal(self):
+        banded = generate_scores(self.sizes, self.rtimes, self.similarity,
+                                 self.func, banded=True)
+        for i in range(len(self.sizes)):
+            assert banded[i][i] > 0
@@ -0,0 +1,88 @@
+import pytest
+from os import environ
+from numpy import allclose, arange, array, exp, ndarray
+from numpy.random import default_rng
+
+from fatoolsng.lib.fautil import backend
+from fatoolsng.lib.fautil.algo import Peak, local_southern
+from fatoolsng.lib.fautil.alignutils import estimate_z
+from fatoolsng.lib.fautil.binsutil import BinContainer
+from fatoolsng.lib.fautil.cwt import cwt, cwt_find_peaks
+from fatoolsng.lib.fautil.traceutils import savitzky_golay, smooth
+
+
+def _traces(n_channels=5, length=4000, seed=0):
+    rng = default_rng(seed)
+    x = arange(length)
+    traces = abs(rng.normal(0, 3, (n_channels, length)))
+    for trace in traces:
+        for c in rng.integers(0, length, 20):
+            trace += rng.uniform(100, 3000) * exp(-0.5 * ((x - c) / 4)**2)
+    return traces
+
+
+def _ladder_peaks():
+    sizes = [35, 50, 75, 100, 139, 150, 160, 200, 250, 300, 340, 350, 400]
+    peaks = []
+    for (i, size) in enumerate(sizes):
+        p = Peak(rtime=int(1000 + 11.3 * size + 0.004 * size**2), rfu=1000)
+        p.size = size
+        p.qscore = 1.0
+        peaks.append(p)
+    return peaks
+
+
+# each stage returns NumPy arrays or floats for the same inputs whatever the
+# backend
+STAGES = {
+    'cwt': lambda: cwt(_traces(), arange(2, 8)),
+    'cwt_find_peaks': lambda: cwt_find_peaks(_traces()[0], arange(5, 15),
+                                             1.25),
+    'estimate_z': lambda: estimate_z([1200, 2300, 3100, 4500, 5200],
+                                     [50, 150, 250, 400, 490], 3).z,
+    'local_southern': lambda: array([local_southern(_ladder_peaks())(rtime)[:3]
+                                     for rtime in range(2000, 5000, 250)]),
+    'savitzky_golay': lambda: savitzky_golay(_traces()[0], 11, 7),
+    'smooth': lambda: smooth(_traces()[0]),
+    'bin_percentile': lambda: BinContainer(values=list(_traces()[0][:99]))
+                              .percentile([10, 50, 90]),
+}
+
+
+class TestSelection:
+
+    def test_default_is_numpy(self):
+        assert backend.get_backend().name == 'numpy'
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            backend.set_backend('cupy')
+
+    def test_use_backend_restores_and_propagates(self):
+        with backend.use_backend('numpy') as B:
+            assert B is backend.get_backend()
+            assert environ[backend.ENV_BACKEND] == 'numpy'
+        assert backend.get_backend().name == 'numpy'
+
+
+@pytest.mark.parametrize('stage', STAGES)
+def test_jax_matches_numpy(stage):
+    pytest.importorskip('jax')
+    with backend.use_backend('numpy'):
+        expected = STAGES[stage]()
+    with backend.use_backend('jax'):
+        result = STAGES[stage]()
+    assert isinstance(result, ndarray)
+    assert result.shape == expected.shape
+    assert allclose(result, expected, rtol=1e-7, atol=1e-7)
+
+
+def test_jax_results_are_writable_numpy_arrays():
+    pytest.importorskip('jax')
+    with backend.use_backend('jax') as B:
+        # ABIF traces are big-endian
+        z = B.polyfit(array([1, 2, 3, 4], dtype='>i2'), [2.0, 4.1, 5.9, 8.0],
+                      1)
+        z[0] = 0.0
+        out = cwt(array([0, 5, 100, 5, 0] * 20, dtype='>i2'), [1, 2])
+        out += 1
@@ -0,0 +1,153 @@
+import pytest
+from os import utime
+from numpy import arange, array_equal, memmap
+from numpy.random import default_rng
+
+from fatoolsng.lib import const, params
+from fatoolsng.lib.fautil.algo import NORMALIZATION_PARAMS
+from fatoolsng.lib.fautil.channelcache import (ChannelCache, parse_size,
+                                               default_cache_path)
+from fatoolsng.lib.fileio.models import FSA, Panel, Marker
+from fatoolsng.scripts import cache as cache_script
+from fatoolsng.tests.abif import build_fsa
+
+
+def _channels(n=5, length=1000):
+    return [(f'dye{i}', 500 + i, arange(length, dtype=float) * i)
+            for i in range(n)]
+
+
+def _put(cache, name, when=None, length=1000):
+    key = ChannelCache.key(name.encode(), NORMALIZATION_PARAMS)
+    cache.put(key, _channels(length=length))
+    if when is not None:
+        meta_file = cache._entry(key) / 'channels.json'
+        utime(meta_file, (when, when))
+    return key
+
+
+class TestChannelCache:
+
+    def test_roundtrip_is_memory_mapped(self, tmp_path):
+        cache = ChannelCache(tmp_path)
+        key = _put(cache, 'a')
+        channels = cache.get(key)
+        assert [(d, w) for (d, w, _) in channels] == \
+            [(d, w) for (d, w, _) in _channels()]
+        for ((_, _, data), (_, _, expected)) in zip(channels, _channels()):
+            assert isinstance(data, memmap)
+            assert array_equal(data, expected)
+
+    def test_missing_key(self, tmp_path):
+        assert ChannelCache(tmp_path).get('00' * 32) is None
+
+    def test_key_depends_on_content_and_params(self):
+        key = ChannelCache.key(b'abc', NORMALIZATION_PARAMS)
+        assert key == ChannelCache.key(b'abc', dict(NORMALIZATION_PARAMS))
+        assert key != ChannelCache.key(b'abd', NORMALIZATION_PARAMS)
+        assert key != ChannelCache.key(
+            b'abc', dict(NORMALIZATION_PARAMS, medwinsize=199))
+
+    def test_incomplete_entry_is_a_miss(self, tmp_path):
+        cache = ChannelCache(tmp_path)
+        key = _put(cache, 'a')
+        (cache._entry(key) / '3.npy').unlink()
+        assert cache.get(key) is None
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = ChannelCache(tmp_path)
+        key_a = _put(cache, 'a', when=1000)
+        key_b = _put(cache, 'b', when=2000)
+        entry_size = cache.size() // 2
+
+        # reading a refreshes it, so b becomes the oldest entry
+        assert cache.get(key_a) is not None
+        cache.max_size = entry_size * 2
+        key_c = _put(cache, 'c')
+
+        assert cache.get(key_b) is None
+        assert cache.get(key_a) is not None
+        assert cache.get(key_c) is not None
+        assert cache.size() == entry_size * 2
+
+    def test_prune(self, tmp_path):
+        cache = ChannelCache(tmp_path)
+        for (i, name) in enumerate('abc'):
+            _put(cache, name, when=1000 * (i + 1))
+        entry_size = cache.size() // 3
+        assert cache.prune(entry_size) == (2, entry_size * 2)
+        assert len(cache.entries()) == 1
+        assert cache.prune(0) == (1, entry_size)
+        assert cache.size() == 0
+
+
+def test_parse_size():
+    assert parse_size('2G') == 2 * 1024 ** 3
+    assert parse_size('512m') == 512 * 1024 ** 2
+    assert parse_size('1.5KB') == 1536
+    assert parse_size('100') == 100
+    assert parse_size(7) == 7
+
+
+def test_cache_script(tmp_path, monkeypatch):
+    output = []
+    monkeypatch.setattr(cache_script, 'cout', output.append)
+    cache = ChannelCache(default_cache_path(tmp_path))
+    _put(cache, 'a', when=1000)
+    _put(cache, 'b', when=2000)
+
+    parser = cache_script.init_argparser()
+    cache_script.main(parser.parse_args(['--stats',
+                                         '--cache-path', str(tmp_path)]))
+    assert '\tentries\t2' in output
+
+    cache_script.main(parser.parse_args(['--prune', '--max-size', '0',
+                                         '--cache-path', str(tmp_path)]))
+    assert cache.entries() == []
+
+
+@pytest.fixture(scope='module')
+def panels():
+    Marker.upload(params.default_markers)
+    Panel.upload(params.default_panels)
+
+
+class TestFSAFromFile:
+
+    def test_cached_channels_are_used(self, tmp_path, panels):
+        dyes = ['6-FAM', 'VIC', 'NED', 'PET', 'LIZ']
+        fsa_file = tmp_path / 'sample.fsa'
+        fsa_file.write_bytes(build_fsa({d: arange(100) for d in dyes}))
+
+        cache_path = tmp_path / 'cache'
+        cache = ChannelCache(cache_path)
+        key = cache.key(fsa_file.read_bytes(), NORMALIZATION_PARAMS)
+        cache.put(key, [(d, 500 + i, arange(100) * i)
+                        for (i, d) in enumerate(dyes)])
+
+        fsa = FSA.from_file(str(fsa_file), Panel.get_panel('GS500LIZ'),
+                            cache_path=cache_path)
+        assert fsa.status == const.assaystatus.normalized
+        assert [c.dye for c in fsa.channels] == dyes
+        assert array_equal(fsa.get_ladder_channel().data, arange(100) * 4)
+        assert all(c.fsa is fsa for c in fsa.channels)
+
+    def test_channels_are_cached_on_first_read(self, tmp_path, panels):
+        dyes = ['6FAM', 'VIC', 'NED', 'PET', 'LIZ']
+        rng = default_rng(0)
+        fsa_file = tmp_path / 'sample.fsa'
+        fsa_file.write_bytes(build_fsa(
+            {d: rng.integers(100, 300, 3000) for d in dyes}))
+        cache_path = tmp_path / 'cache'
+        panel = Panel.get_panel('GS500LIZ')
+
+        fsa = FSA.from_file(str(fsa_file), panel, cache_path=cache_path)
+        assert [c.dye for c in fsa.channels] == \
+            ['6-FAM', 'VIC', 'NED', 'PET', 'LIZ']
+        assert len(ChannelCache(cache_path).entries()) == 1
+
+        cached = FSA.from_file(str(fsa_file), panel, cache_path=cache_path)
+        for (c, expected) in zip(cached.channels, fsa.channels):
+            assert isinstance(c.data, memmap)
+            assert array_equal(c.data, expected.data)
+            assert c.wavelen == expected.wavelen
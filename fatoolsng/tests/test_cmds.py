@@ -0,0 +1,157 @@
+import pytest
+from numpy import allclose
+
+from fatoolsng.lib import params, const
+from fatoolsng.lib.fautil import algo, cmds
+from fatoolsng.lib.fautil.cmds import (do_parallel_align, do_stream,
+                                       do_warm_align, iter_window)
+from fatoolsng.tests.ladder import (LIZ500_SIZES, make_ladder_fsa,
+                                    upload_panels)
+
+
+@pytest.fixture(scope='module', autouse=True)
+def panels():
+    upload_panels()
+
+
+def _make_fsa(filename, sizes=LIZ500_SIZES, shift=0, spurious=()):
+    rtimes = [int(size * 10 + 200) + shift for size in sizes]
+    return make_ladder_fsa(filename, rtimes + list(spurious))
+
+
+class TestParallelAlign:
+
+    def test_matches_serial_alignment(self):
+        serial = _make_fsa('serial.fsa')
+        serial.align(params.Params())
+
+        parallel = _make_fsa('parallel.fsa')
+        do_parallel_align([(parallel, '1')], params.Params(), 2)
+
+        assert parallel.status == const.assaystatus.aligned
+        assert parallel.score == serial.score
+        assert parallel.nladder == serial.nladder
+        assert allclose(parallel.rss, serial.rss)
+        assert allclose(parallel.z, serial.z)
+        assert allclose(parallel.ztranspose, serial.ztranspose)
+
+        def _sized(fsa):
+            return [(a.rtime, a.size, a.type, getattr(a, 'qscore', None))
+                    for a in fsa.get_ladder_channel().alleles]
+
+        assert _sized(parallel) == _sized(serial)
+
+    def test_failure_is_isolated(self):
+        good = _make_fsa('good.fsa')
+        bad = _make_fsa('bad.fsa', sizes=[100])
+        do_parallel_align([(bad, '1'), (good, '2')], params.Params(), 2)
+        assert bad.status == const.assaystatus.normalized
+        assert good.status == const.assaystatus.aligned
+
+    def test_aligned_fsa_is_skipped(self):
+        fsa = _make_fsa('aligned.fsa')
+        fsa.status = const.assaystatus.aligned
+        fsa.score = 0.5
+        do_parallel_align([(fsa, '1')], params.Params(), 2)
+        assert fsa.score == 0.5
+
+
+# too many peaks for align_hc, which leaves align_pm, align_sh and align_de
+_SPURIOUS = [700, 1333, 1900, 2450, 3100, 3650, 4300, 5000]
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError('warm start should have been accepted')
+
+
+class TestWarmAlign:
+
+    def test_siblings_start_from_aligned_z(self, monkeypatch):
+        fsa_list = [(_make_fsa('0.fsa'), '0')] + [
+            (_make_fsa(f'{i}.fsa', shift=10 * i, spurious=_SPURIOUS), str(i))
+            for i in range(1, 4)]
+        for name in ('align_pm', 'align_sh', 'align_de'):
+            monkeypatch.setattr(algo, name, _fail)
+
+        do_warm_align(fsa_list, params.Params())
+        for (i, (fsa, _)) in enumerate(fsa_list):
+            assert fsa.status == const.assaystatus.aligned
+            assert fsa.nladder == len(LIZ500_SIZES)
+            ladder = [a for a in fsa.get_ladder_channel().alleles
+                      if a.size > 0]
+            assert [a.rtime for a in ladder] == \
+                [int(s * 10 + 200) + 10 * i for s in LIZ500_SIZES]
+
+    def test_parallel(self):
+        fsa_list = [(_make_fsa('0.fsa'), '0')] + [
+            (_make_fsa(f'{i}.fsa', shift=10 * i, spurious=_SPURIOUS), str(i))
+            for i in range(1, 3)]
+        do_warm_align(fsa_list, params.Params(), 2)
+        for (fsa, _) in fsa_list:
+            assert fsa.status == const.assaystatus.aligned
+            assert fsa.score > 0.9
+            assert fsa.nladder == len(LIZ500_SIZES)
+
+
+def _stream_args(**kwargs):
+    args = cmds.init_argparser().parse_args(['--stream', '--file', 'x.fsa'])
+    for (k, v) in kwargs.items():
+        setattr(args, k, v)
+    return args
+
+
+class TestStream:
+
+    def test_iter_window(self):
+        assert list(iter_window(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+        assert list(iter_window([], 3)) == []
+
+    def test_stream_bounds_fsa_in_memory(self, monkeypatch, tmp_path):
+        window = 2
+        opened = []
+
+        def _iter_fsa(args):
+            for i in range(5):
+                # previous windows must be released before opening more
+                in_flight = [f for f in opened
+                             if f.get_ladder_channel().data is not None]
+                assert len(in_flight) < window
+                fsa = _make_fsa(f'{i}.fsa')
+                opened.append(fsa)
+                yield (fsa, str(i))
+
+        monkeypatch.setattr(cmds, 'iter_fsa', _iter_fsa)
+        outfile = tmp_path / 'peaks.tab'
+        do_stream(_stream_args(align=True, window=window,
+                               outfile=str(outfile)))
+
+        assert len(opened) == 5
+        for fsa in opened:
+            assert fsa.status == const.assaystatus.aligned
+            assert all(c.data is None for c in fsa.channels)
+
+        lines = outfile.read_text().splitlines()
+        assert lines[0].split('\t') == ['SAMPLE', 'FILENAME', 'MARKER', 'DYE',
+                                        'RTIME', 'HEIGHT', 'SIZE']
+        assert len(lines) == 1 + 5 * len(LIZ500_SIZES)
+        # output keeps the order of the input
+        assert [line.split('\t')[1] for line in lines[1::16]] == \
+            [f'{i}.fsa' for i in range(5)]
+        assert lines[1].split('\t')[-1] == '35.000'
+
+    def test_stream_rejects_plotting(self):
+        with pytest.raises(SystemExit):
+            do_stream(_stream_args(plot=True))
+
+
+class TestPortfolioOption:
+
+    def test_default_portfolio(self):
+        args = cmds.init_argparser().parse_args(['--align', '--portfolio'])
+        assert args.portfolio == cmds.DEFAULT_PORTFOLIO
+
+    def test_bad_portfolio_exits(self):
+        args = cmds.init_argparser().parse_args(['--align',
+                                                 '--portfolio', 'hc,xx'])
+        with pytest.raises(SystemExit):
+            cmds.do_align(args, [], None)
@@ -0,0 +1,145 @@
+from types import SimpleNamespace
+from numpy import load as np_load, array, array_equal, loadtxt, allclose
+from numpy.random import default_rng
+
+from fatoolsng.lib.fautil.traceio import read_abif_stream
+from fatoolsng.lib.fautil.traceutils import smooth_signal, correct_baseline
+from fatoolsng.scripts import convert
+from fatoolsng.tests.abif import build_fsa, pstring_tag
+
+
+_DYES = ['6-FAM', 'VIC', 'NED', 'PET', 'LIZ']
+
+
+def _manifest(tmp_path, assays):
+    path = tmp_path / 'manifest.tab'
+    lines = ['SAMPLE\tASSAY\tPANEL\tOPTIONS']
+    lines += [f'{sample}\t{assay}\tGS500LIZ\t' for (sample, assay) in assays]
+    path.write_text('\n'.join(lines) + '\n')
+    return path
+
+
+def _checkfsa(monkeypatch, tmp_path, manifest, jobs=4):
+    out, err = [], []
+    monkeypatch.setattr(convert, 'cout', out.append)
+    monkeypatch.setattr(convert, 'cerr', err.append)
+    convert.do_checkfsa(SimpleNamespace(infiles=[str(manifest)],
+                                        fsadir=str(tmp_path), jobs=jobs))
+    return out, err
+
+
+class TestCheckFSA:
+
+    def test_reports_metadata_in_manifest_order(self, monkeypatch, tmp_path):
+        assays = []
+        for i in range(20):
+            (tmp_path / f'{i}.fsa').write_bytes(build_fsa(
+                {'6-FAM': [1] * (100 + i), 'LIZ': [2] * (100 + i)},
+                extra_tags=[pstring_tag('MCHN', 1, 'ABI-01')]))
+            assays.append((f's{i}', f'{i}.fsa'))
+        out, err = _checkfsa(monkeypatch, tmp_path,
+                             _manifest(tmp_path, assays))
+        assert err == []
+        assert out[0].split('\t') == ['ASSAY', 'DYES', 'DYE_SET', 'RUN_START',
+                                      'INSTRUMENT', 'MODEL', 'SCANS']
+        assert out[1].split('\t') == ['0.fsa', '6-FAM,LIZ', '',
+                                      '2024-01-31 13:45:10', 'ABI-01', '',
+                                      '100']
+        assert [line.split('\t')[6] for line in out[1:]] == \
+            [str(100 + i) for i in range(20)]
+
+    def test_reports_invalid_files(self, monkeypatch, tmp_path):
+        (tmp_path / 'good.fsa').write_bytes(build_fsa({'LIZ': [1, 2, 3]}))
+        (tmp_path / 'bad.fsa').write_bytes(b'not an fsa file')
+        manifest = _manifest(tmp_path, [('#skipped', 'good.fsa'),
+                                        ('a', 'good.fsa'), ('b', 'bad.fsa'),
+                                        ('c', 'missing.fsa'),
+                                        ('d', 'good.fsa')])
+        out, err = _checkfsa(monkeypatch, tmp_path, manifest)
+        assert [line.split('\t')[0] for line in out[1:]] == \
+            ['good.fsa', 'good.fsa']
+        assert err[0].startswith('WARN file:')
+        assert 'duplicated assay: good.fsa for sample d' in err[0]
+        assert err[1].startswith(f'ERR file: {manifest} line: 4  - sample: b '
+                                 'assay: bad.fsa - Not a valid ABIF file')
+        assert 'line: 5  - sample: c assay: missing.fsa' in err[2]
+        assert len(err) == 3
+
+    def test_default_jobs(self):
+        args = convert.init_argparser().parse_args(['--checkfsa', 'x.tab'])
+        assert args.jobs == 1
+
+
+def _write_fsa(path, seed=0, length=3000):
+    rng = default_rng(seed)
+    path.write_bytes(build_fsa({d: rng.integers(-50, 3000, length)
+                                for d in _DYES}))
+    return str(path)
+
+
+def _fsa2tab(monkeypatch, infiles, fmt='tab', jobs=None):
+    out, err = [], []
+    monkeypatch.setattr(convert, 'cout', out.append)
+    monkeypatch.setattr(convert, 'cerr', err.append)
+    convert.do_fsa2tab(SimpleNamespace(infiles=infiles, format=fmt,
+                                       jobs=jobs))
+    return out, err
+
+
+class TestFSA2Tab:
+
+    def test_tab_matches_per_sample_formatting(self, monkeypatch, tmp_path):
+        infile = _write_fsa(tmp_path / 'a.fsa')
+        out, err = _fsa2tab(monkeypatch, [infile])
+        assert (out, err) == ([f"Dyes: {' '.join(_DYES)}"], [])
+
+        with open(infile, 'rb') as instream:
+            channels = read_abif_stream(instream).get_channels()
+        header = '\t'.join('"' + d + '"' for d in _DYES) + '\n'
+        expected_raw = header + ''.join(
+            '\t'.join(str(x) for x in p) + '\n'
+            for p in zip(*[channels[d].raw.tolist() for d in _DYES]))
+        with open(infile + '.raw.tab') as f:
+            assert f.read() == expected_raw
+
+        smooth = [correct_baseline(smooth_signal(channels[d].raw))
+                  for d in _DYES]
+        with open(infile + '.base.tab') as f:
+            assert f.readline() == header
+            lines = f.readlines()
+        assert len(lines) == 3000
+        assert lines[10].rstrip().split('\t') == \
+            ['%.9g' % s[10] for s in smooth]
+        assert allclose(loadtxt(infile + '.base.tab', skiprows=1),
+                        array(smooth).T, rtol=1e-8, atol=1e-9)
+
+    def test_binary_formats(self, monkeypatch, tmp_path):
+        infile = _write_fsa(tmp_path / 'a.fsa')
+        _fsa2tab(monkeypatch, [infile])
+        raw = loadtxt(infile + '.raw.tab', skiprows=1)
+        base = loadtxt(infile + '.base.tab', skiprows=1)
+
+        _fsa2tab(monkeypatch, [infile], fmt='npy')
+        assert array_equal(np_load(infile + '.raw.npy'), raw)
+        assert allclose(np_load(infile + '.base.npy'), base, rtol=1e-8)
+
+        _fsa2tab(monkeypatch, [infile], fmt='npz')
+        with np_load(infile + '.npz') as npz:
+            assert npz['dyes'].tolist() == _DYES
+            assert npz['raw'].shape == (3000, 5)
+            assert array_equal(npz['raw'], raw)
+            assert allclose(npz['base'], base, rtol=1e-8)
+
+    def test_parallel(self, monkeypatch, tmp_path):
+        infiles = [_write_fsa(tmp_path / f'{i}.fsa', seed=i) for i in range(4)]
+        (tmp_path / 'bad.fsa').write_bytes(b'not an fsa file')
+        infiles.insert(2, str(tmp_path / 'bad.fsa'))
+        out, err = _fsa2tab(monkeypatch, infiles, fmt='npy', jobs=2)
+        assert len(out) == 4
+        assert err == [f'ERR file: {infiles[2]} - '
+                       'RuntimeError: Not a valid ABIF file']
+        for infile in infiles[:2] + infiles[3:]:
+            with open(infile, 'rb') as instream:
+                channels = read_abif_stream(instream).get_channels()
+            assert array_equal(np_load(infile + '.raw.npy')[:, 4],
+                               channels['LIZ'].raw)
@@ -1,5 +1,12 @@
 import pytest
-from numpy import linspace, exp, zeros, ones, arange
+from numpy import (linspace, exp, zeros, ones, arange, allclose, array_equal,
+                   convolve, percentile)
+from numpy.random import default_rng
+from scipy.signal import find_peaks as scipy_find_peaks
+
+from fatoolsng.lib import params
+from fatoolsng.lib.fautil import algo
+from fatoolsng.lib.fautil.cwt import cwt, cwt_find_peaks, ricker, ricker_bank
 from fatoolsng.lib.fautil.traceutils import _cwt_find_peaks
 
 
@@ -52,3 +59,66 @@ class TestCwtFindPeaks:
         low_snr = _cwt_find_peaks(signal, widths, min_snr=0.01)
         high_snr = _cwt_find_peaks(signal, widths, min_snr=5.0)
         assert len(high_snr) <= len(low_snr)
+
+
+def _direct_cwt(data, widths):
+    # the direct convolution traceutils used before cwt()
+    out = zeros((len(widths), len(data)))
+    for i, w in enumerate(widths):
+        n = min(10 * int(w), len(data))
+        out[i] = convolve(data, ricker(n, w)[::-1], mode='same')
+    return out
+
+
+class TestCwt:
+
+    @pytest.mark.parametrize('length, widths', [
+        (200, arange(2, 12)), (16000, arange(5, 15)), (30, arange(1, 8)),
+        (1000, [1.5, 3, 64])])
+    def test_matches_direct_convolution(self, length, widths):
+        data = default_rng(0).normal(size=length)
+        assert allclose(cwt(data, widths), _direct_cwt(data, widths),
+                        rtol=0, atol=1e-12)
+
+    def test_rows_are_transformed_together(self):
+        data = default_rng(0).normal(size=(3, 500))
+        result = cwt(data, arange(2, 9))
+        assert result.shape == (3, 7, 500)
+        for (row, expected) in zip(data, result):
+            assert allclose(expected, _direct_cwt(row, arange(2, 9)),
+                            rtol=0, atol=1e-12)
+
+    def test_wavelet_bank_is_cached(self):
+        ricker_bank.cache_clear()
+        rng = default_rng(0)
+        for _ in range(3):
+            cwt(rng.normal(size=700), arange(2, 9))
+        info = ricker_bank.cache_info()
+        assert (info.misses, info.hits) == (1, 2)
+
+    def test_peaks_match_direct_transform(self):
+        rng = default_rng(1)
+        x = arange(4000)
+        data = abs(rng.normal(0, 3, len(x)))
+        for c in rng.integers(100, 3900, 30):
+            data += rng.uniform(50, 2000) * exp(-0.5 * ((x - c) / 3)**2)
+        widths = arange(5, 15)
+        response = _direct_cwt(data, widths).max(axis=0)
+        noise = percentile(abs(response), 10)
+        expected, _ = scipy_find_peaks(response, height=3 * noise)
+        assert array_equal(cwt_find_peaks(data, widths, 3), expected)
+
+
+class TestFindPeaksCwt:
+
+    def test_finds_peaks_at_their_maximum(self):
+        rtimes = [1200, 1500, 2200, 3000, 3100, 4500]
+        x = arange(6000)
+        data = abs(default_rng(0).normal(0, 3, len(x)))
+        for (i, rtime) in enumerate(rtimes):
+            data += (500 + 300 * i) * exp(-0.5 * ((x - rtime) / 4)**2)
+        p = params.Params().nonladder
+        p.method = 'cwt'
+        peaks = algo.find_peaks(data, p)
+        assert peaks.rtime.tolist() == rtimes
+        assert (peaks.rfu == data[rtimes].astype(int)).all()
@@ -0,0 +1,101 @@
+import pytest
+from numpy import array, array_equal
+from numpy.random import default_rng
+from fatoolsng.lib.fautil.dpalign import (dp, dp_batch, gaussian_scores,
+                                          GAP_PENALTY,
+                                          _dp_scalar)
+
+
+def _random_scores(rows, cols, seed=0):
+    rng = default_rng(seed)
+    S = rng.random((rows, cols))
+    # sparse matrices with exact ties are the common case for ladder scores
+    S[S < 0.7] = 0.0
+    return S
+
+
+def _assert_same_result(S, gap_penalty, peak_penalty=0):
+    expected = _dp_scalar(S, gap_penalty, peak_penalty)
+    result = dp(S, gap_penalty, peak_penalty)
+    assert result['matches'] == expected['matches']
+    assert result['trace'] == expected['trace']
+    assert result['p'] == expected['p']
+    assert result['q'] == expected['q']
+    assert array_equal(result['D'], expected['D'])
+    assert array_equal(result['phi'], expected['phi'])
+
+
+class TestDpEquivalence:
+
+    @pytest.mark.parametrize('rows,cols', [(16, 30), (36, 70), (7, 7), (1, 5),
+                                           (5, 1)])
+    @pytest.mark.parametrize('gap_penalty', [-5, -5e-3, 0])
+    def test_matches_scalar_reference(self, rows, cols, gap_penalty):
+        for seed in range(5):
+            _assert_same_result(_random_scores(rows, cols, seed), gap_penalty)
+
+    def test_matches_scalar_reference_with_peak_penalty(self):
+        for seed in range(5):
+            _assert_same_result(_random_scores(16, 30, seed), -5, -0.1)
+
+    def test_all_zero_scores(self):
+        S = array([[0.0] * 6] * 4)
+        _assert_same_result(S, -5)
+
+    def test_diagonal_scores_match_diagonal(self):
+        S = array([[1.0, 0.0, 0.0],
+                   [0.0, 1.0, 0.0],
+                   [0.0, 0.0, 1.0]])
+        assert dp(S, -5)['matches'] == [[0, 0], [1, 1], [2, 2]]
+
+    def test_accepts_nested_lists(self):
+        S = [[1.0, 0.0], [0.0, 1.0]]
+        assert dp(S, -5)['matches'] == [[0, 0], [1, 1]]
+
+
+class TestDpBatch:
+
+    @pytest.mark.parametrize('rows,cols', [(16, 30), (7, 7), (1, 5), (5, 1)])
+    def test_matches_dp(self, rows, cols):
+        S = array([_random_scores(rows, cols, seed) for seed in range(5)])
+        scores, matches = dp_batch(S, -5e-3)
+        for (b, S_b) in enumerate(S):
+            expected = dp(S_b, -5e-3)
+            assert scores[b] == expected['D'][-1][-1]
+            assert [[i, j] for (i, j) in enumerate(matches[b]) if j >= 0] \
+                == expected['matches']
+
+    def test_unmatched_rows(self):
+        S = array([[[0.0], [1.0], [0.0]]])
+        assert dp_batch(S, -5e-3)[1].tolist() == [[-1, 0, -1]]
+
+
+def test_gaussian_scores_batch():
+    rng = default_rng(3)
+    sizes = rng.uniform(30, 500, 12)
+    rtime_sizes = rng.uniform(0, 550, (5, 20))
+    similarity = rng.uniform(0.5, 1, 20)
+    S = gaussian_scores(sizes, rtime_sizes, similarity)
+    assert S.shape == (5, 12, 20)
+    for (b, row) in enumerate(rtime_sizes):
+        assert array_equal(S[b], gaussian_scores(sizes, row, similarity))
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_banded_scores_align_as_dense(seed):
+    rng = default_rng(seed)
+    sizes = array([35, 50, 75, 100, 139, 150, 160, 200, 250, 300, 340, 350,
+                   400, 450, 490, 500], dtype='d')
+    # peaks sized near the ladder sizes, some missing, and primer and
+    # late spurious peaks far from any ladder size
+    rtime_sizes = sizes[rng.random(len(sizes)) > 0.1]
+    rtime_sizes = rtime_sizes + rng.normal(0, 1.5, len(rtime_sizes))
+    rtime_sizes = sorted(list(rtime_sizes) + list(rng.uniform(-60, 10, 3)) +
+                         list(rng.uniform(525, 600, 3)))
+    similarity = rng.uniform(0.5, 1, len(rtime_sizes))
+
+    dense = gaussian_scores(sizes, rtime_sizes, similarity)
+    banded = gaussian_scores(sizes, rtime_sizes, similarity, banded=True)
+    assert (banded == 0).sum() > (dense < 1e-3).sum() / 2
+    assert dp(banded, GAP_PENALTY)['matches'] == \
+        dp(dense, GAP_PENALTY)['matches']
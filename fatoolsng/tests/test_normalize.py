@@ -0,0 +1,76 @@
+import pytest
+from numpy import (arange, exp, maximum, repeat, stack, int16, allclose,
+                   array_equal)
+from numpy.random import default_rng
+from scipy.ndimage import white_tophat
+from scipy.signal import medfilt, savgol_filter
+
+from fatoolsng.lib.fautil.algo import normalize_baseline
+from fatoolsng.lib.fautil.normalize import (normalize_channels, running_median,
+                                            savgol_rows)
+
+
+def _traces(n_channels=5, length=6000, seed=0):
+    rng = default_rng(seed)
+    x = arange(length)
+    traces = []
+    for _ in range(n_channels):
+        y = 200 + 400 * exp(-x / 2000) + rng.normal(0, 5, length)
+        for c in rng.integers(0, length, 30):
+            y += rng.uniform(100, 3000) * exp(-0.5 * ((x - c) / 4)**2)
+        traces.append(y)
+    return stack(traces).astype(int16)
+
+
+def _per_channel(raw, medwinsize=399, savgol_size=11, savgol_order=5,
+                 tophat_factor=0.01):
+    """ normalization of a single channel with scipy filters """
+    baseline = savgol_filter(medfilt(raw, [medwinsize]), medwinsize,
+                             savgol_order)
+    corrected = maximum(raw - baseline, 0)
+    smooth = savgol_filter(corrected, savgol_size, savgol_order)
+    return (white_tophat(smooth, None,
+                         repeat([1], int(round(raw.size * tophat_factor)))),
+            baseline)
+
+
+class TestFilters:
+
+    @pytest.mark.parametrize('window', [3, 11, 399, 1991])
+    def test_running_median_matches_medfilt(self, window):
+        raw = _traces(3)
+        result = running_median(raw, window)
+        for (row, expected) in zip(result, raw):
+            assert array_equal(row, medfilt(expected, [window]))
+
+    @pytest.mark.parametrize('window,order', [(11, 5), (299, 7), (399, 5)])
+    def test_savgol_rows_matches_savgol_filter(self, window, order):
+        x = _traces(3).astype(float)
+        assert allclose(savgol_rows(x, window, order),
+                        savgol_filter(x, window, order, axis=-1),
+                        rtol=1e-9, atol=1e-7)
+
+
+class TestNormalizeChannels:
+
+    def test_matches_per_channel_normalization(self):
+        raw = _traces()
+        nc = normalize_channels(raw)
+        assert nc.signal.shape == raw.shape
+        for (i, channel) in enumerate(raw):
+            signal, baseline = _per_channel(channel)
+            assert allclose(nc.signal[i], signal, atol=1e-6)
+            assert allclose(nc.baseline[i], baseline, atol=1e-6)
+
+    def test_single_channel(self):
+        raw = _traces(1)[0]
+        nt = normalize_baseline(raw, medwinsize=299, savgol_order=7)
+        signal, baseline = _per_channel(raw, 299, 11, 7)
+        assert allclose(nt.signal, signal, atol=1e-6)
+        assert allclose(nt.baseline, baseline, atol=1e-6)
+
+    def test_michaelis_menten_fit(self):
+        nc = normalize_channels(_traces(2), mm_winsize=1991)
+        assert nc.mma.shape == (2,)
+        assert nc.mmb.shape == (2,)
+        assert normalize_channels(_traces(2)).mma is None
@@ -1,7 +1,11 @@
 import pickle
+import sqlite3
 import pytest
 from pathlib import Path
-from fatoolsng.lib.fautil.peakcache import PeakCache
+from numpy import array_equal, frombuffer
+from fatoolsng.lib.fautil.algo import Peak
+from fatoolsng.lib.fautil.peakcache import (PeakCache, PEAK_DTYPE,
+                                            encode_peaks, decode_peaks)
 
 
 @pytest.fixture
@@ -102,3 +106,140 @@ class TestPersistence:
         with PeakCache(path) as db:
             db.put('x', b'y')
             assert db.get('x') == b'y'
+
+
+def _committed(path):
+    """Read keys through a separate connection, as another process would."""
+    with PeakCache(path, create_if_missing=False) as reader:
+        return list(reader.iterator(include_value=False))
+
+
+class TestBatchedWrites:
+
+    def test_wal_journal_mode(self, tmp_path):
+        path = tmp_path / 'peaks.db'
+        with PeakCache(path):
+            pass
+        conn = sqlite3.connect(str(path))
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        conn.close()
+
+    def test_put_commits_immediately_by_default(self, tmp_path):
+        path = tmp_path / 'peaks.db'
+        with PeakCache(path) as db:
+            db.put('a', b'1')
+            assert _committed(path) == [b'a']
+
+    def test_flush_interval(self, tmp_path):
+        path = tmp_path / 'peaks.db'
+        with PeakCache(path, flush_interval=3) as db:
+            db.put('a', b'1')
+            db.put('b', b'2')
+            assert _committed(path) == []
+            # pending writes are visible to the writer itself
+            assert db.get('b') == b'2'
+            db.put('c', b'3')
+            assert _committed(path) == [b'a', b'b', b'c']
+            db.put('d', b'4')
+        assert _committed(path) == [b'a', b'b', b'c', b'd']
+
+    def test_put_many(self, tmp_path):
+        path = tmp_path / 'peaks.db'
+        with PeakCache(path, flush_interval=100) as db:
+            db.put_many([(b'a', b'1'), ('b', b'2')])
+            assert _committed(path) == [b'a', b'b']
+            assert db.get('a') == b'1'
+
+    def test_transaction_commits_on_exit(self, tmp_path):
+        path = tmp_path / 'peaks.db'
+        with PeakCache(path) as db:
+            with db.transaction():
+                db.put('a', b'1')
+                with db.transaction():
+                    db.put_many([('b', b'2')])
+                assert _committed(path) == []
+            assert _committed(path) == [b'a', b'b']
+
+    def test_transaction_rolls_back_on_error(self, tmp_path):
+        path = tmp_path / 'peaks.db'
+        with PeakCache(path) as db:
+            db.put('a', b'1')
+            with pytest.raises(RuntimeError):
+                with db.transaction():
+                    db.put('b', b'2')
+                    raise RuntimeError
+            assert db.get('b') is None
+        assert _committed(path) == [b'a']
+
+    def test_rollback_keeps_writes_pending_before(self, tmp_path):
+        path = tmp_path / 'peaks.db'
+        with PeakCache(path, flush_interval=10) as db:
+            db.put('a', b'1')
+            with pytest.raises(RuntimeError):
+                with db.transaction():
+                    db.put('b', b'2')
+                    raise RuntimeError
+            assert db.get('a') == b'1'
+            assert db.get('b') is None
+        assert _committed(path) == [b'a']
+
+    def test_reader_during_open_transaction(self, tmp_path):
+        path = tmp_path / 'peaks.db'
+        with PeakCache(path) as db:
+            db.put('a', b'1')
+            with db.transaction():
+                db.put('b', b'2')
+                reader = PeakCache(path, create_if_missing=False)
+                assert reader.get('a') == b'1'
+                assert reader.get('b') is None
+            assert reader.get('b') == b'2'
+            reader.close()
+
+
+def _peaks():
+    return [Peak(100, 2000, 5000, 90, 110, 0.25, 2.5, 0.8, 12, 101.5, 102),
+            Peak(200, 1500, 3000.5, 190, 210, -0.1, 2.0, 1.2, 7),
+            Peak(350, 800)]
+
+
+class TestPeakEncoding:
+
+    def test_roundtrip(self):
+        arr = decode_peaks(encode_peaks(_peaks()))
+        assert arr.dtype == PEAK_DTYPE
+        assert list(arr['rtime']) == [100, 200, 350]
+        assert list(arr['area']) == [5000, 3000.5, -1]
+        assert list(arr['size']) == [101.5, -1, -1]
+        assert list(arr['bin']) == [102, -1, -1]
+        assert array_equal(decode_peaks(encode_peaks(arr)), arr)
+
+    def test_empty(self):
+        arr = decode_peaks(encode_peaks([]))
+        assert len(arr) == 0 and arr.dtype == PEAK_DTYPE
+
+    def test_layout_is_columnar(self):
+        data = encode_peaks(_peaks())
+        # header is followed by the rtime column
+        assert frombuffer(data, '<i4', count=3, offset=16).tolist() == \
+            [100, 200, 350]
+        assert len(data) == 16 + 3 * PEAK_DTYPE.itemsize
+
+    def test_rejects_bad_data(self):
+        data = encode_peaks(_peaks())
+        with pytest.raises(ValueError):
+            decode_peaks(b'XXXX' + data[4:])
+        with pytest.raises(ValueError):
+            decode_peaks(data[:-1])
+        with pytest.raises(ValueError):
+            decode_peaks(data[:4] + b'\x09\x00' + data[6:])
+
+    def test_cache_put_and_get_peaks(self, cache):
+        cache.put_peaks(b'b|s|f|t|FAM', _peaks())
+        arr = cache.get_peaks('b|s|f|t|FAM')
+        assert list(arr['rfu']) == [2000, 1500, 800]
+        assert cache.get_peaks('missing') is None
+
+    def test_get_peaks_reads_pickled_entries(self, cache):
+        cache.put('old', pickle.dumps(_peaks()))
+        arr = cache.get_peaks('old')
+        assert array_equal(arr, decode_peaks(encode_peaks(_peaks())))
@@ -0,0 +1,145 @@
+import pytest
+import pickle
+from numpy import arange, array, exp, zeros, array_equal
+from numpy.random import default_rng
+
+from fatoolsng.lib import const, params
+from fatoolsng.lib.fautil import algo
+from fatoolsng.lib.fautil.algo import Peak
+from fatoolsng.lib.fautil.peaktable import PeakTable, PEAK_DTYPE
+from fatoolsng.lib.fileio.models import FSA, Panel, Marker
+
+
+_LIZ500_SIZES = [35, 50, 75, 100, 139, 150, 160, 200,
+                 250, 300, 340, 350, 400, 450, 490, 500]
+
+
+def _ladder_trace(seed=0, noise_peaks=150):
+    rng = default_rng(seed)
+    x = arange(8000)
+    data = abs(rng.normal(0, 3, len(x)))
+    for (i, size) in enumerate(_LIZ500_SIZES):
+        data += (800 + 200 * (i % 4)) * exp(-0.5 * ((x - _rtime(size)) / 4)**2)
+    for rtime in rng.integers(1000, 7500, noise_peaks):
+        data += rng.uniform(20, 120) * exp(-0.5 * ((x - rtime) / 1.5)**2)
+    return data
+
+
+def _rtime(size):
+    return size * 12 + 1000
+
+
+class TestPeakTable:
+
+    def test_from_rtimes(self):
+        t = PeakTable.from_rtimes([10, 20], [100, 200])
+        assert len(t) == 2
+        assert t.data.dtype == PEAK_DTYPE
+        assert t.rtime.tolist() == [10, 20]
+        assert t.area.tolist() == [-1, -1]
+
+    def test_columns_are_assignable(self):
+        t = PeakTable.from_rtimes([10, 20], [100, 200])
+        t.brtime = [5, 15]
+        t.ertime = [14, 30]
+        assert t.wrtime.tolist() == [9, 15]
+
+    def test_indexing(self):
+        t = PeakTable.from_rtimes([10, 20, 30], [300, 100, 200])
+        assert isinstance(t[t.rfu > 150], PeakTable)
+        assert t[t.rfu > 150].rtime.tolist() == [10, 30]
+        assert t[1:].rtime.tolist() == [20, 30]
+        assert t[array([2, 0])].rtime.tolist() == [30, 10]
+        p = t[1]
+        assert isinstance(p, Peak)
+        assert (p.rtime, p.rfu) == (20, 100)
+
+    def test_sorted_keeps_order_of_ties(self):
+        t = PeakTable.from_rtimes([10, 20, 30, 40], [100, 200, 100, 200])
+        assert t.sorted('rfu', reverse=True).rtime.tolist() == [20, 40, 10, 30]
+        assert t.sorted('rfu').rtime.tolist() == [10, 30, 20, 40]
+
+    def test_iteration_creates_peaks(self):
+        t = PeakTable.from_rtimes([10, 20], [100, 200])
+        t.brtime, t.ertime = [5, 15], [14, 30]
+        peaks = list(t)
+        assert [p.rtime for p in peaks] == [10, 20]
+        assert [p.wrtime for p in peaks] == [9, 15]
+
+    def test_from_peaks(self):
+        t = PeakTable.from_peaks([Peak(10, 100, 500.5), Peak(20, 200)])
+        assert t.area.tolist() == [500.5, -1]
+
+    def test_pickle(self):
+        t = PeakTable.from_rtimes([10, 20], [100, 200])
+        assert array_equal(pickle.loads(pickle.dumps(t)).data, t.data)
+
+
+class TestFindPeaks:
+
+    def test_ladder_peaks_are_found_in_noise(self):
+        data = _ladder_trace()
+        peaks = algo.find_peaks(data, params.Params().ladder, 0,
+                                len(_LIZ500_SIZES))
+        assert isinstance(peaks, PeakTable)
+        assert all(peaks.rtime[1:] > peaks.rtime[:-1])
+        found = peaks.rtime.tolist()
+        for size in _LIZ500_SIZES:
+            assert min(abs(r - _rtime(size)) for r in found) <= 1
+
+    def test_measures_peaks(self):
+        data = _ladder_trace(noise_peaks=0)
+        peaks = algo.find_peaks(data, params.Params().nonladder)
+        assert len(peaks) == len(_LIZ500_SIZES)
+        assert (peaks.area > peaks.rfu).all()
+        assert (peaks.wrtime > 0).all()
+        assert array_equal(peaks.beta, peaks.area / peaks.rfu)
+        assert array_equal(peaks.theta, peaks.rfu / peaks.wrtime)
+
+    def test_offset(self):
+        data = _ladder_trace(noise_peaks=0)
+        peaks = algo.find_peaks(data, params.Params().nonladder, 3000)
+        assert peaks.rtime.min() >= 3000
+        assert len(peaks) == sum(_rtime(s) >= 3000 for s in _LIZ500_SIZES)
+
+    def test_no_peaks(self):
+        peaks = algo.find_peaks(zeros(1000), params.Params().nonladder)
+        assert len(peaks) == 0
+
+
+@pytest.fixture(scope='module')
+def panels():
+    Marker.upload(params.default_markers)
+    Panel.upload(params.default_panels)
+
+
+class TestLazyAlleles:
+
+    def _scanned_channel(self):
+        fsa = FSA()
+        fsa.filename = 'ladder.fsa'
+        fsa.set_panel(Panel.get_panel('GS500LIZ'))
+        c = fsa.add_channel(FSA.Channel(
+            data=_ladder_trace(), dye='LIZ', wavelen=655,
+            status=const.channelstatus.reseted, fsa=fsa))
+        c.scan(params.Params())
+        return c
+
+    def test_alleles_are_created_on_access(self, panels):
+        c = self._scanned_channel()
+        assert c.status == const.channelstatus.scanned
+        assert c._alleles == []
+        assert len(c._peaks) > len(_LIZ500_SIZES)
+
+        alleles = c.get_alleles()
+        assert len(alleles) == len(c._alleles) > len(_LIZ500_SIZES)
+        assert c.alleles is alleles
+        a = alleles[0]
+        assert a.type == const.peaktype.scanned
+        assert a.marker is c.marker
+        assert a.wrtime == a.ertime - a.brtime
+
+    def test_clearing_drops_pending_peaks(self, panels):
+        c = self._scanned_channel()
+        c.alleles = []
+        assert c.alleles == []
@@ -0,0 +1,139 @@
+import os
+import pytest
+
+from fatoolsng.lib import params, const
+from fatoolsng.lib.const import ladders, alignmethod
+from fatoolsng.lib.fautil import algo
+from fatoolsng.lib.fautil.algo import Peak, align_ladder
+from fatoolsng.lib.fautil.portfolio import (AlignerPool, is_applicable,
+                                            parse_portfolio)
+from fatoolsng.tests.ladder import make_ladder_fsa, upload_panels
+
+
+_LIZ500_SIZES = ladders['LIZ500']['sizes']
+
+# too many peaks for align_hc
+_SPURIOUS = [700, 1333, 1900, 2450, 3100, 3650, 4300, 5000]
+
+
+def _rtimes(spurious=()):
+    return sorted([int(size * 10 + 200) for size in _LIZ500_SIZES] +
+                  list(spurious))
+
+
+def _peaks(spurious=()):
+    return [Peak(rtime=rtime, rfu=1000 + (i % 5) * 200, area=5000,
+                 brtime=rtime - 5, ertime=rtime + 5, srtime=0.0, beta=8.0,
+                 theta=100.0, omega=rtime)
+            for (i, rtime) in enumerate(_rtimes(spurious))]
+
+
+def _ladder():
+    ladder = dict(ladders['LIZ500'])
+    ladder['qcfunc'] = algo.generate_scoring_function(ladder['strict'],
+                                                      ladder['relax'])
+    return ladder
+
+
+def _die_before_start(conn):
+    """ worker target dying once it receives its task """
+    conn.recv()
+    os._exit(1)
+
+
+@pytest.fixture(scope='module')
+def pool():
+    with AlignerPool(2) as pool:
+        yield pool
+
+
+class TestParsePortfolio:
+
+    def test_methods_and_timeouts(self):
+        assert parse_portfolio('hc:10,pm:60.5,sh,de:600') == [
+            ('hc', 10.0), ('pm', 60.5), ('sh', None), ('de', 600.0)]
+
+    def test_unknown_method(self):
+        with pytest.raises(ValueError, match='unknown aligner'):
+            parse_portfolio('hc,xx')
+
+    def test_duplicate_method(self):
+        with pytest.raises(ValueError, match='more than once'):
+            parse_portfolio('pm,pm:5')
+
+    def test_bad_timeout(self):
+        with pytest.raises(ValueError):
+            parse_portfolio('pm:soon')
+
+
+def test_is_applicable():
+    ladder = _ladder()
+    assert is_applicable('hc', _peaks(), ladder)
+    assert not is_applicable('hc', _peaks(_SPURIOUS), ladder)
+    assert not is_applicable('ws', _peaks(), ladder)
+    assert is_applicable('ws', _peaks(), ladder, initial_z=[0.1, -20])
+    assert is_applicable('de', _peaks(_SPURIOUS), ladder)
+
+
+class TestRace:
+
+    def test_first_strict_result_cancels_the_rest(self, pool):
+        result = pool.race(_peaks(), _ladder(), [('hc', None), ('de', None)])
+        assert result.method == alignmethod.hcm_strict
+        assert len(result.dpresult.sized_peaks) == len(_LIZ500_SIZES)
+        assert 'hc' in result.timings
+        assert all(t >= 0 for t in result.timings.values())
+
+    def test_inapplicable_aligners_are_skipped(self, pool):
+        result = pool.race(_peaks(_SPURIOUS), _ladder(),
+                           [('hc', None), ('ws', None), ('pm', None)])
+        assert result.method == alignmethod.pm_strict
+        assert list(result.timings) == ['pm']
+
+    def test_timeout(self, pool):
+        with pytest.raises(RuntimeError, match='no aligner'):
+            pool.race(_peaks(_SPURIOUS), _ladder(), [('de', 0.1)])
+        # the pool keeps working with a replaced worker
+        result = pool.race(_peaks(), _ladder(), [('hc', 5)])
+        assert result.method == alignmethod.hcm_strict
+
+
+def test_worker_dying_before_start():
+    with AlignerPool(1) as pool:
+        conn, child_conn = pool._context.Pipe()
+        process = pool._context.Process(target=_die_before_start,
+                                        args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        pool._idle.append((process, conn))
+
+        with pytest.raises(RuntimeError, match='no aligner'):
+            pool.race(_peaks(), _ladder(), [('hc', None)])
+        # the dead worker has been replaced
+        result = pool.race(_peaks(), _ladder(), [('hc', None)])
+        assert result.method == alignmethod.hcm_strict
+
+
+def test_align_ladder_records_timings():
+    result = align_ladder(_peaks(_SPURIOUS), _ladder(), None)
+    assert result.method == alignmethod.pm_strict
+    assert list(result.timings) == ['pm']
+    assert result.timings['pm'] >= 0
+
+
+def test_fsa_records_portfolio_timings():
+    upload_panels()
+    fsa = make_ladder_fsa('portfolio.fsa', _rtimes(_SPURIOUS))
+    c = fsa.get_ladder_channel()
+
+    parameters = params.Params()
+    parameters.alignment = params.AlignmentParameter()
+    parameters.alignment.portfolio = parse_portfolio('hc,pm,de')
+    parameters.alignment.workers = 2
+    fsa.align(parameters)
+
+    assert fsa.status == const.assaystatus.aligned
+    assert fsa.score > 0.9
+    assert fsa.nladder == len(_LIZ500_SIZES)
+    assert 'pm' in fsa.timings
+    assert sorted(a.rtime for a in c.alleles if a.size > 0) == _rtimes()
@@ -0,0 +1,156 @@
+import pytest
+from types import SimpleNamespace
+
+from numpy import allclose, array, arange, asarray, polyval, zeros
+from numpy.random import default_rng
+
+from fatoolsng.lib import const, params
+from fatoolsng.lib.fautil import algo
+from fatoolsng.lib.fautil.algo import (Peak, call_peaks, local_southern,
+                                       _local_southern)
+from fatoolsng.lib.fautil.sizing import (CubicSpline, LeastSquare,
+                                         LocalSouthern, Sizer, SIZERS)
+from fatoolsng.lib.fileio.models import FSA
+from fatoolsng.tests.ladder import (LIZ500_SIZES, make_ladder_fsa,
+                                    upload_panels)
+
+
+_SIZES = [35, 50, 75, 100, 139, 150, 160, 200, 250, 300, 340, 350, 400, 450,
+          490, 500]
+
+
+def _ladder_peaks(seed=0):
+    rng = default_rng(seed)
+    peaks = []
+    for size in _SIZES:
+        p = Peak(rtime=int(1000 + 11.3 * size + 0.004 * size**2 +
+                           rng.normal(0, 3)), rfu=1000)
+        p.size = size
+        p.qscore = rng.uniform(0.5, 1.0)
+        peaks.append(p)
+    # the sizers sort the ladder peaks by rtime
+    rng.shuffle(peaks)
+    return peaks
+
+
+def _rtimes(ladders):
+    rtimes = sorted(p.rtime for p in ladders)
+    return arange(rtimes[1] + 1, rtimes[-2], 7)
+
+
+class TestLocalSouthern:
+
+    @pytest.mark.parametrize('seed', range(5))
+    def test_matches_reference(self, seed):
+        ladders = _ladder_peaks(seed)
+        reference = _local_southern(ladders)
+        rtimes = _rtimes(ladders)
+        sizes, devs, qcalls, methods = LocalSouthern(ladders).size(rtimes)
+        expected = array([reference(rtime)[:3] for rtime in rtimes])
+        assert allclose(sizes, expected[:, 0], rtol=1e-9)
+        assert allclose(devs, expected[:, 1], rtol=1e-6, atol=1e-12)
+        assert allclose(qcalls, expected[:, 2], rtol=1e-12)
+        assert set(methods) == {const.allelemethod.localsouthern}
+
+    def test_call_returns_tuple_of_size(self):
+        sizer = local_southern(_ladder_peaks())
+        assert isinstance(sizer, LocalSouthern)
+        size, dev, qcall, method = sizer(3000)
+        sizes, devs, qcalls, _ = sizer.size([3000])
+        assert (size, dev, qcall) == (sizes[0], devs[0], qcalls[0])
+        assert method == const.allelemethod.localsouthern
+
+    def test_ladder_peaks_are_sized_exactly(self):
+        ladders = _ladder_peaks()
+        sizer = LocalSouthern(ladders)
+        ladders.sort(key=lambda p: p.rtime)
+        sizes, devs, _, _ = sizer.size([p.rtime for p in ladders[1:-1]])
+        assert allclose(sizes, _SIZES[1:-1])
+        assert allclose(devs, 0, atol=1e-12)
+
+    def test_too_few_ladder_peaks(self):
+        with pytest.raises(ValueError):
+            LocalSouthern(_ladder_peaks()[:3])
+
+
+class TestOtherSizers:
+
+    def test_cubic_spline_goes_through_ladder_peaks(self):
+        ladders = _ladder_peaks()
+        sizes, devs, qcalls, methods = CubicSpline(ladders).size(
+            [p.rtime for p in ladders])
+        assert allclose(sizes, [p.size for p in ladders])
+        assert allclose(devs, 0)
+        assert set(methods) == {const.allelemethod.cubicspline}
+
+    def test_least_square_fits_polynomial(self):
+        z = [1e-9, -2e-5, 0.12, -90]
+        ladders = []
+        for rtime in range(1500, 7000, 400):
+            p = Peak(rtime=rtime)
+            p.size = polyval(z, rtime)
+            p.qscore = 1.0
+            ladders.append(p)
+        sizer = LeastSquare(ladders, degree=3)
+        rtimes = asarray([1700, 3333, 6400])
+        sizes, devs, qcalls, _ = sizer.size(rtimes)
+        assert allclose(sizes, polyval(z, rtimes))
+        assert allclose(devs, 0, atol=1e-12)
+        assert allclose(qcalls, 1.0)
+
+    def test_sizers_by_allele_method(self):
+        for (method, sizer) in SIZERS.items():
+            assert sizer(_ladder_peaks()).method == method
+
+
+class TestCallPeaks:
+
+    def _channel(self, rtimes):
+        alleles = [SimpleNamespace(rtime=rtime, size=-1, dev=-1, qcall=-1,
+                                   type=const.peaktype.scanned)
+                   for rtime in rtimes]
+        return SimpleNamespace(alleles=alleles)
+
+    def test_sizer_matches_function(self):
+        ladders = _ladder_peaks()
+        rtimes = [500, 2000, 2500, 3000, 4500, 9000]
+        expected = self._channel(rtimes)
+        channel = self._channel(rtimes)
+        call_peaks(expected, None, _local_southern(ladders), 1500, 8000)
+        call_peaks(channel, None, local_southern(ladders), 1500, 8000)
+        for (allele, other) in zip(channel.alleles, expected.alleles):
+            assert allele.type == other.type
+            assert allele.size == pytest.approx(other.size, rel=1e-9)
+            assert allele.qcall == pytest.approx(other.qcall)
+        # alleles out of range are left uncalled
+        assert channel.alleles[0].size == -1
+        assert channel.alleles[-1].type == const.peaktype.scanned
+        assert channel.alleles[1].type == const.peaktype.called
+
+
+def test_sizer_is_abstract():
+    with pytest.raises(TypeError):
+        Sizer(_ladder_peaks())
+
+
+@pytest.mark.parametrize('method', list(SIZERS))
+def test_fsa_call_uses_sizing_method(method, monkeypatch):
+    upload_panels()
+    fsa = make_ladder_fsa('sizing.fsa', [int(size * 10 + 200)
+                                         for size in LIZ500_SIZES])
+    fsa.add_channel(FSA.Channel(data=zeros(6000), dye='6-FAM', wavelen=522,
+                                status=const.channelstatus.scanned, fsa=fsa))
+    fsa.align(params.Params())
+    # align_hc() leaves the qscore of the ladder peaks unset
+    for allele in fsa.get_ladder_channel().alleles:
+        allele.qscore = 1.0
+
+    sizers = []
+    monkeypatch.setattr(algo, 'call_peaks',
+                        lambda channel, parameters, func, *args:
+                        sizers.append(func))
+    parameters = params.Params()
+    parameters.sizing = params.SizingParameter()
+    parameters.sizing.method = method.value
+    fsa.call(parameters)
+    assert [type(sizer) for sizer in sizers] == [SIZERS[method]]
@@ -0,0 +1,30 @@
+import pytest
+from subprocess import run
+from sys import executable
+
+
+_HEAVY = ['jax', 'scipy', 'pandas', 'matplotlib', 'sqlalchemy']
+
+
+def _loaded_heavy_modules(code):
+    code += f'\nimport sys\nprint(*(m for m in {_HEAVY!r} if m in sys.modules))'
+    proc = run([executable, '-c', code], capture_output=True, text=True,
+               check=True)
+    return proc.stdout.split()
+
+
+@pytest.mark.parametrize('command', ['analyze', 'binsutil', 'cache',
+                                     'convert', 'dbmgr', 'fa', 'facmd',
+                                     'fautil', 'pack'])
+def test_commands_start_without_heavy_modules(command):
+    assert _loaded_heavy_modules(
+        'from importlib import import_module\n'
+        f'import_module("fatoolsng.scripts.{command}").init_argparser()') == []
+
+
+def test_checkfsa_reads_headers_only(tmp_path):
+    from fatoolsng.tests.abif import build_fsa
+    (tmp_path / 'a.fsa').write_bytes(build_fsa({'LIZ': [1, 2, 3]}))
+    assert _loaded_heavy_modules(
+        'from fatoolsng.scripts.convert import check_fsa\n'
+        f'assert check_fsa({str(tmp_path / "a.fsa")!r})[0].scans == 3') == []
@@ -0,0 +1,153 @@
+import pytest
+from datetime import datetime
+from numpy import array_equal
+from numpy.random import default_rng
+
+from fatoolsng.lib import params
+from fatoolsng.lib.fautil.channelcache import ChannelCache
+from fatoolsng.lib.fautil.tracearchive import TraceArchive, pack_archive
+from fatoolsng.lib.fileio.models import FSA, Panel, Marker
+from fatoolsng.scripts import pack as pack_script
+from fatoolsng.tests.abif import build_fsa
+
+
+_DYES = ['6-FAM', 'VIC', 'NED', 'PET', 'LIZ']
+
+
+def _traces(seed, length=3000):
+    rng = default_rng(seed)
+    return {dye: rng.integers(-50, 3000, length) for dye in _DYES}
+
+
+def _write_run(tmp_path, n=4):
+    run = tmp_path / 'run'
+    (run / 'plate').mkdir(parents=True)
+    files = []
+    for i in range(n):
+        name = f'plate/A{i + 1:02d}.fsa'
+        (run / name).write_bytes(build_fsa(_traces(i),
+                                           run_date=(2024, 2, i + 1)))
+        files.append((name, run / name))
+    return files
+
+
+class TestTraceArchive:
+
+    def test_roundtrip(self, tmp_path):
+        files = _write_run(tmp_path)
+        assert pack_archive(tmp_path / 'run.fatr', files) == 4
+        archive = TraceArchive(tmp_path / 'run.fatr')
+        assert archive.names == [name for (name, _) in files]
+        for (i, (name, _)) in enumerate(files):
+            trace = archive.get_trace(name)
+            assert trace.get_run_start_time() == \
+                datetime(2024, 2, i + 1, 13, 45, 10)
+            channels = trace.get_channels()
+            assert list(channels) == _DYES
+            for (dye, raw) in _traces(i).items():
+                assert array_equal(channels[dye].raw, raw)
+                data = archive.get_data(name, dye)
+                assert not data.flags.owndata
+                assert not data.flags.writeable
+                assert array_equal(data, raw)
+
+    def test_resolve(self, tmp_path):
+        files = _write_run(tmp_path)
+        files.append(('other/A01.fsa', files[0][1]))
+        pack_archive(tmp_path / 'run.fatr', files)
+        archive = TraceArchive(tmp_path / 'run.fatr')
+        assert archive.resolve('plate/A02.fsa') == 'plate/A02.fsa'
+        assert archive.resolve('/data/run/A02.fsa') == 'plate/A02.fsa'
+        # ambiguous file names are only found by their full name
+        assert archive.resolve('A01.fsa') is None
+        assert archive.resolve('other/A01.fsa') == 'other/A01.fsa'
+        assert archive.resolve('A05.fsa') is None
+
+    def test_invalid_files_are_not_packed(self, tmp_path):
+        files = _write_run(tmp_path)
+        (tmp_path / 'bad.fsa').write_bytes(b'not an fsa file')
+        with pytest.raises(RuntimeError):
+            pack_archive(tmp_path / 'run.fatr',
+                         files + [('bad.fsa', tmp_path / 'bad.fsa')])
+        with pytest.raises(ValueError):
+            pack_archive(tmp_path / 'run.fatr', files + files[:1])
+        assert list(tmp_path.glob('run.fatr*')) == []
+
+    def test_not_an_archive(self, tmp_path):
+        for content in [b'', b'FATR', build_fsa(_traces(0))]:
+            (tmp_path / 'x.fatr').write_bytes(content)
+            with pytest.raises(RuntimeError):
+                TraceArchive(tmp_path / 'x.fatr')
+
+
+def test_pack_script(tmp_path, monkeypatch):
+    files = _write_run(tmp_path, n=2)
+    parser = pack_script.init_argparser()
+    pack_script.main(parser.parse_args(
+        ['--fsadir', str(tmp_path / 'run'), '-o', str(tmp_path / 'run.fatr')]
+        + [name for (name, _) in files]))
+
+    output = []
+    monkeypatch.setattr(pack_script, 'cout', output.append)
+    pack_script.main(parser.parse_args(['--list',
+                                        str(tmp_path / 'run.fatr')]))
+    assert output[1].split('\t') == [
+        str(tmp_path / 'run.fatr'), 'plate/A01.fsa', '2024-02-01T13:45:10',
+        ','.join(_DYES), '3000']
+    assert len(output) == 3
+
+
+@pytest.fixture(scope='module')
+def panels():
+    Marker.upload(params.default_markers)
+    Panel.upload(params.default_panels)
+
+
+class TestFSAFromArchive:
+
+    def test_channels_match_fsa_file(self, tmp_path, panels):
+        files = _write_run(tmp_path, n=2)
+        pack_archive(tmp_path / 'run.fatr', files)
+        archive = TraceArchive(tmp_path / 'run.fatr')
+        panel = Panel.get_panel('GS500LIZ')
+
+        for (name, path) in files:
+            expected = FSA.from_file(str(path), panel, cache=False)
+            path.unlink()
+            fsa = FSA.from_file(str(path), panel, cache=False,
+                                archive=archive)
+            assert fsa.filename == path.name
+            assert [c.dye for c in fsa.channels] == _DYES
+            for (c, e) in zip(fsa.channels, expected.channels):
+                assert array_equal(c.data, e.data)
+                assert c.wavelen == e.wavelen
+
+    def test_shares_channel_cache_with_fsa_file(self, tmp_path, panels):
+        files = _write_run(tmp_path, n=1)
+        pack_archive(tmp_path / 'run.fatr', files)
+        archive = TraceArchive(tmp_path / 'run.fatr')
+        cache_path = tmp_path / 'cache'
+        (name, path) = files[0]
+
+        FSA.from_file(str(path), Panel.get_panel('GS500LIZ'),
+                      cache_path=cache_path)
+        cache = ChannelCache(cache_path)
+        assert len(cache.entries()) == 1
+        key = ChannelCache.key(None, {}, archive.digest(name))
+        assert key == ChannelCache.key(path.read_bytes(), {})
+
+        path.unlink()
+        FSA.from_file(str(path), Panel.get_panel('GS500LIZ'),
+                      cache_path=cache_path, archive=archive)
+        assert len(cache.entries()) == 1
+
+    def test_get_trace_reads_archive(self, tmp_path, monkeypatch):
+        files = _write_run(tmp_path, n=1)
+        pack_archive(tmp_path / 'run.fatr', files)
+        monkeypatch.setattr(FSA, 'trace_archive',
+                            TraceArchive(tmp_path / 'run.fatr'))
+        fsa = FSA()
+        fsa.filename = 'A01.fsa'
+        fsa._fhdl = None
+        assert array_equal(fsa.get_trace().get_channels()['LIZ'].raw,
+                           _traces(0)['LIZ'])
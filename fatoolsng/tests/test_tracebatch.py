@@ -0,0 +1,124 @@
+import pytest
+from importlib.util import find_spec
+from numpy import append, array_equal, allclose, exp, arange
+from numpy.random import default_rng
+from peakutils import indexes
+
+from fatoolsng.lib import params, const
+from fatoolsng.lib.fautil import cmds, tracebatch
+from fatoolsng.lib.fautil.backend import use_backend
+from fatoolsng.lib.fautil.channelcache import ChannelCache, default_cache_path
+from fatoolsng.lib.fautil.normalize import normalize_channels
+from fatoolsng.lib.fileio.models import FSA, Panel, Marker
+from fatoolsng.tests.abif import build_fsa
+
+
+_DYES = ['6-FAM', 'VIC', 'NED', 'PET', 'LIZ']
+
+
+def _backends():
+    if find_spec('jax') is None:
+        return ['numpy']
+    return ['numpy', 'jax']
+
+
+@pytest.fixture(scope='module', autouse=True)
+def panels():
+    Marker.upload(params.default_markers)
+    Panel.upload(params.default_panels)
+
+
+def _traces(seed, length=3000):
+    rng = default_rng(seed)
+    x = arange(length)
+    traces = {}
+    for dye in _DYES:
+        trace = rng.integers(0, 40, length).astype(float)
+        for c in rng.integers(0, length, 30):
+            trace += rng.uniform(100, 3000) * exp(-0.5 * ((x - c) / 3)**2)
+        traces[dye] = trace.astype(int)
+    return traces
+
+
+def _write_run(tmp_path, n=3):
+    paths = []
+    for i in range(n):
+        path = tmp_path / f'{i}.fsa'
+        path.write_bytes(build_fsa(_traces(i)))
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize('backend', _backends())
+def test_local_maxima_match_peakutils(backend):
+    rng = default_rng(0)
+    with use_backend(backend):
+        for i in range(50):
+            # a few lengths only, JAX compiles the kernel for each length
+            n = [7, 20, 61][i % 3]
+            # small integers make plateaus
+            data = rng.integers(0, 4, (4, n)).astype(float)
+            offsets = rng.integers(0, n - 2, 4)
+            min_dist = int(rng.integers(1, 5))
+            found = tracebatch.find_local_maxima(data, offsets, min_dist)
+            for (row, offset, peaks) in zip(data, offsets, found):
+                expected = indexes(append(row[offset:], [0, 0, 0]), 1e-7,
+                                   min_dist)
+                assert array_equal(peaks, expected)
+
+
+def test_jax_normalization_matches_numpy():
+    pytest.importorskip('jax')
+    raw = default_rng(1).integers(0, 3000, (6, 4150))
+    expected = normalize_channels(raw, 399, 11, 5, 0.01)
+    with use_backend('jax'):
+        nc = tracebatch.normalize_batch(raw)
+    assert allclose(nc.baseline, expected.baseline, atol=1e-8)
+    assert allclose(nc.signal, expected.signal, atol=1e-8)
+
+
+@pytest.mark.parametrize('backend', _backends())
+def test_batch_matches_per_fsa(backend, tmp_path):
+    paths = _write_run(tmp_path)
+    panel = Panel.get_panel('GS500LIZ')
+    expected = [FSA.from_file(p, panel, cache=False) for p in paths]
+    with use_backend(backend):
+        fsas = [FSA.from_file(p, panel, cache=False, normalize=False)
+                for p in paths]
+        assert all(fsa.channels == [] for fsa in fsas)
+        tracebatch.create_channels(fsas)
+
+        for fsa in expected + fsas:
+            # non-ladder channels are scanned from the alignment
+            fsa.ztranspose = [10.0, 200.0]
+        tracebatch.scan_channels([c for fsa in fsas for c in fsa.channels],
+                                 params.Params())
+
+    for (fsa, e) in zip(fsas, expected):
+        assert fsa.status == const.assaystatus.normalized
+        for (c, ec) in zip(fsa.channels, e.channels):
+            assert (c.dye, c.wavelen) == (ec.dye, ec.wavelen)
+            assert allclose(c.data, ec.data, atol=1e-8)
+            assert c.status == const.channelstatus.scanned
+            ec.scan(params.Params())
+            assert [(a.rtime, a.rfu) for a in c.alleles] == \
+                [(a.rtime, a.rfu) for a in ec.alleles]
+            assert allclose([a.area for a in c.alleles],
+                            [a.area for a in ec.alleles])
+            assert len(c.alleles) > 0
+
+
+def test_batched_files_are_cached(tmp_path):
+    paths = _write_run(tmp_path, n=2)
+    args = cmds.init_argparser().parse_args(
+        ['--file', ','.join(paths), '--panel', 'GS500LIZ', '--batched',
+         '--cache-path', str(tmp_path / 'cache')])
+    fsa_list = cmds.open_fsa(args)
+    assert [len(fsa.channels) for (fsa, _) in fsa_list] == [5, 5]
+    cache = ChannelCache(default_cache_path(tmp_path / 'cache'))
+    assert len(cache.entries()) == 2
+
+    args.batched = False
+    for ((fsa, _), (cached, _)) in zip(fsa_list, cmds.open_fsa(args)):
+        for (c, cc) in zip(fsa.channels, cached.channels):
+            assert array_equal(c.data, cc.data)
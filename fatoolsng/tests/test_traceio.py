@@ -0,0 +1,164 @@
+import pytest
+from io import BytesIO
+from datetime import datetime
+from mmap import mmap
+from struct import pack
+from numpy import array_equal, asarray
+from numpy.random import default_rng
+
+from fatoolsng.lib.fautil.traceio import (ABIFTags, read_abif_stream,
+                                          read_abif_stream_biopython,
+                                          scan_abif_file)
+from fatoolsng.tests.abif import (build_abif, build_fsa, data_tag, long_tag,
+                                  pstring_tag, cstring_tag, short_tag)
+
+
+_WAVELENGTHS = {'6-FAM': 522, 'VIC': 554, 'NED': 575, 'PET': 595, 'LIZ': 655}
+
+
+def _traces(length=2000, seed=0):
+    rng = default_rng(seed)
+    return {dye: rng.integers(-50, 3000, length) for dye in _WAVELENGTHS}
+
+
+def _fsa(**kwargs):
+    # tags the reader never asks for, as written by sequencers
+    extra_tags = [cstring_tag('CMNT', 1, 'run comment ' * 20),
+                  long_tag('SCAN', 1, 2000),
+                  pstring_tag('SMPL', 1, 'sample-1')]
+    return build_fsa(_traces(), _WAVELENGTHS, extra_tags=extra_tags, **kwargs)
+
+
+def _read_file(tmp_path, content):
+    path = tmp_path / 'test.fsa'
+    path.write_bytes(content)
+    with path.open('rb') as stream:
+        return read_abif_stream(stream)
+
+
+class TestABIFTags:
+
+    def test_tags_match_biopython(self, tmp_path):
+        content = _fsa()
+        native = _read_file(tmp_path, content)._raw
+        reference = read_abif_stream_biopython(BytesIO(content))._raw
+        assert sorted(native) == sorted(reference)
+        for key in reference:
+            if key.startswith('DATA'):
+                assert array_equal(native[key], reference[key])
+            else:
+                assert native[key] == reference[key]
+
+    def test_tags_are_decoded_on_access(self):
+        tags = ABIFTags(_fsa())
+        assert tags._values == {}
+        assert tags['SCAN1'] == 2000
+        assert list(tags._values) == ['SCAN1']
+        assert tags.get('DATA9') is None
+
+    def test_small_data_stored_in_entry(self):
+        tags = ABIFTags(build_abif([short_tag('DyeW', 1, 522),
+                                    pstring_tag('DyeN', 1, 'FAM')]))
+        assert tags['DyeW1'] == 522
+        assert tags['DyeN1'] == b'FAM'
+
+    def test_not_abif(self):
+        with pytest.raises(RuntimeError):
+            ABIFTags(b'GIF89a' + bytes(200))
+
+    def test_truncated_directory(self):
+        with pytest.raises(RuntimeError):
+            ABIFTags(_fsa()[:-10])
+
+
+class TestReadABIFStream:
+
+    def test_file_is_memory_mapped(self, tmp_path):
+        trace = _read_file(tmp_path, _fsa())
+        assert isinstance(trace._raw._buf, mmap)
+        channels = trace.get_channels()
+        assert list(channels) == list(_WAVELENGTHS)
+        for (dye, raw) in _traces().items():
+            c = channels[dye]
+            assert not c.raw.flags.owndata
+            assert array_equal(c.raw, raw)
+            assert c.wavelength == _WAVELENGTHS[dye]
+
+    def test_reads_in_memory_streams(self):
+        channels = read_abif_stream(BytesIO(_fsa())).get_channels()
+        assert array_equal(channels['LIZ'].raw, _traces()['LIZ'])
+
+    def test_channels_and_run_time_match_biopython(self):
+        content = _fsa(run_date=(2023, 12, 1), run_time=(8, 5, 59))
+        native = read_abif_stream(BytesIO(content))
+        reference = read_abif_stream_biopython(BytesIO(content))
+        assert native.get_run_start_time() == datetime(2023, 12, 1, 8, 5, 59)
+        assert native.get_run_start_time() == reference.get_run_start_time()
+        for (n, r) in zip(native.get_channels().values(),
+                          reference.get_channels().values()):
+            assert (n.dye_name, n.wavelength) == (r.dye_name, r.wavelength)
+            assert array_equal(n.raw, asarray(r.raw))
+
+    def test_processed_data_and_dye_aliases(self):
+        content = build_abif([data_tag(9, [1, 2, 3]),
+                              pstring_tag('DyeN', 1, 'FAM'),
+                              data_tag(105, [4, 5, 6]),
+                              pstring_tag('DyeN', 5, 'ROX')])
+        channels = read_abif_stream(BytesIO(content)).get_channels()
+        assert channels['6-FAM'].raw.tolist() == [1, 2, 3]
+        assert channels['6-FAM'].wavelength == 522
+        assert channels['LIZ'].raw.tolist() == [4, 5, 6]
+
+    def test_not_abif(self, tmp_path):
+        with pytest.raises(RuntimeError):
+            _read_file(tmp_path, b'')
+        with pytest.raises(RuntimeError):
+            read_abif_stream(BytesIO(b'not an fsa file'))
+
+
+def _with_offset(content, tag, offset):
+    """ return content with the data offset of tag replaced """
+    entry = content.rindex(tag)
+    return content[:entry + 20] + pack('>i', offset) + content[entry + 24:]
+
+
+class TestScanABIFFile:
+
+    def test_metadata(self, tmp_path):
+        path = tmp_path / 'test.fsa'
+        path.write_bytes(build_fsa(_traces(), _WAVELENGTHS, extra_tags=[
+            pstring_tag('DySN', 1, 'G5'), pstring_tag('MCHN', 1, 'ABI-01'),
+            pstring_tag('MODL', 1, '3730'), long_tag('SCAN', 1, 2000)]))
+        info = scan_abif_file(path)
+        assert info.dyes == list(_WAVELENGTHS)
+        assert info.dye_set == 'G5'
+        assert info.run_start == datetime(2024, 1, 31, 13, 45, 10)
+        assert (info.instrument, info.model) == ('ABI-01', '3730')
+        assert info.scans == 2000
+
+    def test_scans_from_data_length(self, tmp_path):
+        path = tmp_path / 'test.fsa'
+        path.write_bytes(build_fsa({'FAM': [1, 2, 3, 4]}))
+        info = scan_abif_file(path)
+        assert info.dyes == ['6-FAM']
+        assert (info.scans, info.instrument, info.dye_set) == (4, '', '')
+
+    def test_tag_outside_of_file(self, tmp_path):
+        path = tmp_path / 'test.fsa'
+        content = build_fsa(_traces())
+        path.write_bytes(_with_offset(content, b'DATA\x00\x00\x00\x02',
+                                      len(content) - 100))
+        with pytest.raises(RuntimeError, match='DATA2'):
+            scan_abif_file(path)
+        # the lazy reader only fails when the tag is decoded
+        with path.open('rb') as stream:
+            tags = read_abif_stream(stream)._raw
+        assert tags['DyeN2'] == b'VIC'
+
+    def test_not_abif(self, tmp_path):
+        path = tmp_path / 'test.fsa'
+        path.write_bytes(b'not an fsa file')
+        with pytest.raises(RuntimeError):
+            scan_abif_file(path)
+        with pytest.raises(OSError):
+            scan_abif_file(tmp_path / 'missing.fsa')